@@ -0,0 +1,67 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Compare two benchmark results written by `run_benchmarks.py`.
+
+    python -m benchmarks.compare base.json new.json --threshold 0.1
+
+Exits with status 1 if throughput of any run regressed more than threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["driver"], r["scenario"]): r for r in report["results"]}
+
+
+def compare(base, new, threshold):
+    """Return lines of comparison and whether any run regressed."""
+    lines = []
+    regressed = False
+    for key in sorted(set(base) & set(new)):
+        before = base[key]["events_per_sec"]
+        after = new[key]["events_per_sec"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change < -threshold:
+            flag = "REGRESSED"
+            regressed = True
+        lines.append(
+            "{:<10} {:<14} {:>10.1f} -> {:>10.1f} events/s {:>+7.1%} {}".format(
+                key[0], key[1], before, after, change, flag
+            ).rstrip()
+        )
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    lines, regressed = compare(_load(args.base), _load(args.new), args.threshold)
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Drivers run the same paginated collection through different entry points
+of the library. Each driver collects `streams` streams from the mock API
+server and writes events to the given event writer.
+
+Note `PipeManager` is a singleton, the event writer of the first driver run
+in a process is used by later ones, so run each driver in its own process
+to count events.
+"""
+
+import os.path as op
+import threading
+
+from cloudconnectlib.client import CloudConnectClient
+from cloudconnectlib.core.engine_v2 import CloudConnectEngine
+from cloudconnectlib.core.job import CCEJob
+from cloudconnectlib.core.pipemgr import PipeManager
+from cloudconnectlib.core.task import CCEHTTPRequestTask
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_consts as c
+from cloudconnectlib.splunktacollectorlib.data_collection.ta_data_collector import (
+    TADataCollector,
+)
+from cloudconnectlib.splunktacollectorlib.ta_cloud_connect_client import (
+    TACloudConnectClient,
+)
+
+CC_JSON_FILE = op.join(
+    op.dirname(op.abspath(__file__)), "config", "paginated_events.cc.json"
+)
+
+
+class CountingEventWriter:
+    """Event writer which counts written events instead of printing them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = 0
+        self.bytes = 0
+        self.writes = 0
+
+    def write_events(self, events):
+        if isinstance(events, str):
+            events = [events]
+        with self._lock:
+            for event in events:
+                self.events += event.count("<event")
+                self.bytes += len(event)
+            self.writes += 1
+        return True
+
+
+def _context(url, stream, page_size, log_level):
+    return {
+        "base_url": url,
+        "stream": stream,
+        "offset": 0,
+        "limit": page_size,
+        "__settings__": {"logging": {"loglevel": log_level}},
+    }
+
+
+def run_client(url, streams, page_size, event_writer, log_level="WARNING"):
+    """Collect streams one by one with `CloudConnectClient`."""
+    PipeManager(event_writer=event_writer)
+    for stream in range(streams):
+        context = _context(url, stream, page_size, log_level)
+        CloudConnectClient(context, CC_JSON_FILE, None).start()
+
+
+def run_engine_v2(
+    url,
+    streams,
+    page_size,
+    event_writer,
+    log_level="WARNING",
+    max_workers=None,
+    adaptive=True,
+    concurrent_jobs=None,
+):
+    """Collect streams with `CloudConnectEngine` of engine_v2 and a `CCEJob`
+    for each stream."""
+    PipeManager(event_writer=event_writer)
+    jobs = []
+    for stream in range(streams):
+        task = CCEHTTPRequestTask(
+            request={
+                "url": "{{base_url}}/events?stream={{stream}}"
+                "&offset={{offset}}&limit={{limit}}",
+                "method": "GET",
+                "headers": {"accept": "application/json"},
+            },
+            name=f"stream_{stream}",
+        )
+        body = "{{__response__.body}}"
+        task.add_postprocess_skip_condition("json_empty", [body, "$.events[*]"])
+        task.add_postprocess_handler("json_path", [body, "$.next_offset"], "offset")
+        task.add_postprocess_handler("json_path", [body, "$.events[*]"], "events")
+        task.add_postprocess_handler("splunk_xml", ["{{events}}"], "xml_events")
+        task.add_postprocess_handler("std_output", ["{{xml_events}}"])
+        task.add_stop_condition("json_empty", [body, "$.events[*]"])
+        jobs.append(CCEJob(_context(url, stream, page_size, log_level), [task]))
+
+    CloudConnectEngine(
+        max_workers=max_workers, adaptive=adaptive, concurrent_jobs=concurrent_jobs
+    ).start(jobs)
+
+
+def run_engine_v2_wide(url, streams, page_size, event_writer, log_level="WARNING"):
+    """Same as `run_engine_v2` with jobs running concurrently in the adaptive
+    pool, which is allowed to grow up to 32 threads."""
+    run_engine_v2(
+        url,
+        streams,
+        page_size,
+        event_writer,
+        log_level,
+        max_workers=32,
+        concurrent_jobs=True,
+    )
+
+
+def run_engine_v2_fixed(url, streams, page_size, event_writer, log_level="WARNING"):
+    """Same as `run_engine_v2` with the fixed pool of 4 threads engine_v2 used
+    before its pool became adaptive."""
+    run_engine_v2(
+        url, streams, page_size, event_writer, log_level, max_workers=4, adaptive=False
+    )
+
+
+class _TAConfig:
+    def is_single_instance(self):
+        return True
+
+
+class _DataLoader:
+    def __init__(self, event_writer):
+        self._event_writer = event_writer
+
+    def get_event_writer(self):
+        return self._event_writer
+
+    def write_events(self, events):
+        return self._event_writer.write_events(events)
+
+    def tear_down(self):
+        pass
+
+
+class _CheckpointManager:
+    def __init__(self, meta_config, task_config):
+        pass
+
+    def close(self):
+        pass
+
+
+def run_collector(url, streams, page_size, event_writer, log_level="WARNING"):
+    """Collect streams one by one the way a modular input does, with
+    `TADataCollector` and `TACloudConnectClient`."""
+    loader = _DataLoader(event_writer)
+    meta_config = {"cc_json_file": CC_JSON_FILE}
+    for stream in range(streams):
+        task_config = _context(url, stream, page_size, log_level)
+        task_config[c.stanza_name] = f"benchmark_{stream}"
+        task_config[c.interval] = 60
+        collector = TADataCollector(
+            _TAConfig(),
+            meta_config,
+            task_config,
+            _CheckpointManager,
+            TACloudConnectClient,
+            loader,
+        )
+        collector.index_data()
+
+
+DRIVERS = {
+    "client": run_client,
+    "engine_v2": run_engine_v2,
+    "engine_v2_wide": run_engine_v2_wide,
+    "engine_v2_fixed": run_engine_v2_fixed,
+    "collector": run_collector,
+}
@@ -0,0 +1,183 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A local fake of Splunk HTTP Event Collector which accepts events posted to
+`/services/collector/event` and acknowledgement polls to
+`/services/collector/ack`. Received events are kept in memory.
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeHECServer:
+    """Run a fake HEC server in a background thread."""
+
+    def __init__(
+        self,
+        token="00000000-0000-0000-0000-000000000000",
+        use_ack=False,
+        fail_every=0,
+        ack_after=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        :param token: the only token accepted.
+        :type token: ``string``
+        :param use_ack: return an ack id for each request.
+        :type use_ack: ``bool``
+        :param fail_every: respond every nth event request with 503, 0 means
+            never fail.
+        :type fail_every: ``integer``
+        :param ack_after: count of ack polls before a request is acknowledged.
+        :type ack_after: ``integer``
+        """
+        self.token = token
+        self.use_ack = use_ack
+        self.fail_every = fail_every
+        self.ack_after = ack_after
+        self.events = []
+        self.requests = 0
+        self.failed = 0
+        self.gzip_requests = 0
+        self.ack_polls = 0
+        self.channels = set()
+        self._acks = {}
+        self._next_ack_id = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.hec = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_events(self, body, channel):
+        with self._lock:
+            self.requests += 1
+            if self.fail_every and self.requests % self.fail_every == 0:
+                self.failed += 1
+                return 503, {"text": "Server is busy", "code": 9}
+            decoder = json.JSONDecoder()
+            text = body.decode("utf-8").strip()
+            pos = 0
+            while pos < len(text):
+                event, pos = decoder.raw_decode(text, pos)
+                self.events.append(event)
+                while pos < len(text) and text[pos].isspace():
+                    pos += 1
+            self.channels.add(channel)
+            response = {"text": "Success", "code": 0}
+            if self.use_ack:
+                response["ackId"] = self._next_ack_id
+                self._acks[self._next_ack_id] = 0
+                self._next_ack_id += 1
+            return 200, response
+
+    def handle_acks(self, ack_ids):
+        with self._lock:
+            self.ack_polls += 1
+            result = {}
+            for ack_id in ack_ids:
+                polls = self._acks.get(ack_id)
+                if polls is None:
+                    result[str(ack_id)] = False
+                    continue
+                self._acks[ack_id] = polls + 1
+                result[str(ack_id)] = polls >= self.ack_after
+            return 200, {"acks": result}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        hec = self.server.hec
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Authorization") != "Splunk " + hec.token:
+            self._send_json(403, {"text": "Invalid token", "code": 4})
+            return
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+            with hec._lock:
+                hec.gzip_requests += 1
+        channel = self.headers.get("X-Splunk-Request-Channel")
+
+        if self.path == "/services/collector/event":
+            self._send_json(*hec.handle_events(body, channel))
+        elif self.path == "/services/collector/ack":
+            self._send_json(*hec.handle_acks(json.loads(body).get("acks", [])))
+        else:
+            self._send_json(404, {"text": "Not found", "code": 404})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Splunk HEC server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--token", default="00000000-0000-0000-0000-000000000000")
+    parser.add_argument("--ack", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeHECServer(args.token, args.ack, host=args.host, port=args.port)
+    server.start()
+    print(f"Fake HEC server is listening on {server.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"Received {len(server.events)} events", flush=True)
+
+
+if __name__ == "__main__":
+    main()
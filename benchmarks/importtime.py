@@ -0,0 +1,104 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Profile import time of modinput entry points with `python -X importtime`,
+which is paid by every `--scheme` and `--validate-arguments` invocation of
+splunkd, and write the results as JSON to keep as a baseline.
+
+    python -m benchmarks.importtime --output importtime.json
+
+Each module is imported in a fresh interpreter `--repeat` times, the median
+of cumulative import time is reported along with the slowest top level
+packages it pulled in.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = (
+    "cloudconnectlib.splunktacollectorlib.cloud_connect_mod_input",
+    "cloudconnectlib.splunktacollectorlib.ta_cloud_connect_client",
+    "cloudconnectlib.core.engine_v2",
+)
+
+
+def _parse(stderr):
+    """Parse `-X importtime` output into a `dict` of module name to
+    cumulative import time in microseconds."""
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        result[parts[2].strip()] = int(parts[1])
+    return result
+
+
+def profile(module, repeat=5):
+    """Import module in fresh interpreters and return the median cumulative
+    import time in milliseconds and the slowest top level packages."""
+    totals = []
+    packages = {}
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            env=dict(os.environ),
+            check=True,
+        )
+        times = _parse(proc.stderr)
+        totals.append(times.get(module, 0))
+        for name, cumulative in times.items():
+            if "." not in name:
+                packages.setdefault(name, []).append(cumulative)
+    slowest = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:10]
+    return {
+        "module": module,
+        "import_ms": statistics.median(totals) / 1000,
+        "packages_ms": dict(slowest),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = [
+        profile(module, args.repeat) for module in args.modules.split(",") if module
+    ]
+    for result in results:
+        print(f"{result['module']}: {result['import_ms']:.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
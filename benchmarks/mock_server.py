@@ -0,0 +1,242 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A local and configurable mock REST API used by benchmarks. Events are
+served page by page from `/events?stream=<id>&offset=<n>&limit=<n>`, the
+response looks like `{"events": [...], "next_offset": <n>}` and the events
+list is empty once all events of the stream are served.
+"""
+import argparse
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ServerOptions:
+    """Behavior of the mock API server."""
+
+    def __init__(
+        self,
+        total_events=5000,
+        page_size=100,
+        payload_size=200,
+        latency=0.0,
+        throttle_every=0,
+        gzip_enabled=True,
+    ):
+        """
+        :param total_events: count of events served for each stream.
+        :type total_events: ``integer``
+        :param page_size: maximum events in a page if not given in request.
+        :type page_size: ``integer``
+        :param payload_size: size in bytes of message field of each event.
+        :type payload_size: ``integer``
+        :param latency: seconds to wait before responding each request.
+        :type latency: ``float``
+        :param throttle_every: respond every nth request with 429, 0 means
+            never throttle.
+        :type throttle_every: ``integer``
+        :param gzip_enabled: gzip response if client accepts it.
+        :type gzip_enabled: ``bool``
+        """
+        self.total_events = total_events
+        self.page_size = page_size
+        self.payload_size = payload_size
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.gzip_enabled = gzip_enabled
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class ServerStats:
+    """Counters of requests served by the mock API server."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.pages = 0
+            self.throttled = 0
+            self.events = 0
+            self.bytes_sent = 0
+
+    def incr(self, **kwargs):
+        with self._lock:
+            for name, value in kwargs.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "pages": self.pages,
+                "throttled": self.throttled,
+                "events": self.events,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, avoid delayed ACK stalls.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        headers = dict(headers or {})
+        if self.server.options.gzip_enabled and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        ):
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stats.incr(bytes_sent=len(body))
+
+    def do_GET(self):
+        options, stats = self.server.options, self.server.stats
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send_json(200, stats.to_dict())
+            return
+        if url.path != "/events":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        stats.incr(requests=1)
+        self.server.first_request.set()
+        if options.latency:
+            time.sleep(options.latency)
+        if options.throttle_every and stats.requests % options.throttle_every == 0:
+            stats.incr(throttled=1)
+            self._send_json(429, {"error": "throttled"}, {"Retry-After": "1"})
+            return
+
+        query = parse_qs(url.query)
+        stream = query.get("stream", ["0"])[0]
+        offset = int(query.get("offset", ["0"])[0] or 0)
+        limit = int(query.get("limit", [options.page_size])[0] or options.page_size)
+        end = min(offset + limit, options.total_events)
+        message = "x" * options.payload_size
+        events = [
+            {
+                "id": i,
+                "stream": stream,
+                "time": 1600000000 + i,
+                "message": message,
+            }
+            for i in range(offset, end)
+        ]
+        stats.incr(pages=1, events=len(events))
+        self._send_json(200, {"events": events, "next_offset": max(end, offset)})
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Don't print connections reset by clients which are killed, e.g. by
+    startup benchmarks, in the middle of a request."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockAPIServer:
+    """Run the mock API server in a background thread."""
+
+    def __init__(self, options=None, host="127.0.0.1", port=0):
+        self.options = options or ServerOptions()
+        self.stats = ServerStats()
+        # Set once the first request of events arrives
+        self.first_request = threading.Event()
+        self._server = QuietHTTPServer((host, port), _Handler)
+        self._server.options = self.options
+        self._server.stats = self.stats
+        self._server.first_request = self.first_request
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--total-events", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--payload-size", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-every", type=int, default=0)
+    parser.add_argument("--no-gzip", action="store_true")
+    args = parser.parse_args()
+
+    options = ServerOptions(
+        total_events=args.total_events,
+        page_size=args.page_size,
+        payload_size=args.payload_size,
+        latency=args.latency,
+        throttle_every=args.throttle_every,
+        gzip_enabled=not args.no_gzip,
+    )
+    server = MockAPIServer(options, args.host, args.port).start()
+    print(f"Mock API server is listening on {server.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A local mock splunkd serving what a modular input reads at startup: the
+server info and the UCC REST endpoints of inputs, configurations and
+settings. Entities are looked up by the last segments of the request path,
+e.g. `TA_bench_settings/logging`, whatever the namespace is.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote, urlparse
+from xml.sax.saxutils import escape
+
+from .mock_server import QuietHTTPServer
+
+_SERVER_INFO_PATH = "/services/server/info"
+
+
+def _server_info_atom(info):
+    keys = []
+    for name, value in info.items():
+        if isinstance(value, (list, tuple)):
+            items = "".join(f"<s:item>{escape(str(v))}</s:item>" for v in value)
+            value = f"<s:list>{items}</s:list>"
+        else:
+            value = escape(str(value))
+        keys.append(f'<s:key name="{escape(name)}">{value}</s:key>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" '
+        'xmlns:s="http://dev.splunk.com/ns/rest">'
+        "<title>server-info</title>"
+        "<entry><title>server-info</title>"
+        f'<content type="text/xml"><s:dict>{"".join(keys)}</s:dict></content>'
+        "</entry></feed>"
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        splunkd = self.server.splunkd
+        path = unquote(urlparse(self.path).path).rstrip("/")
+        splunkd.record(path)
+        if path == _SERVER_INFO_PATH:
+            self._send(200, _server_info_atom(splunkd.server_info), "text/xml")
+            return
+        entities = splunkd.lookup(path)
+        if entities is None:
+            self._send(404, json.dumps({"messages": []}), "application/json")
+            return
+        entry = [{"name": name, "content": dict(content)} for name, content in entities]
+        self._send(200, json.dumps({"entry": entry}), "application/json")
+
+
+class MockSplunkd:
+    """Run the mock splunkd in a background thread."""
+
+    def __init__(self, endpoints, server_info=None, host="127.0.0.1", port=0):
+        """
+        :param endpoints: entities of each endpoint, the key is the last
+            segments of endpoint path and the value is a list of `(name,
+            content)` tuples.
+        :type endpoints: ``dict``
+        :param server_info: content of `/services/server/info`.
+        :type server_info: ``dict``
+        """
+        self.endpoints = endpoints
+        self.server_info = server_info or {
+            "serverName": "mock-splunkd",
+            "version": "9.1.0",
+            "guid": "00000000-0000-0000-0000-000000000000",
+            "server_roles": ["indexer"],
+        }
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = QuietHTTPServer((host, port), _Handler)
+        self._server.splunkd = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path):
+        with self._lock:
+            self.requests.append(path)
+
+    def lookup(self, path):
+        for suffix, entities in self.endpoints.items():
+            if path.endswith("/" + suffix):
+                return entities
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
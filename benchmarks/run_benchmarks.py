@@ -0,0 +1,190 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Run throughput benchmarks against the local mock API server and write the
+results as JSON, which could be compared across commits with `compare.py`.
+
+    python -m benchmarks.run_benchmarks --output results.json
+
+Each driver runs in a freshly spawned process, so that the peak memory
+measured belongs to that run only.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+
+from .drivers import DRIVERS, CountingEventWriter
+from .mock_server import MockAPIServer, ServerOptions
+
+SCENARIOS = {
+    "baseline": ServerOptions(total_events=5000, page_size=100, payload_size=200),
+    "latency": ServerOptions(
+        total_events=2000, page_size=100, payload_size=200, latency=0.02
+    ),
+    "latency_100ms": ServerOptions(
+        total_events=1000, page_size=100, payload_size=200, latency=0.1
+    ),
+    "latency_500ms": ServerOptions(
+        total_events=500, page_size=100, payload_size=200, latency=0.5
+    ),
+    "large_payload": ServerOptions(total_events=2000, page_size=50, payload_size=4096),
+    "no_gzip": ServerOptions(
+        total_events=5000, page_size=100, payload_size=200, gzip_enabled=False
+    ),
+    "throttled": ServerOptions(
+        total_events=1000, page_size=100, payload_size=200, throttle_every=7
+    ),
+}
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _run_driver(driver, url, streams, page_size, log_level, queue):
+    from cloudconnectlib.splunktacollectorlib.common import log as stulog
+
+    stulog.set_log_level(log_level)
+    writer = CountingEventWriter()
+    baseline_rss = _max_rss_kb()
+    start = time.perf_counter()
+    DRIVERS[driver](url, streams, page_size, writer, log_level=log_level)
+    elapsed = time.perf_counter() - start
+    peak_rss = _max_rss_kb()
+    queue.put(
+        {
+            "elapsed": elapsed,
+            "events": writer.events,
+            "event_bytes": writer.bytes,
+            "peak_rss_kb": peak_rss,
+            "rss_delta_kb": None if peak_rss is None else peak_rss - baseline_rss,
+        }
+    )
+
+
+def run_benchmark(driver, scenario, streams=4, log_level="WARNING", timeout=600):
+    """Run a driver against a scenario in a spawned process.
+    :return: A `dict` contains the measurement of the run.
+    """
+    options = SCENARIOS[scenario]
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    with MockAPIServer(options) as server:
+        process = ctx.Process(
+            target=_run_driver,
+            args=(driver, server.url, streams, options.page_size, log_level, queue),
+        )
+        process.start()
+        try:
+            measurement = queue.get(timeout=timeout)
+        finally:
+            process.join(timeout)
+        stats = server.stats.to_dict()
+
+    elapsed = measurement["elapsed"]
+    rss_delta = measurement["rss_delta_kb"]
+    return {
+        "driver": driver,
+        "scenario": scenario,
+        "streams": streams,
+        "options": options.to_dict(),
+        "elapsed": round(elapsed, 4),
+        "pages": stats["pages"],
+        "requests": stats["requests"],
+        "throttled": stats["throttled"],
+        "events": measurement["events"],
+        "events_expected": options.total_events * streams,
+        "wire_bytes": stats["bytes_sent"],
+        "event_bytes": measurement["event_bytes"],
+        "pages_per_sec": round(stats["pages"] / elapsed, 2),
+        "events_per_sec": round(measurement["events"] / elapsed, 2),
+        "peak_rss_kb": measurement["peak_rss_kb"],
+        "memory_per_job_kb": None if rss_delta is None else rss_delta // streams,
+    }
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run throughput benchmarks")
+    parser.add_argument(
+        "--drivers",
+        default=",".join(DRIVERS),
+        help="comma separated drivers: %s" % ", ".join(DRIVERS),
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="comma separated scenarios: %s" % ", ".join(SCENARIOS),
+    )
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="file to write JSON results")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in args.scenarios.split(","):
+        for driver in args.drivers.split(","):
+            result = run_benchmark(driver, scenario, args.streams, args.log_level)
+            print(
+                "{driver:<10} {scenario:<14} {events:>7} events "
+                "{elapsed:>8.2f}s {events_per_sec:>10.1f} events/s "
+                "{pages_per_sec:>8.1f} pages/s".format(**result),
+                file=sys.stderr,
+            )
+            results.append(result)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Measure startup cost of a modular input built on `cloud_connect_mod_input`:
+wall time of `--scheme`, and wall time and peak RSS of running the input
+up to its first request to the mock API, with a mock splunkd serving its
+configuration. Each measurement runs the input script in a new process in
+a temporary app.
+
+    python -m benchmarks.startup --output startup.json --check
+
+With `--check` the exit status is 1 if any measurement exceeds `BUDGETS`.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import os.path as op
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import escape
+
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_consts as c
+
+from .mock_server import MockAPIServer, ServerOptions
+from .mock_splunkd import MockSplunkd
+
+APP_NAME = "TA_bench"
+REST_ROOT = "ta_bench"
+INPUT_NAME = "bench_input"
+STANZA_NAME = "startup"
+
+# Generous enough for slow CI hosts, the point is to catch regressions
+# like importing heavy modules for --scheme again.
+BUDGETS = {
+    "scheme_seconds": 1.0,
+    "run_seconds": 6.0,
+    "run_peak_rss_mb": 150,
+}
+
+_REPO_ROOT = op.dirname(op.dirname(op.abspath(__file__)))
+_CC_JSON_FILE = op.join(
+    op.dirname(op.abspath(__file__)), "config", "paginated_events.cc.json"
+)
+
+_SCRIPT = """\
+import os.path as op
+import sys
+
+sys.path.insert(0, op.join(op.dirname(op.dirname(op.abspath(__file__))), "lib"))
+
+from cloudconnectlib.splunktacollectorlib import cloud_connect_mod_input
+
+if __name__ == "__main__":
+    cloud_connect_mod_input.run(single_instance=True)
+"""
+
+_VENDORED_PACKAGES = ("cloudconnectlib", "splunktalib")
+
+_INPUT_FIELDS = ("base_url", "stream", "offset", "limit")
+
+# solnlib reads conf files with `splunk cmd btool`, which finds nothing here
+_SPLUNK_CLI = """\
+#!/bin/sh
+exit 0
+"""
+
+
+def _global_config():
+    entity = [{"field": "name"}, {"field": "collection_interval"}]
+    entity.extend({"field": field} for field in _INPUT_FIELDS)
+    return {
+        "meta": {"name": APP_NAME, "restRoot": REST_ROOT, "apiVersion": "3.2.0"},
+        "pages": {
+            "configuration": {
+                "tabs": [{"name": "logging", "entity": [{"field": "loglevel"}]}]
+            },
+            "inputs": {"services": [{"name": INPUT_NAME, "entity": entity}]},
+        },
+    }
+
+
+def _vendor(package, target):
+    if package == "cloudconnectlib":
+        source = op.join(_REPO_ROOT, package)
+    else:
+        source = op.dirname(importlib.util.find_spec(package).origin)
+    # Copied rather than linked, ta_data_loader finds splunktalib by a path
+    # relative to itself.
+    shutil.copytree(source, target, ignore=shutil.ignore_patterns("__pycache__"))
+
+
+def create_app(splunk_home):
+    """Create the app of the input under `splunk_home` and return the path
+    of the input script."""
+    app_root = op.join(splunk_home, "etc", "apps", APP_NAME)
+    for name in ("bin", "default", "lib", "README"):
+        os.makedirs(op.join(app_root, name), exist_ok=True)
+    # Libraries are shipped in lib of the app, next to each other
+    for package in _VENDORED_PACKAGES:
+        _vendor(package, op.join(app_root, "lib", package))
+    os.makedirs(op.join(splunk_home, "var", "log", "splunk"), exist_ok=True)
+    os.makedirs(op.join(splunk_home, "bin"), exist_ok=True)
+    splunk_cli = op.join(splunk_home, "bin", "splunk")
+    with open(splunk_cli, "w") as f:
+        f.write(_SPLUNK_CLI)
+    os.chmod(splunk_cli, 0o755)
+
+    script = op.join(app_root, "bin", INPUT_NAME + ".py")
+    with open(script, "w") as f:
+        f.write(_SCRIPT)
+    shutil.copyfile(_CC_JSON_FILE, op.join(app_root, "bin", INPUT_NAME + ".cc.json"))
+    with open(op.join(app_root, "default", "globalConfig.json"), "w") as f:
+        json.dump(_global_config(), f)
+    with open(op.join(app_root, "README", "inputs.conf.spec"), "w") as f:
+        f.write(f"[{INPUT_NAME}://<name>]\n")
+        f.write("collection_interval = \n")
+        for field in _INPUT_FIELDS:
+            f.write(f"{field} = \n")
+    return script
+
+
+def _endpoints(api_url):
+    task = {
+        "collection_interval": "60",
+        "base_url": api_url,
+        "stream": "0",
+        "offset": "0",
+        "limit": "100",
+        # Stanzas are staggered over a startup window by default, collect
+        # right away to measure startup only.
+        c.schedule_mode: c.schedule_mode_lockstep,
+    }
+    return {
+        f"{REST_ROOT}_{INPUT_NAME}": [(STANZA_NAME, task)],
+        f"{REST_ROOT}_settings/logging": [("logging", {"loglevel": "WARNING"})],
+    }
+
+
+def _stdin_config(splunkd_url, checkpoint_dir):
+    return (
+        "<input>"
+        "<server_host>mock-splunkd</server_host>"
+        f"<server_uri>{escape(splunkd_url)}</server_uri>"
+        "<session_key>mock-session-key</session_key>"
+        f"<checkpoint_dir>{escape(checkpoint_dir)}</checkpoint_dir>"
+        "<configuration>"
+        f'<stanza name="{INPUT_NAME}://{STANZA_NAME}">'
+        '<param name="interval">60</param>'
+        "</stanza>"
+        "</configuration>"
+        "</input>"
+    )
+
+
+def _env(splunk_home):
+    env = dict(os.environ)
+    env["SPLUNK_HOME"] = splunk_home
+    env.pop("SPLUNK_ETC", None)
+    env.pop("SPLUNKD_URI", None)
+    return env
+
+
+def _kill(proc):
+    """Kill the process and return its peak RSS in MB if available."""
+    try:
+        proc.send_signal(signal.SIGKILL if hasattr(signal, "SIGKILL") else 9)
+    except OSError:
+        pass
+    if not hasattr(os, "wait4"):
+        proc.wait()
+        return None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = status
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return round(rss / 1024, 1)
+
+
+def measure_scheme(script, splunk_home):
+    """Return wall time in seconds of running the input with `--scheme`."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, script, "--scheme"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=_env(splunk_home),
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def measure_run(script, splunk_home, timeout=60):
+    """Run the input and return wall time in seconds until its first
+    request to the mock API, peak RSS in MB at that point and the count of
+    requests sent to splunkd."""
+    checkpoint_dir = tempfile.mkdtemp(prefix="checkpoint_", dir=splunk_home)
+    options = ServerOptions(total_events=100, gzip_enabled=False)
+    with MockAPIServer(options) as api:
+        with MockSplunkd(_endpoints(api.url)) as splunkd:
+            with tempfile.TemporaryFile() as stderr:
+                start = time.perf_counter()
+                proc = subprocess.Popen(
+                    [sys.executable, script],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr,
+                    env=_env(splunk_home),
+                )
+                proc.stdin.write(
+                    _stdin_config(splunkd.url, checkpoint_dir).encode("utf-8")
+                )
+                proc.stdin.close()
+
+                deadline = start + timeout
+                while not api.first_request.wait(0.005):
+                    if proc.poll() is not None or time.perf_counter() > deadline:
+                        break
+                elapsed = time.perf_counter() - start
+                started = api.first_request.is_set()
+                if proc.poll() is None:
+                    peak_rss = _kill(proc)
+                else:
+                    peak_rss = None
+                if not started:
+                    stderr.seek(0)
+                    raise RuntimeError(
+                        "Input didn't send any request to the mock API, "
+                        "stderr=%s" % stderr.read().decode("utf-8", "replace")
+                    )
+    return {
+        "run_seconds": elapsed,
+        "run_peak_rss_mb": peak_rss,
+        "splunkd_requests": len(splunkd.requests),
+    }
+
+
+def run(repeat=3):
+    """Measure startup `repeat` times and return the median of each
+    measurement."""
+    splunk_home = tempfile.mkdtemp(prefix="cc_startup_")
+    try:
+        script = create_app(splunk_home)
+        schemes = [measure_scheme(script, splunk_home) for _ in range(repeat)]
+        runs = [measure_run(script, splunk_home) for _ in range(repeat)]
+    finally:
+        shutil.rmtree(splunk_home, ignore_errors=True)
+
+    result = {"scheme_seconds": round(statistics.median(schemes), 4)}
+    for key in runs[0]:
+        values = [r[key] for r in runs if r[key] is not None]
+        result[key] = round(statistics.median(values), 4) if values else None
+    return result
+
+
+def over_budget(result, budgets=None):
+    """Return the measurements of result exceeding budgets."""
+    budgets = budgets or BUDGETS
+    return {
+        key: (result[key], limit)
+        for key, limit in budgets.items()
+        if result.get(key) is not None and result[key] > limit
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure modinput startup")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="file to write JSON results")
+    parser.add_argument(
+        "--check", action="store_true", help="exit with 1 if over budget"
+    )
+    args = parser.parse_args(argv)
+
+    result = run(args.repeat)
+    exceeded = over_budget(result)
+    for key, value in result.items():
+        limit = BUDGETS.get(key)
+        mark = " OVER BUDGET" if key in exceeded else ""
+        budget = "" if limit is None else f" (budget {limit})"
+        print(f"{key:<18} {value}{budget}{mark}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"budgets": BUDGETS, "result": result}, f, indent=2)
+    return 1 if args.check and exceeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import importlib
 import os
 import os.path as op
 import platform
@@ -56,3 +57,44 @@ def register_module(new_path):
         if new_path in (x, x + os.sep):
             return
     sys.path.insert(0, new_path)
+
+
+class LazyModule:
+    """
+    Stand-in of a module which imports the module on first attribute
+    access, so that code paths not using a heavy dependency, e.g. printing
+    the scheme of a mod input, don't pay for importing it.
+    """
+
+    def __init__(self, name, package=None):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_package"] = package
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(
+                self.__dict__["_lazy_name"], self.__dict__["_lazy_package"]
+            )
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        return "<lazy module {!r}>".format(self.__dict__["_lazy_name"])
+
+
+def lazy_import(name, package=None):
+    """
+    Return a `LazyModule` of module `name`, it's imported when any of its
+    attributes is accessed for the first time.
+    :param name: module name, relative to `package` if it starts with dots.
+    :type name: ``string``
+    """
+    return LazyModule(name, package)
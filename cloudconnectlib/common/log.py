@@ -28,7 +28,9 @@ class CloudClientLogAdapter(logging.LoggerAdapter, metaclass=Singleton):
         self.cc_prefix = prefix if prefix else ""
 
     def process(self, msg, kwargs):
-        msg = f"{self.cc_prefix} {msg}"
+        # Only called when the record is going to be emitted
+        if self.cc_prefix:
+            msg = f"{self.cc_prefix} {msg}"
         return super().process(msg, kwargs)
 
     def set_level(self, val):
@@ -52,6 +52,29 @@ def load_json_file(file_path):
         return json.load(file_pointer)
 
 
+_DATA_PLACEHOLDER = "__cloudconnectlib_event_data__"
+_STREAM_START = "<stream>"
+_STREAM_END = "</stream>"
+
+
+def _escape_data(text):
+    # Same escaping ElementTree applies to element text.
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _event_template(data, **kwargs):
+    """Serialize a single event with `XMLEvent` and strip the enclosing
+    stream element, so that metadata is rendered exactly as solnlib does."""
+    stream = XMLEvent.format_events([XMLEvent(data, **kwargs)])[0]
+    return stream[len(_STREAM_START) : -len(_STREAM_END)]
+
+
 def format_events(
     raw_events,
     time=None,
@@ -63,17 +86,51 @@ def format_events(
     unbroken=False,
     done=False,
 ):
-    return XMLEvent.format_events(
-        XMLEvent(
-            data,
-            time=time,
-            index=index,
-            host=host,
-            source=source,
-            sourcetype=sourcetype,
-            stanza=stanza,
-            unbroken=unbroken,
-            done=done,
-        )
-        for data in raw_events
+    """Format raw events into a splunk stream XML. All events share the same
+    metadata, so the XML around event data is rendered once by `XMLEvent` and
+    reused for every record instead of building one `XMLEvent` per record.
+    Output is identical to `XMLEvent.format_events`.
+    :param raw_events: events data, each one is a string or an object which
+        will be dumped as JSON.
+    :type raw_events: ``list``
+    :return: A list with a single stream XML string.
+    """
+    raw_events = raw_events if isinstance(raw_events, list) else list(raw_events)
+    meta = dict(
+        time=time,
+        index=index,
+        host=host,
+        source=source,
+        sourcetype=sourcetype,
+        stanza=stanza,
+        unbroken=unbroken,
+        done=done,
     )
+    if not raw_events:
+        return XMLEvent.format_events([])
+
+    prefix, suffix = _event_template(_DATA_PLACEHOLDER, **meta).split(_DATA_PLACEHOLDER)
+    # ElementTree writes a self-closing tag for empty data.
+    empty = None
+
+    encode = json.JSONEncoder().encode
+    parts = [_STREAM_START]
+    append = parts.append
+    for data in raw_events:
+        if not isinstance(data, str):
+            data = encode(data)
+        if data:
+            append(prefix)
+            append(_escape_data(data))
+            append(suffix)
+        else:
+            if empty is None:
+                empty = _event_template("", **meta)
+            append(empty)
+    append(_STREAM_END)
+
+    stream = "".join(parts)
+    if not stream.isascii():
+        # ElementTree replaces characters that can't be encoded as UTF-8.
+        stream = stream.encode("utf-8", "xmlcharrefreplace").decode("utf-8")
+    return [stream]
@@ -13,5 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from .engine import CloudConnectEngine
-from .exceptions import ConfigException, HTTPError
+__all__ = ["CloudConnectEngine", "ConfigException", "HTTPError"]
+
+
+def __getattr__(name):
+    # Imported lazily so that importing light submodules, e.g. defaults,
+    # doesn't import the engine and its dependencies.
+    if name == "CloudConnectEngine":
+        from .engine import CloudConnectEngine
+
+        return CloudConnectEngine
+    if name in ("ConfigException", "HTTPError"):
+        from . import exceptions
+
+        return getattr(exceptions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,213 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Circuit breakers shared by HTTP clients to fail fast on unhealthy hosts"""
+import threading
+import time
+from urllib.parse import urlparse
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+logger = get_cc_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    CircuitBreaker stops requests to a host after consecutive failures.
+    It is `closed` normally. After `failure_threshold` consecutive failures
+    it becomes `open` and rejects requests. Once `recovery_timeout` seconds
+    elapsed it becomes `half_open` and lets a single probe request through,
+    the circuit is closed if the probe succeeds, otherwise it's opened again.
+    """
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None, clock=None):
+        """
+        :param name: name of circuit, usually the host it protects.
+        :type name: ``string``
+        :param failure_threshold: consecutive failures to open the circuit.
+        :type failure_threshold: ``integer``
+        :param recovery_timeout: seconds to wait before probing the host.
+        :type recovery_timeout: ``float``
+        :param clock: function returns current time in seconds.
+        :type clock: ``function``
+        """
+        self.name = name
+        self.failure_threshold = (
+            failure_threshold or defaults.circuit_breaker_failure_threshold
+        )
+        self.recovery_timeout = (
+            recovery_timeout
+            if recovery_timeout is not None
+            else defaults.circuit_breaker_recovery_timeout
+        )
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (
+            self._state == OPEN
+            and self._clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self._transit(HALF_OPEN)
+        return self._state
+
+    def _transit(self, state):
+        if state == OPEN:
+            logger.warning(
+                "Circuit of %s changed from %s to %s after %s failures",
+                self.name,
+                self._state,
+                state,
+                self._failures,
+            )
+        else:
+            logger.warning(
+                "Circuit of %s changed from %s to %s", self.name, self._state, state
+            )
+        self._state = state
+        self._probing = False
+        if state == OPEN:
+            self._opened_at = self._clock()
+        elif state == CLOSED:
+            self._opened_at = None
+            self._failures = 0
+
+    def allow_request(self):
+        """Return True if a request could be sent. In `half_open` state only
+        one probe request is allowed until its result is recorded."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._rejected += 1
+            return False
+
+    def retry_after(self):
+        """Return seconds until next probe is allowed, 0 if not open."""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0
+            return max(self.recovery_timeout - (self._clock() - self._opened_at), 0)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                self._transit(CLOSED)
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (
+                state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._transit(OPEN)
+
+    def snapshot(self):
+        """Return current status of circuit as a `dict` for monitoring."""
+        with self._lock:
+            state = self._current_state()
+            retry_after = 0
+            if state == OPEN:
+                elapsed = self._clock() - self._opened_at
+                retry_after = max(self.recovery_timeout - elapsed, 0)
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "rejected_requests": self._rejected,
+                "retry_after": retry_after,
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    CircuitBreakerRegistry holds one `CircuitBreaker` for each host, or for
+    each host and scope if a scope is given, e.g. a stanza, so that failures
+    of one stanza don't open the circuit of others talking to the same host.
+    """
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    @classmethod
+    def key_for(cls, url, scope=None):
+        return cls.host_of(url), scope
+
+    def get(self, url, scope=None):
+        key = self.key_for(url, scope)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                host, scope = key
+                name = host if scope is None else f"{host} [{scope}]"
+                breaker = self._breakers[key] = CircuitBreaker(name)
+            return breaker
+
+    def snapshot(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+_registry = CircuitBreakerRegistry()
+
+
+def get_circuit_breaker(url, scope=None):
+    """Return the `CircuitBreaker` shared by requests to host of `url`. The
+    circuit is shared only by requests made in the same scope, usually the
+    stanza name, if `defaults.circuit_breaker_scope` is "stanza"."""
+    if defaults.circuit_breaker_scope != "stanza":
+        scope = None
+    return _registry.get(url, scope)
+
+
+def get_circuit_breaker_states():
+    """Return status of all circuits of current process for monitoring."""
+    return _registry.snapshot()
+
+
+def reset_circuit_breakers():
+    """Forget all circuits, mainly used in tests."""
+    _registry.reset()
@@ -0,0 +1,151 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""HTTP validator cache used to send conditional requests"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+logger = get_cc_logger()
+
+_IF_NONE_MATCH = "If-None-Match"
+_IF_MODIFIED_SINCE = "If-Modified-Since"
+_CONDITIONAL_HEADERS = (_IF_NONE_MATCH.lower(), _IF_MODIFIED_SINCE.lower())
+
+
+class HTTPValidatorCache:
+    """
+    HTTPValidatorCache remembers the `ETag` and `Last-Modified` validators
+    returned by server for a request, so that the next identical request
+    could be sent as a conditional request with `If-None-Match` and
+    `If-Modified-Since` headers. Entries are keyed by the rendered method,
+    URL and headers of the request.
+    """
+
+    def __init__(self, entries=None, capacity=None):
+        """
+        :param entries: validators previously dumped from a cache.
+        :type entries: ``dict``
+        :param capacity: maximum number of requests to remember, the least
+            recently used one is evicted first.
+        :type capacity: ``integer``
+        """
+        self._capacity = capacity or defaults.validator_cache_capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load(entries)
+
+    @staticmethod
+    def key_for(request):
+        """Calculate the cache key of a request. Conditional headers are
+        excluded so that the key is the same before and after `apply`."""
+        headers = sorted(
+            (str(k).lower(), str(v))
+            for k, v in (request.headers or {}).items()
+            if str(k).lower() not in _CONDITIONAL_HEADERS
+        )
+        raw = json.dumps([str(request.method).upper(), request.url, headers])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _is_cacheable(request):
+        return str(request.method).upper() == "GET"
+
+    def load(self, entries):
+        """Replace current entries with validators dumped before."""
+        with self._lock:
+            self._entries.clear()
+            for key, value in (entries or {}).items():
+                if isinstance(value, dict):
+                    self._entries[key] = value
+            self._dirty = False
+
+    def dump(self):
+        """Return all validators as a `dict` which could be persisted."""
+        with self._lock:
+            return dict(self._entries)
+
+    @property
+    def dirty(self):
+        """Whether validators changed since last `load` or `mark_clean`."""
+        return self._dirty
+
+    def mark_clean(self):
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def apply(self, request):
+        """Add conditional headers to request if validators of the same
+        request are known. Headers given by user won't be overridden."""
+        if not self._is_cacheable(request):
+            return
+        with self._lock:
+            validators = self._entries.get(self.key_for(request))
+        if not validators:
+            return
+
+        if request.headers is None:
+            request.headers = {}
+        present = {str(k).lower() for k in request.headers}
+        if validators.get("etag") and _IF_NONE_MATCH.lower() not in present:
+            request.headers[_IF_NONE_MATCH] = validators["etag"]
+        if (
+            validators.get("last_modified")
+            and _IF_MODIFIED_SINCE.lower() not in present
+        ):
+            request.headers[_IF_MODIFIED_SINCE] = validators["last_modified"]
+        logger.debug("Conditional headers added for request url=%s", request.url)
+
+    def update(self, request, response):
+        """Remember validators of a successful response, forget them if the
+        server stops returning validators for the request."""
+        if not self._is_cacheable(request):
+            return
+        status = response.status_code
+        if (
+            status not in defaults.success_statuses
+            and status != defaults.not_modified_status
+        ):
+            return
+
+        headers = getattr(response.header, "headers", None) or {}
+        validators = {}
+        if headers.get("ETag"):
+            validators["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["last_modified"] = headers["Last-Modified"]
+
+        key = self.key_for(request)
+        with self._lock:
+            if not validators:
+                # 304 may omit validators, the previous ones are still valid.
+                if status != defaults.not_modified_status and key in self._entries:
+                    del self._entries[key]
+                    self._dirty = True
+                return
+            if self._entries.get(key) != validators:
+                self._entries[key] = validators
+                self._dirty = True
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+                self._dirty = True
@@ -26,7 +26,7 @@ class CheckpointManagerAdapter(tacm.TACheckPointMgr):
     def __init__(self, namespaces, content, meta_config, task_config):
         super().__init__(meta_config, task_config)
         if isinstance(namespaces, (list, tuple)):
-            self.namespaces = (_Token(t) for t in namespaces)
+            self.namespaces = [_Token(t) for t in namespaces]
         else:
             self.namespaces = [_Token(namespaces)]
         self.content = DictToken(content)
@@ -48,3 +48,11 @@ class CheckpointManagerAdapter(tacm.TACheckPointMgr):
             logger.info("No existing checkpoint found")
             checkpoint = {}
         return checkpoint
+
+    def load_validators(self, ctx):
+        """Load HTTP validators saved alongside checkpoint"""
+        return super().get_http_validators(self._namespaces_for(ctx))
+
+    def save_validators(self, ctx, validators):
+        """Save HTTP validators alongside checkpoint"""
+        super().update_http_validators(validators, self._namespaces_for(ctx))
@@ -21,6 +21,8 @@ disable_ssl_cert_validation = False  # default enable SSL validation
 
 success_statuses = (200, 201)  # statuses be treated as success.
 
+not_modified_status = 304  # status of a conditional request not modified.
+
 # response status which need to retry.
 retry_statuses = (429, 500, 501, 502, 503, 504, 505, 506, 507, 509, 510, 511)
 
@@ -48,3 +50,124 @@ retries = 3  # Default maximum retry times.
 max_iteration_count = 100  # maximum iteration loop count
 
 charset = "utf-8"  # Default response charset if not found in response header
+
+# Accept-Encoding header of requests. Leave it empty to negotiate all content
+# encodings could be decoded: gzip, deflate, br and zstd if library installed.
+accept_encoding = ""
+
+content_chunk_size = 64 * 1024  # chunk size to read and decompress response
+
+request_body_compress_min_size = 1024  # minimum body size to be compressed
+
+# Maximum size in bytes of a single decompressed response, 0 means unlimited.
+max_response_size = 0
+
+# Maximum size in bytes of all responses held in memory by current process at
+# the same time, 0 means unlimited.
+max_process_response_size = 0
+
+conditional_request = True  # send If-None-Match/If-Modified-Since if known
+
+validator_cache_capacity = 1000  # maximum requests to remember validators
+
+circuit_breaker_enabled = True  # fail fast on hosts keep failing
+
+circuit_breaker_failure_threshold = 5  # consecutive failures to open circuit
+
+circuit_breaker_recovery_timeout = 30  # seconds to wait before probing host
+
+circuit_breaker_ignored_statuses = (429,)  # retried statuses not counted as failures
+
+circuit_breaker_scope = "host"  # "host" shares a circuit across stanzas, or "stanza"
+
+metrics_enabled = False  # record hot path metrics, see core.metrics
+
+metrics_interval = 60  # seconds between two metrics reports
+
+profiling_enabled = False  # profile pipeline functions, see core.profiler
+
+profiling_alloc_sample_every = 100  # sample allocations every N calls
+
+profiling_top_n = 10  # functions reported for each stanza
+
+profiling_interval = 300  # seconds between two profiling reports
+
+hec_batch_size = 500  # maximum events in a single HEC request
+
+hec_batch_bytes = 1024 * 1024  # maximum uncompressed bytes of a HEC request
+
+hec_queue_size = 10000  # maximum events waiting to be sent to HEC
+
+hec_flush_interval = 1.0  # seconds to wait for a batch to fill up
+
+hec_workers = 1  # threads sending batches to HEC
+
+hec_retries = 3  # maximum retry times of a HEC request
+
+hec_ack_timeout = 60  # seconds to wait for a HEC acknowledgement
+
+hec_ack_poll_interval = 1.0  # seconds between two HEC acknowledgement polls
+
+async_queue_size = 1000  # maximum writes buffered by an async sink
+
+async_batch_size = 100  # maximum writes passed to the event writer at once
+
+async_spill_retry_interval = 5  # seconds before spilled writes are retried
+
+spill_journal_segment_bytes = 16 * 1024 * 1024  # bytes of a spill journal segment file
+
+spill_journal_max_bytes = 1024 * 1024 * 1024  # maximum bytes of a spill journal
+
+spill_journal_cursor_interval = 100  # records replayed between two saves of the cursor
+
+engine_min_workers = 1  # threads kept by the engine_v2 thread pool
+
+engine_max_workers = 4  # maximum threads of the engine_v2 thread pool
+
+engine_concurrent_jobs = False  # run CCEJob like generator jobs in engine_v2 pool
+
+engine_idle_timeout = 30  # seconds before an idle engine_v2 thread exits
+
+engine_adjust_interval = 0.5  # minimum seconds between two pool grows
+
+engine_blocking_threshold = 0.5  # share of time off CPU to treat jobs as I/O bound
+
+offload_post_process = False  # run post-process handlers in worker processes
+
+offload_workers = 0  # worker processes to run post-process, 0 means CPU count
+
+offload_start_method = "spawn"  # how worker processes are started
+
+offload_shm_min_size = 64 * 1024  # minimum content size shared via memory
+
+shard_start_method = "spawn"  # how shard worker processes are started
+
+shard_restart_delay = 1  # seconds before restarting a crashed shard worker
+
+shard_max_restart_delay = 60  # upper bound of the restart backoff
+
+shard_stop_timeout = 10  # seconds to wait for shard workers to exit
+
+schedule_mode = "staggered"  # how runs of stanzas are spread over the interval
+
+schedule_jitter = 0.0  # random delay of each run as a fraction of interval
+
+schedule_startup_window = 60  # seconds the first runs after start are spread over
+
+schedule_overrun = "skip"  # what to do with triggers fired while a round is running
+
+schedule_adaptive_headroom = 1.2  # adaptive interval as a multiple of round duration
+
+schedule_adaptive_max_factor = 10  # adaptive interval as a multiple of configured one
+
+file_watch_interval = 10  # seconds between checks of conf files when polling
+
+file_watch_debounce = 1.0  # seconds to wait for more changes of conf files
+
+hot_reload = False  # apply conf file changes without restarting the process
+
+hot_reload_stop_timeout = 60  # seconds to wait for stopped collectors to finish
+
+plugin_manifest_racy_window = 2  # seconds a changed plugin dir's mtime isn't trusted
+
+record_batch_backend = "python"  # set to "arrow" to hold records in pyarrow tables
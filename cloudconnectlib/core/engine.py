@@ -16,9 +16,12 @@
 import threading
 
 from ..common.log import get_cc_logger
-from . import defaults
+from ..splunktacollectorlib.data_collection import ta_consts as c
+from . import defaults, offload
+from .cache import HTTPValidatorCache
 from .exceptions import HTTPError, StopCCEIteration
-from .http import HttpClient
+from .http import HttpClient, is_blank_body
+from .pipemgr import PipeManager
 
 _logger = get_cc_logger()
 
@@ -87,6 +90,10 @@ class CloudConnectEngine:
         self._stopped = True
 
 
+def _task_spec(task):
+    return task.function, [arg.source for arg in task.inputs], task.output
+
+
 class Job:
     """Job class represents a single request to send HTTP request until
     reached it's stop condition.
@@ -105,7 +112,12 @@ class Job:
         self._request = request
         self._context = context
         self._checkpoint_mgr = checkpoint_mgr
-        self._client = HttpClient(proxy)
+        self._validator_cache = self._create_validator_cache()
+        self._client = HttpClient(
+            proxy,
+            validator_cache=self._validator_cache,
+            breaker_scope=(context or {}).get(c.stanza_name),
+        )
         self._stopped = True
         self._should_stop = False
 
@@ -116,6 +128,13 @@ class Job:
         self._running_thread = None
         self._terminated = threading.Event()
 
+    def _create_validator_cache(self):
+        if not (defaults.conditional_request and self._request.checkpoint):
+            return None
+        if not callable(getattr(self._checkpoint_mgr, "get_http_validators", None)):
+            return None
+        return HTTPValidatorCache()
+
     def _get_max_iteration_count(self):
         mode_max_count = self._iteration_mode.iteration_count
         default_max_count = defaults.max_iteration_count
@@ -147,13 +166,22 @@ class Job:
     def _set_context(self, key, value):
         self._context[key] = value
 
-    def _execute_tasks(self, tasks):
+    def _execute_tasks(self, tasks, offloaded=False):
         if not tasks:
             return
-        for task in tasks:
+
+        def _execute(task):
             if self._check_should_stop():
-                return
+                return False
             self._context.update(task.execute(self._context))
+            return True
+
+        if offloaded:
+            offload.execute(tasks, _task_spec, self._context, _execute)
+            return
+        for task in tasks:
+            if not _execute(task):
+                return
 
     def _on_pre_process(self):
         """
@@ -162,7 +190,7 @@ class Job:
         pre_processor = self._request.pre_process
 
         if pre_processor.should_skipped(self._context):
-            _logger.info("Skip pre process condition satisfied, do nothing")
+            _logger.debug("Skip pre process condition satisfied, do nothing")
             return
 
         tasks = pre_processor.pipeline
@@ -176,29 +204,43 @@ class Job:
         post_processor = self._request.post_process
 
         if post_processor.should_skipped(self._context):
-            _logger.info("Skip post process condition satisfied, " "do nothing")
+            _logger.debug("Skip post process condition satisfied, " "do nothing")
             return
 
         tasks = post_processor.pipeline
         _logger.debug("Got %s tasks need to be executed after process", len(tasks))
-        self._execute_tasks(tasks)
+        self._execute_tasks(tasks, defaults.offload_post_process)
 
     def _update_checkpoint(self):
         """Updates checkpoint based on checkpoint namespace and content."""
         checkpoint = self._request.checkpoint
         if not checkpoint:
-            _logger.info("Checkpoint not specified, do not update it.")
+            _logger.debug("Checkpoint not specified, do not update it.")
+            return
+        # Events must be delivered before the checkpoint moves past them.
+        if not PipeManager().flush():
+            _logger.error(
+                "Events written so far are not delivered, checkpoint is not updated."
+            )
             return
 
+        namespaces = checkpoint.normalize_namespace(self._context)
         self._checkpoint_mgr.update_ckpt(
             checkpoint.normalize_content(self._context),
-            namespaces=checkpoint.normalize_namespace(self._context),
+            namespaces=namespaces,
         )
 
+        cache = self._validator_cache
+        if cache is not None and cache.dirty and len(cache):
+            self._checkpoint_mgr.update_http_validators(
+                cache.dump(), namespaces=namespaces
+            )
+            cache.mark_clean()
+
     def _get_checkpoint(self):
         checkpoint = self._request.checkpoint
         if not checkpoint:
-            _logger.info("Checkpoint not specified, do not read it.")
+            _logger.debug("Checkpoint not specified, do not read it.")
             return
 
         namespaces = checkpoint.normalize_namespace(self._context)
@@ -206,6 +248,11 @@ class Job:
         if checkpoint:
             self._context.update(checkpoint)
 
+        if self._validator_cache is not None:
+            self._validator_cache.load(
+                self._checkpoint_mgr.get_http_validators(namespaces)
+            )
+
     def _is_stoppable(self):
         """Check if repeat mode conditions satisfied."""
         if self._request_iterated_count >= self._max_iteration_count:
@@ -317,8 +364,18 @@ class Job:
 
         status = response.status_code
 
+        if status == defaults.not_modified_status:
+            _logger.info(
+                "The response of request which url=%s and method=%s is not"
+                " modified since last request, status=%s.",
+                request.url,
+                request.method,
+                status,
+            )
+            return None, True
+
         if status in defaults.success_statuses:
-            if not (response.body or "").strip():
+            if is_blank_body(response):
                 _logger.info(
                     "The response body of request which url=%s and"
                     " method=%s is empty, status=%s.",
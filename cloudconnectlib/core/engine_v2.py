@@ -15,23 +15,52 @@
 #
 import concurrent.futures as cf
 import threading
-from collections import Iterable
+import types
+from collections.abc import Iterable
 from os import path as op
 
 from ..common.log import get_cc_logger
+from . import defaults
 from .plugin import init_pipeline_plugins
+from .pool import AdaptiveThreadPool
 
 logger = get_cc_logger()
 
 
 class CloudConnectEngine:
-    def __init__(self, max_workers=4, plugin_dir=""):
+    def __init__(
+        self,
+        max_workers=None,
+        plugin_dir="",
+        min_workers=None,
+        adaptive=True,
+        concurrent_jobs=None,
+    ):
         """
         Initialize CloudConnectEngine object
-        :param max_workers: maximum number of Threads to execute the given calls
+        :param max_workers: maximum number of Threads to execute the given calls,
+            `defaults.engine_max_workers` if not given. The adaptive pool
+            never grows beyond it, raise it explicitly only if the API
+            tolerates more concurrent requests.
         :param plugin_dir: Absolute path of directory containing cce_plugin_*.py
+        :param min_workers: minimum number of Threads kept by adaptive pool
+        :param adaptive: grow and shrink the pool with the load, a fixed pool
+            of `max_workers` Threads is used if False
+        :param concurrent_jobs: run jobs which are generators, like CCEJob,
+            in the pool, `defaults.engine_concurrent_jobs` if not given. By
+            default they run one at a time in the engine loop, so an API
+            sees one request at a time from the engine. Enable it only if
+            the API tolerates up to `max_workers` concurrent requests.
         """
-        self._executor = cf.ThreadPoolExecutor(max_workers)
+        if adaptive:
+            self._executor = AdaptiveThreadPool(min_workers, max_workers)
+        else:
+            self._executor = cf.ThreadPoolExecutor(
+                max_workers or defaults.engine_max_workers
+            )
+        if concurrent_jobs is None:
+            concurrent_jobs = defaults.engine_concurrent_jobs
+        self._concurrent_jobs = concurrent_jobs
         self._pending_job_results = set()
         self._shutdown = False
         self._pending_jobs = []
@@ -106,6 +135,10 @@ class CloudConnectEngine:
             if self._shutdown:
                 return None
             invoke_result = job.run()
+            # Jobs like CCEJob run lazily as generators, drain them here so
+            # that they run in the pool rather than in the engine loop.
+            if self._concurrent_jobs and isinstance(invoke_result, types.GeneratorType):
+                invoke_result = list(invoke_result)
             return invoke_result
         except Exception:
             logger.exception("job %s is invoked with exception", job)
@@ -137,4 +170,8 @@ class CloudConnectEngine:
             for job in self._pending_jobs:
                 job.stop()
         self._executor.shutdown(wait=True)
+        if isinstance(self._executor, AdaptiveThreadPool):
+            logger.info(
+                "CloudConnectEngine thread pool stats=%s", self._executor.stats()
+            )
         logger.info("CloudConnectEngine successfully tears down")
@@ -43,6 +43,35 @@ class HTTPError(CCEError):
         super().__init__(reason)
 
 
+class ResponseTooLargeError(HTTPError):
+    """ResponseTooLargeError raised when response content exceeds the size
+    limit of a request or the response budget of current process."""
+
+    def __init__(self, reason=None, size=None, limit=None, scope=None):
+        """
+        Initialize ResponseTooLargeError with the `size` read so far, the
+        `limit` exceeded and the `scope` of limit, `request` or `process`.
+        """
+        super().__init__(reason)
+        self.size = size
+        self.limit = limit
+        self.scope = scope
+
+
+class CircuitOpenError(HTTPError):
+    """CircuitOpenError raised when request is rejected without being sent
+    because the circuit of target host is open."""
+
+    def __init__(self, reason=None, host=None, retry_after=None):
+        """
+        Initialize CircuitOpenError with the `host` and seconds to wait
+        before the host is probed again.
+        """
+        super().__init__(reason)
+        self.host = host
+        self.retry_after = retry_after
+
+
 class StopCCEIteration(CCEError):
     """Exception to exit from the engine iteration."""
 
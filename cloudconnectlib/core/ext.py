@@ -19,15 +19,24 @@ import re
 import traceback
 from collections import Iterable
 from datetime import datetime
+from functools import lru_cache, wraps
 
 from jsonpath_ng import parse
 
 from ..common import log, util
+from . import profiler
 from .exceptions import FuncException, QuitJobError, StopCCEIteration
 from .pipemgr import PipeManager
+from .records import RecordBatch, from_records
 
 _logger = log.get_cc_logger()
 
+# Types could be loaded as JSON directly, raw response content is bytes like.
+_JSON_TEXT_TYPES = (str, bytes, bytearray)
+
+# The same expressions are applied to every page and every split element.
+_parse_json_path = lru_cache(maxsize=256)(parse)
+
 
 def regex_search(pattern, source, flags=0):
     """Search substring in source through regex"""
@@ -78,7 +87,7 @@ def json_path(source, json_path_expr):
         _logger.debug("source to apply JSONPATH is empty, return empty.")
         return ""
 
-    if isinstance(source, str):
+    if isinstance(source, _JSON_TEXT_TYPES):
         _logger.debug(
             "source expected is a JSON, not %s. Attempt to" " convert it to JSON",
             type(source),
@@ -94,7 +103,7 @@ def json_path(source, json_path_expr):
             )
 
     try:
-        expression = parse(json_path_expr)
+        expression = _parse_json_path(json_path_expr)
         results = [match.value for match in expression.find(source)]
 
         _logger.debug(
@@ -130,7 +139,9 @@ def splunk_xml(
     :param sourcetype: sourcetype for event
     :return: A wrapped event with splunk xml format.
     """
-    if not isinstance(candidates, (list, tuple)):
+    if isinstance(candidates, RecordBatch):
+        candidates = candidates.to_records()
+    elif not isinstance(candidates, (list, tuple)):
         candidates = [candidates]
 
     time = time or None
@@ -150,7 +161,7 @@ def splunk_xml(
         source=source,
         sourcetype=sourcetype,
     )
-    _logger.info("[%s] events are formated as splunk stream xml", len(candidates))
+    _logger.debug("[%s] events are formated as splunk stream xml", len(candidates))
     return xml_events
 
 
@@ -160,6 +171,8 @@ def std_output(candidates):
     """
     if isinstance(candidates, str):
         candidates = [candidates]
+    elif isinstance(candidates, RecordBatch):
+        candidates = candidates.to_records()
 
     all_str = True
     for candidate in candidates:
@@ -199,7 +212,7 @@ def _parse_json(source, json_path_expr=None):
         )
         source = json_path(source, json_path_expr)
 
-    elif isinstance(source, str):
+    elif isinstance(source, _JSON_TEXT_TYPES):
         source = json.loads(source)
 
     return source
@@ -371,6 +384,66 @@ def split_by(source, target, separator=None):
         return []
 
 
+def record_batch(source, fields=None):
+    """Hold records extracted from response in a columnar batch, which the
+    `record_*` functions process as a whole.
+    :param source: a list of records or a single record, records which
+        aren't `dict` are dropped.
+    :param fields: fields to keep, a list or a comma separated string.
+        All fields of records are kept if it's empty.
+    :return: A `RecordBatch`.
+    """
+    if isinstance(source, RecordBatch):
+        return source.select(fields) if fields else source
+    if not source:
+        source = []
+    elif isinstance(source, dict):
+        source = [source]
+    elif isinstance(source, _JSON_TEXT_TYPES) or not isinstance(source, Iterable):
+        _logger.warning(
+            "record_batch expects a list of records, found %s", type(source)
+        )
+        source = []
+    records = [record for record in source if isinstance(record, dict)]
+    if len(records) != len(source):
+        _logger.warning(
+            "[%s] records which are not JSON objects are dropped",
+            len(source) - len(records),
+        )
+    return from_records(records, fields)
+
+
+def record_select(batch, fields):
+    """Keep only the given fields of records in batch"""
+    return record_batch(batch).select(fields)
+
+
+def record_filter(batch, field, pattern, negate=False):
+    """Keep records in batch which value of field matches the regex pattern,
+    or the ones don't match if negate is true"""
+    return record_batch(batch).filter(field, pattern, is_true(negate))
+
+
+def record_dedup(batch, fields=None):
+    """Drop records in batch which have the same values of fields, or all
+    fields if not given, as an earlier record"""
+    return record_batch(batch).dedup(fields)
+
+
+def record_time_str2str(batch, field, from_format, to_format):
+    """Convert date strings of field in batch like `time_str2str` does"""
+    return record_batch(batch).convert_time(field, from_format, to_format)
+
+
+def record_apply(batch, field, method, *args):
+    """Replace values of field in batch with the result of a function which
+    has a batch variant, the values are passed as its first argument"""
+    batch_func = lookup_batch_method(method)
+    if batch_func is None:
+        raise FuncException(f'Function "{method}" has no batch variant')
+    return record_batch(batch).apply(field, batch_func, *args)
+
+
 _extension_functions = {
     "assert_true": assert_true,
     "exit_if_true": exit_if_true,
@@ -386,6 +459,57 @@ _extension_functions = {
     "json_not_empty": json_not_empty,
     "time_str2str": time_str2str,
     "split_by": split_by,
+    "record_batch": record_batch,
+    "record_select": record_select,
+    "record_filter": record_filter,
+    "record_dedup": record_dedup,
+    "record_time_str2str": record_time_str2str,
+    "record_apply": record_apply,
+}
+
+
+def elementwise(func):
+    """
+    Create the batch variant of a function. The batch variant is called with
+    columns, one `list` for each argument of the function holding its value
+    for every element, and returns a `list` of results of the function
+    applied to each element.
+    """
+
+    @wraps(func)
+    def batch_func(*columns):
+        return [func(*args) for args in zip(*columns)]
+
+    return batch_func
+
+
+def scalar(batch_func):
+    """
+    Create the scalar variant of a batch function, which applies it to a
+    single element.
+    """
+
+    @wraps(batch_func)
+    def func(*args):
+        return batch_func(*[[arg] for arg in args])[0]
+
+    return func
+
+
+# Batch variants of functions which transform each element independently.
+# Functions with side effects or raising to control the flow have none.
+_batch_extension_functions = {
+    name: elementwise(_extension_functions[name])
+    for name in (
+        "is_true",
+        "regex_match",
+        "regex_search",
+        "set_var",
+        "json_path",
+        "json_empty",
+        "json_not_empty",
+        "time_str2str",
+    )
 }
 
 
@@ -394,4 +518,29 @@ def lookup_method(name):
     :param name: function name.
     :return: A function with given name.
     """
-    return _extension_functions.get(name)
+    func = _extension_functions.get(name)
+    if func is None:
+        # Plugin modules are imported on first lookup of their functions
+        from .plugin import load_plugin_function
+
+        func = load_plugin_function(name)
+    if profiler.is_enabled():
+        return profiler.wrap(name, func)
+    return func
+
+
+def lookup_batch_method(name):
+    """Find the batch variant of a function with given function name.
+    :param name: function name.
+    :return: A function which takes and returns columns, None if the
+        function has no batch variant.
+    """
+    func = _batch_extension_functions.get(name)
+    if func is None and name not in _extension_functions:
+        from .plugin import load_plugin_function
+
+        load_plugin_function(name)
+        func = _batch_extension_functions.get(name)
+    if func is not None and profiler.is_enabled():
+        return profiler.wrap(name + "[batch]", func)
+    return func
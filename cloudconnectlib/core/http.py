@@ -13,25 +13,135 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import gzip
+import threading
 import time
 import traceback
+import weakref
+from collections import Counter
+from functools import lru_cache
 from ssl import SSLError as SSLHandshakeError
 
 import munch
 from requests import PreparedRequest, Session, utils
 from solnlib.utils import is_true
+from urllib3.util.request import ACCEPT_ENCODING
 
 from cloudconnectlib.common import util
 from cloudconnectlib.common.log import get_cc_logger
-from cloudconnectlib.core import defaults
-from cloudconnectlib.core.exceptions import HTTPError
+from cloudconnectlib.core import defaults, metrics
+from cloudconnectlib.core.breaker import (
+    CLOSED,
+    CircuitBreakerRegistry,
+    get_circuit_breaker,
+)
+from cloudconnectlib.core.exceptions import (
+    CircuitOpenError,
+    HTTPError,
+    ResponseTooLargeError,
+)
 
 _logger = get_cc_logger()
 
+REQUEST_SCOPE = "request"
+PROCESS_SCOPE = "process"
+
+# Count of responses rejected by size guard, keyed by the scope of limit.
+_oversized_responses = Counter()
+_oversized_lock = threading.Lock()
+
+
+def get_oversized_response_count():
+    """
+    Return count of responses rejected since process started because of
+    exceeding size limits, keyed by the scope of limit.
+    :return: A `dict`
+    """
+    with _oversized_lock:
+        return dict(_oversized_responses)
+
+
+def _count_oversized_response(scope):
+    with _oversized_lock:
+        _oversized_responses[scope] += 1
+    metrics.incr("oversized_responses")
+
+
+class ResponseBudget:
+    """
+    ResponseBudget tracks the total size of response content held in memory
+    by current process. Content is reserved while being read and released
+    once the `HTTPResponse` holding it is garbage collected.
+    """
+
+    def __init__(self, limit=None):
+        """
+        :param limit: maximum bytes could be reserved, 0 means unlimited.
+            `defaults.max_process_response_size` is used if not given.
+        :type limit: ``integer``
+        """
+        self._limit = limit
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        if self._limit is None:
+            return defaults.max_process_response_size
+        return self._limit
+
+    @property
+    def used(self):
+        return self._used
+
+    def acquire(self, size):
+        """Reserve `size` bytes, return False if budget is not enough."""
+        limit = self.limit
+        with self._lock:
+            if 0 < limit < self._used + size:
+                return False
+            self._used += size
+            return True
+
+    def release(self, size):
+        with self._lock:
+            self._used = max(self._used - size, 0)
+
+    def hold(self, owner, size):
+        """Release `size` bytes when `owner` is garbage collected."""
+        if size:
+            weakref.finalize(owner, self.release, size)
+
+
+_process_budget = ResponseBudget()
+
+
+def get_process_budget():
+    """Return the `ResponseBudget` shared by all clients of current process."""
+    return _process_budget
+
+
+@lru_cache(maxsize=64)
+def _resolve_charset(content_type):
+    """Resolve charset from the value of `Content-Type` header."""
+    return utils.get_encoding_from_headers({"content-type": content_type})
+
+
+def is_blank_body(response):
+    """
+    Check whether the body of a response is blank. The raw content is
+    checked if available so that the body doesn't need to be decoded.
+    """
+    raw = getattr(response, "raw_bytes", None)
+    if raw is None:
+        return not (response.body or "").strip()
+    return not raw or raw.isspace()
+
 
 class HTTPResponse:
     """
     HTTPResponse class wraps response of HTTP request for later use.
+    The content is decoded lazily when `body` is accessed for the first time.
     """
 
     def __init__(self, response, content):
@@ -39,23 +149,26 @@ class HTTPResponse:
         with requests.Session() request"""
         self._status_code = response.status_code
         self._header = response
-        self._body = self._decode_content(response.headers, content)
+        self._content = content or b""
+        self._charset = None
+        self._body = None
 
     @staticmethod
-    def _decode_content(response, content):
+    def _decode_content(response, content, charset=None):
         if not content:
             return ""
 
-        charset = utils.get_encoding_from_headers(response)
+        if charset is None:
+            charset = _resolve_charset(response.get("content-type"))
 
         if charset is None:
             charset = defaults.charset
-            _logger.info(
+            _logger.debug(
                 "Unable to find charset in response headers," ' set it to default "%s"',
                 charset,
             )
 
-        _logger.info("Decoding response content with charset=%s", charset)
+        _logger.debug("Decoding response content with charset=%s", charset)
 
         try:
             return content.decode(charset, errors="replace")
@@ -73,14 +186,48 @@ class HTTPResponse:
     def header(self):
         return self._header
 
+    @property
+    def charset(self):
+        """
+        Return charset of response content, the default charset is returned
+        if it's not found in response headers.
+        :return: A `string`
+        """
+        if self._charset is None:
+            charset = _resolve_charset(self._header.headers.get("content-type"))
+            self._charset = charset or defaults.charset
+        return self._charset
+
     @property
     def body(self):
         """
         Return response body as a `string`.
         :return: A `string`
         """
+        if self._body is None:
+            with metrics.timer("decode"):
+                self._body = self._decode_content(
+                    self._header.headers, self._content, self.charset
+                )
         return self._body
 
+    @property
+    def raw_bytes(self):
+        """
+        Return the undecoded response content without copying it. It should
+        be treated as read-only.
+        :return: A `bytes` like object
+        """
+        return self._content
+
+    @property
+    def raw_view(self):
+        """
+        Return a `memoryview` of the undecoded response content.
+        :return: A `memoryview`
+        """
+        return memoryview(self._content)
+
     @property
     def status_code(self):
         """
@@ -90,6 +237,18 @@ class HTTPResponse:
         return self._status_code
 
 
+def get_accept_encoding():
+    """
+    Return the value of `Accept-Encoding` header sent with requests. If it's
+    not configured in defaults, all content encodings which could be decoded
+    by urllib3 are negotiated, that's gzip and deflate, plus br and zstd when
+    brotli and zstandard libraries are installed.
+    """
+    if defaults.accept_encoding:
+        return defaults.accept_encoding
+    return ", ".join(e.strip() for e in ACCEPT_ENCODING.split(",") if e.strip())
+
+
 def _make_prepare_url_func():
     """Expose prepare_url in `PreparedRequest`"""
     pr = PreparedRequest()
@@ -182,15 +341,40 @@ def standardize_proxy_config(proxy_config):
 
 
 class HttpClient:
-    def __init__(self, proxy_info=None, verify=True):
+    def __init__(
+        self,
+        proxy_info=None,
+        verify=True,
+        validator_cache=None,
+        compress_request_body=False,
+        max_response_size=None,
+        breaker_scope=None,
+    ):
         """
         Constructs a `HTTPRequest` with a optional proxy setting.
         :param proxy_info: a dictionary of proxy details. It could directly match the input signature
             of `requests` library, otherwise will be standardized and converted to match the input signature.
         :param verify: same as the `verify` parameter of requests.request() method
+        :param validator_cache: an optional `HTTPValidatorCache` used to send
+            conditional requests with validators of previous responses.
+        :param compress_request_body: gzip request body which is larger than
+            `defaults.request_body_compress_min_size` and send it with
+            `Content-Encoding: gzip` header.
+        :param max_response_size: maximum size in bytes of a decompressed
+            response, 0 means unlimited. `defaults.max_response_size` is used
+            if not given. Responses also count against the budget of process
+            limited by `defaults.max_process_response_size`.
+        :param breaker_scope: scope of circuit breakers used by the client,
+            usually the stanza name. It takes effect only if
+            `defaults.circuit_breaker_scope` is "stanza", otherwise circuits
+            are shared by all clients talking to the same host.
         """
         self._connection = None
         self.requests_verify = verify
+        self.validator_cache = validator_cache
+        self.compress_request_body = compress_request_body
+        self.max_response_size = max_response_size
+        self.breaker_scope = breaker_scope
 
         if proxy_info:
             if isinstance(proxy_info, munch.Munch):
@@ -219,6 +403,7 @@ class HttpClient:
                 headers=headers,
                 timeout=defaults.timeout,
                 verify=self.requests_verify,
+                stream=True,
             )
         except SSLHandshakeError:
             _logger.warning(
@@ -240,29 +425,133 @@ class HttpClient:
                 method=method,
                 headers=headers,
                 timeout=defaults.timeout,
+                stream=True,
+            )
+
+    def _get_max_response_size(self):
+        if self.max_response_size is None:
+            return defaults.max_response_size
+        return self.max_response_size
+
+    @staticmethod
+    def _check_content_length(response, max_size):
+        """Fail fast if the declared length of an unencoded response already
+        exceeds the limit. Encoded content is checked while streaming since
+        its decompressed size is unknown."""
+        if max_size <= 0:
+            return
+        if response.headers.get("content-encoding", "identity") != "identity":
+            return
+        try:
+            length = int(response.headers.get("content-length"))
+        except (TypeError, ValueError):
+            return
+        if length > max_size:
+            raise ResponseTooLargeError(
+                "Response size %s exceeds the limit %s" % (length, max_size),
+                size=length,
+                limit=max_size,
+                scope=REQUEST_SCOPE,
             )
 
+    @staticmethod
+    def _read_content(response, max_size=0, budget=None):
+        """Read response content chunk by chunk. Compressed content is
+        decompressed while streaming, so that the compressed and decompressed
+        content never be held in memory together. Reading stops as soon as
+        content exceeds `max_size` or `budget` is exhausted.
+        :return: A tuple of content and the bytes reserved from budget
+        """
+        content = bytearray()
+        reserved = 0
+        try:
+            for chunk in response.iter_content(defaults.content_chunk_size):
+                size = len(content) + len(chunk)
+                if 0 < max_size < size:
+                    raise ResponseTooLargeError(
+                        "Response size exceeds the limit %s" % max_size,
+                        size=size,
+                        limit=max_size,
+                        scope=REQUEST_SCOPE,
+                    )
+                if budget is not None:
+                    if not budget.acquire(len(chunk)):
+                        raise ResponseTooLargeError(
+                            "Response budget %s of process exhausted, %s bytes"
+                            " in use" % (budget.limit, budget.used),
+                            size=size,
+                            limit=budget.limit,
+                            scope=PROCESS_SCOPE,
+                        )
+                    reserved += len(chunk)
+                content += chunk
+        except BaseException:
+            if budget is not None:
+                budget.release(reserved)
+            raise
+        finally:
+            response.close()
+        return content, reserved
+
     def _retry_send_request_if_needed(self, uri, method="GET", headers=None, body=None):
         """Invokes request and auto retry with an exponential backoff
         if the response status is configured in defaults.retry_statuses."""
         retries = max(defaults.retries, 0)
-        _logger.info("Invoking request to [%s] using [%s] method", uri, method)
+        breaker = (
+            get_circuit_breaker(uri, self.breaker_scope)
+            if defaults.circuit_breaker_enabled
+            else None
+        )
+        _logger.debug("Invoking request to [%s] using [%s] method", uri, method)
         for i in range(retries + 1):
-            try:
-                resp = self._send_internal(
-                    uri=uri, body=body, method=method, headers=headers
+            if breaker is not None and not breaker.allow_request():
+                retry_after = breaker.retry_after()
+                _logger.warning(
+                    "Circuit of %s is open, request url=%s method=%s is"
+                    " rejected without being sent. Next probe in %.1f seconds.",
+                    breaker.name,
+                    uri,
+                    method,
+                    retry_after,
+                )
+                metrics.incr("circuit_open_rejections")
+                raise CircuitOpenError(
+                    "Circuit of %s is open" % breaker.name,
+                    host=CircuitBreakerRegistry.host_of(uri),
+                    retry_after=retry_after,
                 )
-                content = resp.content
-                response = resp
+            try:
+                with metrics.timer("network"):
+                    resp = self._send_internal(
+                        uri=uri, body=body, method=method, headers=headers
+                    )
             except Exception as err:
+                metrics.incr("http_errors")
+                if breaker is not None:
+                    breaker.record_failure()
                 _logger.exception(
                     "Could not send request url=%s method=%s", uri, method
                 )
                 raise HTTPError("HTTP Error %s" % str(err))
 
             status = resp.status_code
-
-            if self._is_need_retry(status, i, retries):
+            if breaker is not None:
+                # Rate limited responses are left to retry and backoff.
+                if (
+                    status in defaults.retry_statuses
+                    and status not in defaults.circuit_breaker_ignored_statuses
+                ):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+            # Stop retrying once circuit is open, the response is returned
+            # as if it's the last retry.
+            if self._is_need_retry(status, i, retries) and (
+                breaker is None or breaker.state == CLOSED
+            ):
+                resp.close()
+                metrics.incr("http_retries")
                 delay = 2 ** i
                 _logger.warning(
                     "The response status=%s of request which url=%s and"
@@ -275,7 +564,33 @@ class HttpClient:
                 time.sleep(delay)
                 continue
 
-            return HTTPResponse(response, content)
+            max_size = self._get_max_response_size()
+            budget = _process_budget
+            try:
+                self._check_content_length(resp, max_size)
+                with metrics.timer("read"):
+                    content, reserved = self._read_content(resp, max_size, budget)
+            except ResponseTooLargeError as err:
+                resp.close()
+                _count_oversized_response(err.scope)
+                _logger.error(
+                    "Response of request url=%s method=%s is too large and"
+                    " dropped: %s",
+                    uri,
+                    method,
+                    err.reason,
+                )
+                raise
+            except Exception as err:
+                _logger.exception(
+                    "Could not read response of request url=%s method=%s", uri, method
+                )
+                raise HTTPError("HTTP Error %s" % str(err))
+
+            metrics.incr("bytes_read", len(content))
+            response = HTTPResponse(resp, content)
+            budget.hold(response, reserved)
+            return response
 
     def _prepare_url(self, url, params=None):
         self._url_preparer.prepare_url(url, params)
@@ -283,9 +598,9 @@ class HttpClient:
 
     def _initialize_connection(self):
         if self._proxy_info:
-            _logger.info("Proxy is enabled for http connection.")
+            _logger.debug("Proxy is enabled for http connection.")
         else:
-            _logger.info("Proxy is not enabled for http connection.")
+            _logger.debug("Proxy is not enabled for http connection.")
         self._connection = self._build_http_connection(self._proxy_info)
 
     def send(self, request):
@@ -305,9 +620,22 @@ class HttpClient:
             )
             url = request.url
 
-        return self._retry_send_request_if_needed(
-            url, request.method, request.headers, request.body
-        )
+        validator_cache = self.validator_cache
+        if validator_cache is not None:
+            validator_cache.apply(request)
+
+        headers, body = request.headers, request.body
+        if self.compress_request_body:
+            headers, body = self._compress_body(headers, body)
+
+        with metrics.timer("http_send"):
+            response = self._retry_send_request_if_needed(
+                url, request.method, headers, body
+            )
+
+        if validator_cache is not None:
+            validator_cache.update(request, response)
+        return response
 
     @staticmethod
     def _build_http_connection(
@@ -321,8 +649,21 @@ class HttpClient:
         s = Session()
         s.verify = not disable_ssl_cert_validation
         s.proxies = proxy_info or {}
+        s.headers["Accept-Encoding"] = get_accept_encoding()
         return s
 
+    @staticmethod
+    def _compress_body(headers, body):
+        """Gzip request body if it's large enough and not encoded yet."""
+        if not body or len(body) < defaults.request_body_compress_min_size:
+            return headers, body
+        if any(str(k).lower() == "content-encoding" for k in headers or {}):
+            return headers, body
+
+        headers = dict(headers or {})
+        headers["Content-Encoding"] = "gzip"
+        return headers, gzip.compress(body.encode("utf-8"))
+
     @staticmethod
     def _is_need_retry(status, retried, maximum_retries):
         return retried < maximum_retries and status in defaults.retry_statuses
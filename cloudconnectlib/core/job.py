@@ -121,6 +121,9 @@ class CCEJob:
             logger.info("No more task need to perform, exiting job")
             return
 
+        # Transform all contexts split by the running task at once
+        self._rest_tasks[0].batch_pre_process(contexts)
+
         count = 0
 
         for ctx in contexts:
@@ -0,0 +1,263 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Low overhead metrics of hot paths. Counters and latency histograms are
+recorded per stanza and per stage. Metrics are disabled by default, in which
+case `timer` returns a shared no-op context manager and `incr` returns
+immediately.
+
+    with metrics.timer("render"):
+        request = template.render(context)
+    metrics.incr("events_written", len(events))
+"""
+
+import bisect
+import json
+import threading
+import time
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+logger = get_cc_logger()
+
+GLOBAL_STANZA = "__global__"
+
+# Upper bounds in milliseconds of histogram buckets, the last bucket is
+# unbounded.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_enabled = defaults.metrics_enabled
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def merge(self, other):
+        """Add observations recorded by another histogram."""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, pct):
+        """Estimate percentile with the upper bound of bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                if index < len(BUCKETS_MS):
+                    return min(float(BUCKETS_MS[index]), self.max)
+                break
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min or 0.0, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+        }
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("_stage", "_stanza", "_start")
+
+    def __init__(self, stage, stanza):
+        self._stage = stage
+        self._stanza = stanza
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        observe(self._stage, time.perf_counter() - self._start, self._stanza)
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_stanza(stanza):
+    """Set the stanza metrics of current thread are recorded for."""
+    _local.stanza = stanza
+
+
+def get_stanza():
+    return getattr(_local, "stanza", None) or GLOBAL_STANZA
+
+
+def timer(stage, stanza=None):
+    """
+    Return a context manager which records the time spent in it as latency
+    of `stage`.
+    :param stage: name of stage.
+    :type stage: ``string``
+    :param stanza: stanza name, the stanza of current thread if not given.
+    :type stanza: ``string``
+    """
+    if not _enabled:
+        return _NOOP_TIMER
+    return _Timer(stage, stanza)
+
+
+def observe(stage, seconds, stanza=None):
+    """Record a latency of `stage` in seconds."""
+    if not _enabled:
+        return
+    key = (stanza or get_stanza(), stage)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds * 1000.0)
+
+
+def incr(name, value=1, stanza=None):
+    """Increase counter `name` by `value`."""
+    if not _enabled:
+        return
+    key = (stanza or get_stanza(), name)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def snapshot(reset=False):
+    """
+    Return recorded metrics grouped by stanza.
+    :param reset: clear recorded metrics after taking the snapshot.
+    :type reset: ``bool``
+    :return: A `dict` like {stanza: {"stages": {...}, "counters": {...}}}
+    """
+    with _lock:
+        histograms = {k: v.to_dict() for k, v in _histograms.items()}
+        counters = dict(_counters)
+        if reset:
+            _histograms.clear()
+            _counters.clear()
+
+    result = {}
+    for (stanza, stage), value in histograms.items():
+        result.setdefault(stanza, {"stages": {}, "counters": {}})["stages"][
+            stage
+        ] = value
+    for (stanza, name), value in counters.items():
+        result.setdefault(stanza, {"stages": {}, "counters": {}})["counters"][
+            name
+        ] = value
+    return result
+
+
+def drain():
+    """
+    Return recorded histograms and counters and clear them, used to pass
+    metrics of a process to another one which calls `merge`.
+    :return: A `tuple` of `(histograms, counters)`
+    """
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+        _histograms.clear()
+        _counters.clear()
+    return histograms, counters
+
+
+def merge(histograms, counters):
+    """Add metrics returned by `drain` of another process."""
+    with _lock:
+        for key, other in histograms.items():
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = Histogram()
+            histogram.merge(other)
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def format_metrics(stanza, metrics):
+    """Format metrics of a stanza as a single line JSON."""
+    record = {"stanza": stanza}
+    record.update(metrics)
+    return json.dumps(record, sort_keys=True)
+
+
+def log_metrics(reset=True):
+    """Log metrics of each stanza as a single line, used as a periodic timer
+    callback."""
+    for stanza, metrics in snapshot(reset).items():
+        logger.info("CloudConnect metrics %s", format_metrics(stanza, metrics))
@@ -35,6 +35,10 @@ class _Token:
         self._source = source
         self._value_for = compile_template(source) if isinstance(source, str) else None
 
+    @property
+    def source(self):
+        return self._source
+
     def render(self, variables):
         """Render value with variables if source is a string.
         Otherwise return source directly."""
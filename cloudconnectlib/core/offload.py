@@ -0,0 +1,335 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Run CPU bound post-process handlers in a pool of worker processes, so that
+parsing and formatting of pages of many tasks scale across cores while HTTP
+requests stay in threads.
+
+Only side-effect free builtin functions are offloaded, consecutive ones are
+sent to a worker together with the context variables they reference. The
+raw content of `__response__` is handed to workers through shared memory
+instead of being pickled. If a group of handlers can't be offloaded, e.g.
+a variable can't be pickled, it runs in current process instead. Errors
+raised by handlers themselves are raised again in current process as if
+handlers ran locally, handlers are not run twice.
+"""
+
+import concurrent.futures as cf
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from jinja2 import Environment, meta
+
+from ..common.log import get_cc_logger
+from . import defaults, metrics
+from .exceptions import FuncException
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.7
+    shared_memory = None
+
+_logger = get_cc_logger()
+
+# Set on exceptions raised by handlers in worker processes, to tell them
+# from failures of offloading.
+_HANDLER_ERROR_ATTR = "cce_offloaded_handler"
+
+# Builtin functions without side effect, which could run in other processes.
+OFFLOADABLE_METHODS = frozenset(
+    (
+        "is_true",
+        "json_empty",
+        "json_not_empty",
+        "json_path",
+        "regex_match",
+        "regex_search",
+        "set_var",
+        "split_by",
+        "splunk_xml",
+        "time_str2str",
+    )
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_env = Environment()
+
+
+def get_pool():
+    """Return the process pool shared by all tasks, create it if needed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = defaults.offload_workers or os.cpu_count() or 1
+            _pool = cf.ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context(defaults.offload_start_method),
+            )
+            _logger.info("Started %s processes to run post-process handlers", workers)
+        return _pool
+
+
+def shutdown_pool(wait=True):
+    """Shutdown the process pool, a new one is created when needed."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+@lru_cache(maxsize=1024)
+def _referenced_names(source):
+    try:
+        return frozenset(meta.find_undeclared_variables(_env.parse(source)))
+    except Exception:
+        return frozenset()
+
+
+def is_offloadable(method):
+    return method in OFFLOADABLE_METHODS
+
+
+def group_handlers(handlers, spec):
+    """Split handlers into groups of consecutive handlers which run in the
+    same place.
+    :param handlers: handlers to group.
+    :param spec: function returns `(method, argument sources, output)` of a
+        handler.
+    :return: A list of `(offloaded, handlers)`
+    """
+    groups = []
+    for handler in handlers:
+        offloaded = is_offloadable(spec(handler)[0])
+        if groups and groups[-1][0] == offloaded:
+            groups[-1][1].append(handler)
+        else:
+            groups.append((offloaded, [handler]))
+    return groups
+
+
+class OffloadedResponse:
+    """
+    Picklable stand-in of `HTTPResponse` sent to worker processes. The raw
+    content is read from shared memory if it's shared, and decoded lazily
+    like `HTTPResponse.body`.
+    """
+
+    def __init__(
+        self, status_code, headers, charset, content=b"", shm_name=None, size=0
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.charset = charset
+        self._content = content
+        self._shm_name = shm_name
+        self._size = size
+        self._body = None
+
+    @property
+    def header(self):
+        return self
+
+    def _read(self, read):
+        if self._shm_name is None:
+            return read(memoryview(self._content))
+        shm = _attach(self._shm_name)
+        try:
+            view = shm.buf[: self._size]
+            try:
+                return read(view)
+            finally:
+                view.release()
+        finally:
+            shm.close()
+
+    @property
+    def raw_bytes(self):
+        return self._read(bytes)
+
+    @property
+    def body(self):
+        if self._body is None:
+
+            def decode(view):
+                try:
+                    return str(view, self.charset, "replace")
+                except LookupError:
+                    return str(view, "utf-8", "replace")
+
+            self._body = self._read(decode)
+        return self._body
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment to resource
+        # tracker of worker, which would unlink it when worker exits.
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _share_response(response):
+    """Return an `OffloadedResponse` of `response` and the shared memory
+    holding its content, which should be released once handlers finish."""
+    content = response.raw_bytes or b""
+    headers = dict(getattr(response.header, "headers", None) or {})
+    size = len(content)
+    if shared_memory is None or size < defaults.offload_shm_min_size:
+        return (
+            OffloadedResponse(
+                response.status_code, headers, response.charset, bytes(content)
+            ),
+            None,
+        )
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    shm.buf[:size] = content
+    return (
+        OffloadedResponse(
+            response.status_code,
+            headers,
+            response.charset,
+            shm_name=shm.name,
+            size=size,
+        ),
+        shm,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _compile(source):
+    from .models import _Token
+
+    return _Token(source)
+
+
+def _run_in_worker(specs, variables, stop_key):
+    """Run handlers in a worker process, return the outputs."""
+    from .ext import lookup_method
+
+    context = dict(variables)
+    outputs = {}
+    for method, sources, output in specs:
+        args = [
+            _compile(s).render(context) if isinstance(s, str) else s for s in sources
+        ]
+        try:
+            result = lookup_method(method)(*args)
+        except Exception as ex:
+            try:
+                pickle.dumps(ex)
+            except Exception:
+                ex = FuncException(f"{type(ex).__name__}: {ex}")
+            setattr(ex, _HANDLER_ERROR_ATTR, method)
+            raise ex
+        if output:
+            context[output] = outputs[output] = result
+            if stop_key and output == stop_key and result:
+                break
+    return outputs
+
+
+def run_handlers(specs, context, stop_key=None):
+    """
+    Run handlers in a worker process.
+    :param specs: list of `(method, argument sources, output)` of handlers.
+    :param context: variables to render arguments.
+    :param stop_key: following handlers are skipped once a handler outputs
+        a true value to this variable.
+    :return: A `dict` of outputs of handlers.
+    """
+    from .http import HTTPResponse
+
+    names = set()
+    produced = set()
+    for _, sources, output in specs:
+        for source in sources:
+            if isinstance(source, str):
+                names.update(_referenced_names(source) - produced)
+        if output:
+            produced.add(output)
+
+    variables = {}
+    shared = []
+    try:
+        for name in names:
+            if name not in context:
+                continue
+            value = context[name]
+            if isinstance(value, HTTPResponse):
+                value, shm = _share_response(value)
+                if shm is not None:
+                    shared.append(shm)
+            variables[name] = value
+        with metrics.timer("offload"):
+            future = get_pool().submit(_run_in_worker, specs, variables, stop_key)
+            return future.result()
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+
+
+def execute(handlers, spec, context, run_local, stop_key=None):
+    """
+    Run handlers, offload consecutive offloadable ones to worker processes
+    and run others with `run_local`. Outputs are merged into `context`.
+    :param handlers: handlers to run.
+    :param spec: function returns `(method, argument sources, output)` of a
+        handler.
+    :param context: variables to render arguments.
+    :param run_local: function runs a handler in current process and
+        returns `False` if following handlers should be skipped.
+    :param stop_key: following handlers are skipped once a handler outputs
+        a true value to this variable.
+    :return: `False` if following handlers are skipped.
+    """
+    for offloaded, group in group_handlers(handlers, spec):
+        if offloaded:
+            try:
+                data = run_handlers([spec(h) for h in group], context, stop_key)
+            except BrokenProcessPool:
+                _logger.warning("Process pool is broken, restart it")
+                shutdown_pool(wait=False)
+                offloaded = False
+            except Exception as ex:
+                if getattr(ex, _HANDLER_ERROR_ATTR, None):
+                    raise
+                _logger.warning(
+                    "Unable to offload %s handlers, run them locally",
+                    len(group),
+                    exc_info=True,
+                )
+                offloaded = False
+            else:
+                context.update(data)
+                if stop_key and context.get(stop_key):
+                    return False
+        if not offloaded:
+            for handler in group:
+                if run_local(handler) is False:
+                    return False
+    return True
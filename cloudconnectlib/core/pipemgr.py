@@ -15,13 +15,40 @@
 #
 from solnlib.pattern import Singleton
 
+from . import metrics
+from .sinks import EventWriterSink
+
 
 class PipeManager(metaclass=Singleton):
-    def __init__(self, event_writer=None):
+    def __init__(self, event_writer=None, sink=None):
+        """
+        :param event_writer: event writer used if no sink given, events are
+            printed to stdout if neither is given.
+        :param sink: output sink of events, see `core.sinks`.
+        :type sink: ``EventSink``
+        """
         self._event_writer = event_writer
+        self._sink = sink or EventWriterSink(event_writer)
+
+    @property
+    def sink(self):
+        return self._sink
+
+    def set_sink(self, sink):
+        """Replace the output sink, the previous one is returned without
+        being closed."""
+        previous, self._sink = self._sink, sink
+        return previous
 
     def write_events(self, events):
-        if not self._event_writer:
-            print(events, flush=True)
-            return True
-        return self._event_writer.write_events(events)
+        with metrics.timer("write_events"):
+            metrics.incr("event_writes")
+            return self._sink.write_events(events)
+
+    def flush(self):
+        """Wait until events written so far are delivered, return `False`
+        if some of them couldn't be delivered."""
+        return self._sink.flush() is not False
+
+    def close(self):
+        self._sink.close()
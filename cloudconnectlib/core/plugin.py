@@ -13,17 +13,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import ast
 import importlib
+import os
 import sys
+import threading
+import time
 import traceback
 from os import path as op
 from os import walk
 
 from ..common import log
-from .ext import _extension_functions
+from . import defaults
+from .ext import _batch_extension_functions, _extension_functions, scalar
 
 logger = log.get_cc_logger()
 
+_PLUGIN_PREFIX = "cce_plugin_"
+_DECORATORS = ("cce_pipeline_plugin", "cce_pipeline_batch_plugin")
+
+# Manifests of plugin directories, keyed by directory
+_manifests = {}
+# Plugin functions not imported yet, function name to module names
+_plugin_modules = {}
+# Plugin modules tried to import already
+_tried_modules = set()
+_lock = threading.RLock()
+
 
 def cce_pipeline_plugin(func):
     """
@@ -61,6 +77,46 @@ def cce_pipeline_plugin(func):
     return pipeline_func
 
 
+def cce_pipeline_batch_plugin(func):
+    """
+    Decorator for batch pipeline plugin functions.
+
+    A batch function takes columns, one list for each argument holding its
+    value for every element, and returns a list with the result of each
+    element. When a task follows a split, its leading pre-process handlers
+    with batch functions are called once over all split elements instead of
+    once for each element. Otherwise the function is called with columns of
+    a single element.
+
+    :param func: User defined function object
+    :type func: ``function``
+
+    Usage::
+        >>> @cce_pipeline_batch_plugin
+        >>> def upper(values):
+        >>>     return [value.upper() for value in values]
+    """
+    if not callable(func):
+        logger.debug(
+            "Function %s is not callable, don't add it as a pipeline function",
+            func.__name__,
+        )
+    elif func.__name__ in _extension_functions:
+        logger.warning(
+            "Pipeline function %s already exists, please rename it!",
+            func.__name__,
+        )
+    else:
+        _extension_functions[func.__name__] = scalar(func)
+        _batch_extension_functions[func.__name__] = func
+        logger.debug("Added batch function %s to pipeline plugin system", func.__name__)
+
+    def pipeline_func(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return pipeline_func
+
+
 def import_plugin_file(file_name):
     """
     Import a module.
@@ -95,13 +151,136 @@ def import_plugin_file(file_name):
     return
 
 
+def _scan_plugin_file(file_path):
+    """
+    Find names of functions decorated with `cce_pipeline_plugin` or
+    `cce_pipeline_batch_plugin` in a plugin file without importing it.
+    Return None if the file registers functions in other ways or cannot be
+    parsed, it's imported eagerly then.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            tree = ast.parse(f.read(), filename=file_path)
+    except Exception:
+        logger.warning(
+            "Failed to parse plugin file %s, %s", file_path, traceback.format_exc()
+        )
+        return None
+
+    functions = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Name) and decorator.id in _DECORATORS:
+                functions.append(node.name)
+            elif isinstance(decorator, ast.Attribute) and decorator.attr in _DECORATORS:
+                functions.append(node.name)
+
+    references = sum(
+        1
+        for node in ast.walk(tree)
+        if (isinstance(node, ast.Name) and node.id in _DECORATORS)
+        or (isinstance(node, ast.Attribute) and node.attr in _DECORATORS)
+    )
+    if references != len(functions):
+        return None
+    return functions
+
+
+def _stat_plugin_dir(plugin_dir):
+    """Return the modified time of a directory and `(file name, modified
+    time, size)` of each plugin file in it."""
+    mtime = os.stat(plugin_dir).st_mtime_ns
+    files = []
+    for file_name in sorted(next(walk(plugin_dir))[2]):
+        if file_name == "__init__.py" or not file_name.startswith(_PLUGIN_PREFIX):
+            continue
+        if not file_name.endswith(".py"):
+            continue
+        try:
+            stat = os.stat(op.join(plugin_dir, file_name))
+        except FileNotFoundError:
+            continue
+        files.append((file_name, stat.st_mtime_ns, stat.st_size))
+    return mtime, tuple(files)
+
+
+class _PluginManifest:
+    """
+    Functions registered by each plugin file of a directory, it's valid as
+    long as the modified time of the directory and the modified time and
+    size of each plugin file don't change.
+    """
+
+    def __init__(self, plugin_dir, stamp):
+        self.stamp = stamp
+        self.built = time.time()
+        # Function name to module names
+        self.functions = {}
+        # Modules which could not be scanned and have to be imported
+        self.eager_modules = []
+
+        for file_name, _, _ in stamp[1]:
+            module_name = file_name[:-3]
+            functions = _scan_plugin_file(op.join(plugin_dir, file_name))
+            if functions is None:
+                self.eager_modules.append(module_name)
+                continue
+            for function in functions:
+                self.functions.setdefault(function, []).append(module_name)
+
+    def is_valid(self, stamp):
+        # A file changed within the window after its modified time may
+        # change again without changing the time on coarse file systems.
+        mtime = max([stamp[0]] + [file_mtime for _, file_mtime, _ in stamp[1]])
+        return (
+            stamp == self.stamp
+            and self.built - mtime / 1e9 > defaults.plugin_manifest_racy_window
+        )
+
+
+def _get_manifest(plugin_dir):
+    stamp = _stat_plugin_dir(plugin_dir)
+    with _lock:
+        manifest = _manifests.get(plugin_dir)
+        if manifest is not None and manifest.is_valid(stamp):
+            return manifest, False
+        manifest = _PluginManifest(plugin_dir, stamp)
+        _manifests[plugin_dir] = manifest
+        return manifest, True
+
+
+def load_plugin_function(name):
+    """
+    Import plugin modules registering function `name` which are found by
+    `init_pipeline_plugins` but not imported yet.
+    :param name: function name.
+    :return: the function if it's registered, otherwise None.
+    """
+    if name not in _plugin_modules:
+        return _extension_functions.get(name)
+    with _lock:
+        for module_name in _plugin_modules.get(name, ()):
+            if name in _extension_functions:
+                break
+            if module_name in _tried_modules:
+                continue
+            _tried_modules.add(module_name)
+            import_plugin_file(module_name + ".py")
+        _plugin_modules.pop(name, None)
+        return _extension_functions.get(name)
+
+
 def init_pipeline_plugins(plugin_dir):
     """
     Initialize the pipeline plugins which triggers the auto registering of user
     defined pipeline functions.
     1. Add the plugin_dir into sys.path.
-    2. Import the file under plugin_dir that starts with "cce_plugin_" and ends
-    with ".py"
+    2. Find the functions registered by each file under plugin_dir that
+    starts with "cce_plugin_" and ends with ".py". The file is imported when
+    one of its functions is looked up for the first time. The result is
+    cached until plugin_dir or one of the plugin files changes.
     """
     if not op.isdir(plugin_dir):
         logger.warning(
@@ -112,8 +291,19 @@ def init_pipeline_plugins(plugin_dir):
     if plugin_dir not in sys.path:
         sys.path.append(plugin_dir)
 
-    for file_name in next(walk(plugin_dir))[2]:
-        if file_name == "__init__.py" or not file_name.startswith("cce_plugin_"):
-            continue
-        if file_name.endswith(".py"):
-            import_plugin_file(file_name)
+    manifest, rebuilt = _get_manifest(plugin_dir)
+    if not rebuilt:
+        return
+
+    with _lock:
+        # Files may have been changed or added, try them again
+        modules = set(manifest.eager_modules)
+        for module_names in manifest.functions.values():
+            modules.update(module_names)
+        _tried_modules.difference_update(modules)
+        for function, module_names in manifest.functions.items():
+            _plugin_modules[function] = list(module_names)
+        for module_name in manifest.eager_modules:
+            _tried_modules.add(module_name)
+            import_plugin_file(module_name + ".py")
+    logger.debug("Found %s plugin functions in %s", len(manifest.functions), plugin_dir)
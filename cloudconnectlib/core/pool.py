@@ -0,0 +1,245 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A thread pool which grows and shrinks between a minimum and maximum number of
+workers. It grows when calls are waiting for a worker and the recent calls
+spend most of their time blocked, e.g. waiting for HTTP responses, rather
+than running on CPU, and workers exit once idle for a while.
+"""
+
+import concurrent.futures as cf
+import os
+import queue
+import threading
+import time
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+logger = get_cc_logger()
+
+_STOP = object()
+
+
+class AdaptiveThreadPool:
+    """
+    Thread pool with the `submit` and `shutdown` interface of
+    `concurrent.futures.ThreadPoolExecutor` whose size adapts to the queue
+    depth, worker utilization and the blocking ratio of calls. The blocking
+    ratio is the share of wall time a call spends off CPU, measured with
+    `time.thread_time`. CPU bound calls don't benefit from more threads in
+    CPython, so the pool only grows beyond the CPU count for blocking calls.
+    """
+
+    def __init__(
+        self,
+        min_workers=None,
+        max_workers=None,
+        idle_timeout=None,
+        adjust_interval=None,
+        blocking_threshold=None,
+        name="cce-worker",
+    ):
+        """
+        :param min_workers: workers kept even if idle.
+        :type min_workers: ``integer``
+        :param max_workers: maximum number of workers.
+        :type max_workers: ``integer``
+        :param idle_timeout: seconds an idle worker waits before exiting.
+        :type idle_timeout: ``float``
+        :param adjust_interval: minimum seconds between two grow decisions.
+        :type adjust_interval: ``float``
+        :param blocking_threshold: blocking ratio from which calls are
+            treated as I/O bound.
+        :type blocking_threshold: ``float``
+        """
+        self._max_workers = max(max_workers or defaults.engine_max_workers, 1)
+        if min_workers is None:
+            min_workers = defaults.engine_min_workers
+        self._min_workers = min(max(min_workers, 1), self._max_workers)
+        self._idle_timeout = idle_timeout or defaults.engine_idle_timeout
+        self._adjust_interval = (
+            defaults.engine_adjust_interval
+            if adjust_interval is None
+            else adjust_interval
+        )
+        self._blocking_threshold = (
+            defaults.engine_blocking_threshold
+            if blocking_threshold is None
+            else blocking_threshold
+        )
+        self._cpu_count = os.cpu_count() or 1
+        self._name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._workers = 0
+        self._busy = 0
+        self._sequence = 0
+        self._last_adjust = None
+        self._shutdown = False
+        # moving average of blocking ratio of calls, None if not measured
+        self._ratio = None
+        self._stats = {"calls": 0, "grows": 0, "shrinks": 0, "peak_workers": 0}
+
+        with self._lock:
+            self._spawn(self._min_workers)
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def stats(self):
+        """Return counters of pool as a `dict`."""
+        with self._lock:
+            result = dict(self._stats)
+            result["workers"] = self._workers
+            result["busy"] = self._busy
+        result["queue_depth"] = self._queue.qsize()
+        return result
+
+    def _spawn(self, count):
+        for _ in range(count):
+            self._sequence += 1
+            thread = threading.Thread(
+                target=self._work,
+                name=f"{self._name}-{self._sequence}",
+                daemon=True,
+            )
+            self._threads.add(thread)
+            self._workers += 1
+            thread.start()
+        if self._workers > self._stats["peak_workers"]:
+            self._stats["peak_workers"] = self._workers
+
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new calls after shutdown")
+        future = cf.Future()
+        self._queue.put((future, fn, args, kwargs))
+        self._adjust()
+        return future
+
+    def _blocking_ratio(self):
+        # Nothing measured yet, assume calls are I/O bound.
+        return 1.0 if self._ratio is None else self._ratio
+
+    def _record(self, wall, cpu):
+        ratio = max(0.0, 1.0 - cpu / wall) if wall > 0 else 0.0
+        if self._ratio is None:
+            self._ratio = ratio
+        else:
+            self._ratio = 0.8 * self._ratio + 0.2 * ratio
+
+    def _adjust(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._shutdown or self._workers >= self._max_workers:
+                return
+            depth = self._queue.qsize()
+            idle = self._workers - self._busy
+            if depth <= idle:
+                return
+            if (
+                self._last_adjust is not None
+                and now - self._last_adjust < self._adjust_interval
+            ):
+                return
+
+            ratio = self._blocking_ratio()
+            limit = self._max_workers
+            if ratio < self._blocking_threshold:
+                limit = min(limit, max(self._cpu_count, self._min_workers))
+            count = min(limit - self._workers, depth - idle)
+            self._last_adjust = now
+            utilization = self._busy / self._workers if self._workers else 1.0
+            if count <= 0:
+                return
+            logger.info(
+                "Thread pool grows from %s to %s workers, queue_depth=%s "
+                "utilization=%.2f blocking_ratio=%.2f",
+                self._workers,
+                self._workers + count,
+                depth,
+                utilization,
+                ratio,
+            )
+            self._stats["grows"] += 1
+            self._spawn(count)
+
+    def _work(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if self._workers > self._min_workers and not self._shutdown:
+                        self._workers -= 1
+                        self._threads.discard(threading.current_thread())
+                        self._stats["shrinks"] += 1
+                        logger.info(
+                            "Thread pool shrinks to %s workers after idle for "
+                            "%s seconds",
+                            self._workers,
+                            self._idle_timeout,
+                        )
+                        return
+                continue
+            if item is _STOP:
+                return
+
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy += 1
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            result = error = None
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as ex:
+                error = ex
+            cpu = time.thread_time() - cpu
+            wall = time.perf_counter() - wall
+            # Record the call before its future is done, so that the caller
+            # sees the pool state of finished calls.
+            with self._lock:
+                self._busy -= 1
+                self._record(wall, cpu)
+                self._stats["calls"] += 1
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            del result, error
+            # Scale with the queue even if nothing new is submitted.
+            self._adjust()
+
+    def shutdown(self, wait=True):
+        """Stop workers once calls submitted are done."""
+        with self._lock:
+            if self._shutdown:
+                threads = list(self._threads)
+            else:
+                self._shutdown = True
+                threads = list(self._threads)
+                for _ in threads:
+                    self._queue.put(_STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,232 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Opt-in profiler of pipeline functions. Once enabled, functions returned by
+`ext.lookup_method`, either built-in or registered with
+`cce_pipeline_plugin`, are wrapped to record call counts, cumulative and self
+time per stanza. Allocations of one in every `alloc_sample_every` calls are
+sampled with tracemalloc.
+"""
+import functools
+import threading
+import time
+import tracemalloc
+
+from ..common.log import get_cc_logger
+from . import defaults, metrics
+
+logger = get_cc_logger()
+
+_enabled = defaults.profiling_enabled
+_alloc_sample_every = 0
+_started_tracemalloc = False
+_lock = threading.Lock()
+_local = threading.local()
+_wrappers = {}
+_stats = {}
+
+
+class FunctionStats:
+    """Profiling statistics of a function in a stanza."""
+
+    __slots__ = (
+        "calls",
+        "errors",
+        "cum_time",
+        "self_time",
+        "max_time",
+        "sampled_calls",
+        "sampled_alloc",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cum_time = 0.0
+        self.self_time = 0.0
+        self.max_time = 0.0
+        self.sampled_calls = 0
+        self.sampled_alloc = 0
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cum_ms": round(self.cum_time * 1000, 3),
+            "self_ms": round(self.self_time * 1000, 3),
+            "max_ms": round(self.max_time * 1000, 3),
+            "avg_alloc_bytes": (
+                self.sampled_alloc // self.sampled_calls if self.sampled_calls else None
+            ),
+        }
+
+
+class _Frame:
+    __slots__ = ("children",)
+
+    def __init__(self):
+        self.children = 0.0
+
+
+def enable(alloc_sample_every=None):
+    """
+    Start profiling pipeline functions.
+    :param alloc_sample_every: sample allocations of one in every N calls,
+        0 disables allocation sampling. `defaults.profiling_alloc_sample_every`
+        is used if not given.
+    :type alloc_sample_every: ``integer``
+    """
+    global _enabled, _alloc_sample_every, _started_tracemalloc
+    if alloc_sample_every is None:
+        alloc_sample_every = defaults.profiling_alloc_sample_every
+    _alloc_sample_every = max(int(alloc_sample_every), 0)
+    if _alloc_sample_every and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _enabled = True
+
+
+def disable():
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record(name, elapsed, children, failed, alloc):
+    key = (metrics.get_stanza(), name)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = FunctionStats()
+        stats.calls += 1
+        stats.cum_time += elapsed
+        stats.self_time += max(elapsed - children, 0.0)
+        stats.max_time = max(stats.max_time, elapsed)
+        if failed:
+            stats.errors += 1
+        if alloc is not None:
+            stats.sampled_calls += 1
+            stats.sampled_alloc += alloc
+        return stats.calls
+
+
+def _make_wrapper(name, func):
+    counter = [0]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        counter[0] += 1
+        sampled = (
+            _alloc_sample_every
+            and counter[0] % _alloc_sample_every == 0
+            and tracemalloc.is_tracing()
+        )
+        stack = _stack()
+        frame = _Frame()
+        stack.append(frame)
+        failed = False
+        alloc_before = tracemalloc.get_traced_memory()[0] if sampled else None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            alloc = None
+            if sampled:
+                alloc = max(tracemalloc.get_traced_memory()[0] - alloc_before, 0)
+            stack.pop()
+            if stack:
+                stack[-1].children += elapsed
+            _record(name, elapsed, frame.children, failed, alloc)
+
+    wrapper.__wrapped_pipeline_function__ = func
+    return wrapper
+
+
+def wrap(name, func):
+    """Return the profiled version of pipeline function `func`."""
+    if func is None or not _enabled:
+        return func
+    with _lock:
+        cached = _wrappers.get(name)
+        if cached is None or cached[0] is not func:
+            cached = _wrappers[name] = (func, _make_wrapper(name, func))
+    return cached[1]
+
+
+def report(top_n=None, sort_by="self_ms", reset=False):
+    """
+    Return the top N functions of each stanza.
+    :param top_n: count of functions reported for each stanza.
+    :type top_n: ``integer``
+    :param sort_by: field to sort functions, one of calls, cum_ms, self_ms
+        and max_ms.
+    :type sort_by: ``string``
+    :param reset: clear statistics after reporting.
+    :type reset: ``bool``
+    :return: A `dict` maps stanza to a list of function statistics.
+    """
+    top_n = top_n or defaults.profiling_top_n
+    with _lock:
+        items = [(k, v.to_dict()) for k, v in _stats.items()]
+        if reset:
+            _stats.clear()
+
+    result = {}
+    for (stanza, name), value in items:
+        value["function"] = name
+        result.setdefault(stanza, []).append(value)
+    for stanza, rows in result.items():
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        result[stanza] = rows[:top_n]
+    return result
+
+
+def log_report(top_n=None, reset=True):
+    """Log top N pipeline functions of each stanza, used as a periodic timer
+    callback."""
+    for stanza, rows in report(top_n, reset=reset).items():
+        lines = [
+            "{function:<32} calls={calls:<8} cum_ms={cum_ms:<12} self_ms={self_ms:<12}"
+            " max_ms={max_ms:<10} avg_alloc_bytes={avg_alloc_bytes}".format(**row)
+            for row in rows
+        ]
+        logger.info(
+            "Pipeline function profile of stanza=%s\n%s", stanza, "\n".join(lines)
+        )
@@ -0,0 +1,359 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Columnar batches of records extracted from responses"""
+
+import json
+import re
+from functools import lru_cache
+from itertools import compress
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+_logger = get_cc_logger()
+
+# Placeholder of a field which a record doesn't have.
+_MISSING = object()
+
+# Arrow types of values an `ArrowRecordBatch` holds, by Python type.
+_ARROW_TYPES = {str: "string", int: "int64", float: "float64", bool: "bool_"}
+
+
+@lru_cache(maxsize=None)
+def _import_arrow():
+    """Import pyarrow on first use, it's optional and slow to import."""
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _field_list(fields):
+    """Normalize fields given as a list or a comma separated string."""
+    if not fields:
+        return []
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return [str(field).strip() for field in fields if str(field).strip()]
+
+
+def _hashable(key):
+    try:
+        hash(key)
+    except TypeError:
+        return json.dumps(key, sort_keys=True, default=str)
+    return key
+
+
+class RecordBatch:
+    """
+    RecordBatch holds records in columns, one `list` of values for each
+    field, so that projection, filtering, conversion and dedup operate on
+    whole columns instead of building a `dict` for every record at each step.
+    Operations return a new batch and leave this one unchanged.
+    """
+
+    def __init__(self, columns, length):
+        """
+        :param columns: values of each field, `_MISSING` stands for a field
+            the record doesn't have.
+        :type columns: ``dict``
+        :param length: number of records.
+        :type length: ``integer``
+        """
+        self._columns = columns
+        self._length = length
+
+    @classmethod
+    def from_records(cls, records, fields=None):
+        """Build a batch from records.
+        :param records: records which are all `dict`.
+        :type records: ``list``
+        :param fields: fields to keep, all fields of records if empty.
+        :type fields: ``list``
+        """
+        fields = _field_list(fields)
+        if not fields:
+            names = {}
+            for record in records:
+                names.update(dict.fromkeys(record))
+            fields = list(names)
+        columns = {
+            field: [record.get(field, _MISSING) for record in records]
+            for field in fields
+        }
+        return cls(columns, len(records))
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def fields(self):
+        return list(self._columns)
+
+    def column(self, field):
+        """Return values of a field, None for records without it."""
+        values = self._columns.get(field)
+        if values is None:
+            return [None] * self._length
+        return [None if value is _MISSING else value for value in values]
+
+    def to_records(self):
+        """Convert the batch back to a `list` of `dict`."""
+        names = list(self._columns)
+        if not names:
+            return [{} for _ in range(self._length)]
+        return [
+            {name: value for name, value in zip(names, row) if value is not _MISSING}
+            for row in zip(*self._columns.values())
+        ]
+
+    def _take(self, mask):
+        columns = {
+            name: list(compress(values, mask)) for name, values in self._columns.items()
+        }
+        return RecordBatch(columns, sum(1 for keep in mask if keep))
+
+    def select(self, fields):
+        """Keep only given fields of records."""
+        fields = _field_list(fields)
+        columns = {
+            field: self._columns[field] for field in fields if field in self._columns
+        }
+        return RecordBatch(columns, self._length)
+
+    def filter(self, field, pattern, negate=False):
+        """Keep records which value of field matches the regex pattern, or
+        doesn't match it if negate is True. Records without the field never
+        match."""
+        search = re.compile(pattern).search
+        values = self._columns.get(field) or [_MISSING] * self._length
+        mask = [
+            value is not _MISSING
+            and value is not None
+            and search(value if isinstance(value, str) else str(value)) is not None
+            for value in values
+        ]
+        if negate:
+            mask = [not keep for keep in mask]
+        return self._take(mask)
+
+    def dedup(self, fields=None):
+        """Drop records which values of given fields, or all fields if
+        empty, are the same as an earlier record's."""
+        fields = _field_list(fields) or list(self._columns)
+        keys = zip(*[self._columns.get(f) or [_MISSING] * self._length for f in fields])
+        seen = set()
+        mask = []
+        for key in keys:
+            key = _hashable(key)
+            mask.append(key not in seen)
+            seen.add(key)
+        return self._take(mask)
+
+    def apply(self, field, batch_func, *args):
+        """Replace values of field with the result of a batch function, see
+        `ext.elementwise`. The values are passed as the first column and each
+        of args is repeated as a column. Records without the field are kept
+        as they are.
+        """
+        values = self._columns.get(field)
+        if values is None:
+            return self
+        indexes = [i for i, value in enumerate(values) if value is not _MISSING]
+        present = [values[i] for i in indexes]
+        results = batch_func(present, *[[arg] * len(present) for arg in args])
+        if len(results) != len(present):
+            raise ValueError(
+                f"Batch function returned {len(results)} values for "
+                f"{len(present)} records"
+            )
+        converted = list(values)
+        for i, result in zip(indexes, results):
+            converted[i] = result
+        columns = dict(self._columns)
+        columns[field] = converted
+        return RecordBatch(columns, self._length)
+
+    def convert_time(self, field, from_format, to_format):
+        """Convert date strings of field like `ext.time_str2str` does."""
+        from .ext import lookup_batch_method
+
+        return self.apply(
+            field, lookup_batch_method("time_str2str"), from_format, to_format
+        )
+
+
+def _arrow_schema(columns):
+    """Return the Arrow type name of each column, or None if any column
+    holds values which don't round trip through Arrow unchanged: None,
+    nested values, or values of different types like ints and floats.
+    :param columns: values of each field like `RecordBatch` holds.
+    :type columns: ``dict``
+    """
+    schema = {}
+    for name, values in columns.items():
+        kinds = {type(value) for value in values if value is not _MISSING}
+        if len(kinds) > 1 or not kinds <= _ARROW_TYPES.keys():
+            return None
+        schema[name] = _ARROW_TYPES[kinds.pop()] if kinds else "null"
+    return schema
+
+
+class ArrowRecordBatch(RecordBatch):
+    """
+    RecordBatch backed by a `pyarrow.Table`, operations run as Arrow compute
+    kernels. It only holds columns of a single scalar type, so results are
+    the same as `RecordBatch` gives, and null values are the missing fields.
+    An operation Arrow can't do the same way, like a regex which isn't RE2
+    syntax or a filter on a column of numbers, falls back to the Python
+    implementation and returns a `RecordBatch`.
+    """
+
+    def __init__(self, table):
+        self._table = table
+
+    @classmethod
+    def from_python(cls, batch):
+        """Convert a `RecordBatch` to Arrow, or return it as it is if its
+        values can't be held by Arrow unchanged.
+        :param batch: batch backed by Python lists.
+        :type batch: ``RecordBatch``
+        """
+        schema = _arrow_schema(batch._columns)
+        if not schema:
+            return batch
+        pa = _import_arrow()
+        try:
+            arrays = [
+                pa.array(
+                    [None if value is _MISSING else value for value in values],
+                    type=getattr(pa, schema[name])(),
+                )
+                for name, values in batch._columns.items()
+            ]
+        except Exception as ex:
+            _logger.debug(
+                "Unable to build Arrow table from records, keep them in Python. "
+                "message=%s",
+                ex,
+            )
+            return batch
+        return cls(pa.table(arrays, names=list(schema)))
+
+    def __len__(self):
+        return self._table.num_rows
+
+    @property
+    def fields(self):
+        return list(self._table.column_names)
+
+    def column(self, field):
+        if field not in self._table.column_names:
+            return [None] * len(self)
+        return self._table.column(field).to_pylist()
+
+    def to_records(self):
+        return [
+            {name: value for name, value in record.items() if value is not None}
+            for record in self._table.to_pylist()
+        ]
+
+    def to_python(self):
+        """Convert to a `RecordBatch` backed by Python lists."""
+        columns = {
+            name: [_MISSING if v is None else v for v in self.column(name)]
+            for name in self._table.column_names
+        }
+        return RecordBatch(columns, len(self))
+
+    def _fallback(self, operation, ex, *args):
+        _logger.debug(
+            "Arrow is unable to %s records, fall back to Python. message=%s",
+            operation,
+            ex,
+        )
+        return getattr(self.to_python(), operation)(*args)
+
+    def select(self, fields):
+        fields = _field_list(fields)
+        names = self._table.column_names
+        return ArrowRecordBatch(self._table.select([f for f in fields if f in names]))
+
+    def filter(self, field, pattern, negate=False):
+        pa = _import_arrow()
+        if field not in self._table.column_names:
+            return self.to_python().filter(field, pattern, negate)
+        try:
+            values = self._table.column(field)
+            # Arrow formats numbers and booleans unlike str() does.
+            if not pa.types.is_string(values.type):
+                raise TypeError("values are not strings")
+            mask = pa.compute.fill_null(
+                pa.compute.match_substring_regex(values, pattern), False
+            )
+            if negate:
+                mask = pa.compute.invert(mask)
+            return ArrowRecordBatch(self._table.filter(mask))
+        except Exception as ex:
+            return self._fallback("filter", ex, field, pattern, negate)
+
+    def dedup(self, fields=None):
+        pa = _import_arrow()
+        fields = _field_list(fields) or self.fields
+        names = self._table.column_names
+        try:
+            if any(f not in names for f in fields):
+                raise KeyError("fields absent from records")
+            index = "__cce_record_index__"
+            indexed = self._table.append_column(index, pa.array(range(len(self))))
+            first = indexed.group_by(fields).aggregate([(index, "min")])
+            take = pa.compute.sort_indices(first.column(index + "_min"))
+            keep = pa.compute.take(first.column(index + "_min"), take)
+            return ArrowRecordBatch(self._table.take(keep))
+        except Exception as ex:
+            return self._fallback("dedup", ex, fields)
+
+    def apply(self, field, batch_func, *args):
+        return self.to_python().apply(field, batch_func, *args)
+
+
+@lru_cache(maxsize=None)
+def _warn_arrow_missing():
+    _logger.warning(
+        "Arrow record batches are enabled but pyarrow is not installed, "
+        "fall back to Python."
+    )
+
+
+def from_records(records, fields=None):
+    """Build a batch from records, backed by Arrow if it's enabled by
+    `defaults.record_batch_backend` and pyarrow is installed.
+    :param records: records which are all `dict`.
+    :type records: ``list``
+    :param fields: fields to keep, all fields of records if empty.
+    :type fields: ``list``
+    :return: A `RecordBatch`.
+    """
+    batch = RecordBatch.from_records(records, fields)
+    if defaults.record_batch_backend != "arrow":
+        return batch
+    if _import_arrow() is None:
+        _warn_arrow_missing()
+        return batch
+    return ArrowRecordBatch.from_python(batch)
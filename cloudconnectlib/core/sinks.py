@@ -0,0 +1,795 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Output sinks of events written by `PipeManager`. `EventWriterSink` keeps the
+default behavior, events are written to the modular input event writer or
+stdout. `HECSink` sends events to Splunk HTTP Event Collector instead.
+`AsyncSink` decouples collection from a slow sink with a writer thread and
+spills to a journal on disk when the sink is stalled or unavailable.
+"""
+
+import gzip
+import json
+import queue
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..common.log import get_cc_logger
+from . import defaults, metrics
+from .exceptions import ConfigException
+from .spill_journal import SpillJournal
+
+_logger = get_cc_logger()
+
+_STREAM_START = "<stream"
+_METADATA_TAGS = ("index", "host", "source", "sourcetype")
+
+# Returned by `AsyncSink._take` when spilled writes should be written.
+_REPLAY = object()
+
+
+class EventSink:
+    """Base class of output sinks."""
+
+    def write_events(self, events):
+        """Write events to sink.
+        :param events: a single event or a list of events.
+        :return: `True` if events accepted else `False`.
+        """
+        raise NotImplementedError()
+
+    def write_batch(self, events):
+        """Write a list of events which were written separately before.
+        :return: `True` if all events accepted else `False`.
+        """
+        for event in events:
+            if not self.write_events(event):
+                return False
+        return True
+
+    def flush(self):
+        """Wait until events written so far are delivered.
+        :return: `False` if some of them couldn't be delivered.
+        """
+        return True
+
+    def close(self):
+        """Deliver pending events and release resources."""
+        pass
+
+
+class EventWriterSink(EventSink):
+    """Write events to the modular input event writer, or print events to
+    stdout if there is no event writer."""
+
+    def __init__(self, event_writer=None):
+        self._event_writer = event_writer
+
+    @property
+    def event_writer(self):
+        return self._event_writer
+
+    def write_events(self, events):
+        if not self._event_writer:
+            print(events, flush=True)
+            return True
+        return self._event_writer.write_events(events)
+
+    def write_batch(self, events):
+        if not self._event_writer:
+            print("\n".join(str(event) for event in events), flush=True)
+            return True
+        return self._event_writer.write_events(list(events))
+
+
+class HECSink(EventSink):
+    """
+    Send events to Splunk HTTP Event Collector. Events are put into a bounded
+    queue and sent by background threads in gzip compressed batches to the
+    `/services/collector/event` endpoint over pooled connections. Writers
+    block once the queue is full.
+
+    Splunk stream XML produced by `splunk_xml` is converted to HEC events
+    with its time, index, host, source and sourcetype, other strings are
+    sent as the event body with the default metadata of sink.
+
+    If acknowledgement is enabled, a batch is kept until it's acknowledged
+    by indexers and sent again if not acknowledged in time.
+    """
+
+    def __init__(
+        self,
+        url,
+        token,
+        index=None,
+        host=None,
+        source=None,
+        sourcetype=None,
+        use_ack=False,
+        channel=None,
+        batch_size=None,
+        batch_bytes=None,
+        queue_size=None,
+        flush_interval=None,
+        workers=None,
+        retries=None,
+        retry_backoff=1.0,
+        ack_timeout=None,
+        ack_poll_interval=None,
+        timeout=None,
+        compress=True,
+        disable_ssl_cert_validation=None,
+        session=None,
+    ):
+        """
+        :param url: base URL of HEC, e.g. `https://localhost:8088`.
+        :type url: ``string``
+        :param token: HEC token.
+        :type token: ``string``
+        :param index: default index of events.
+        :param host: default host of events.
+        :param source: default source of events.
+        :param sourcetype: default sourcetype of events.
+        :param use_ack: wait for indexer acknowledgement of each batch.
+        :type use_ack: ``bool``
+        :param channel: HEC channel, a random one is used if not given.
+        :type channel: ``string``
+        :param batch_size: maximum events in a request.
+        :type batch_size: ``integer``
+        :param batch_bytes: a batch is sent once its uncompressed size
+            reaches this size.
+        :type batch_bytes: ``integer``
+        :param queue_size: maximum events waiting to be sent.
+        :type queue_size: ``integer``
+        :param flush_interval: seconds to wait for a batch to fill up.
+        :type flush_interval: ``float``
+        :param workers: count of threads sending batches.
+        :type workers: ``integer``
+        :param retries: maximum retry times of a request.
+        :type retries: ``integer``
+        :param retry_backoff: seconds to wait before the first retry, doubled
+            for each retry and 30 seconds at most.
+        :type retry_backoff: ``float``
+        :param ack_timeout: seconds to wait for acknowledgement of a batch
+            before sending it again.
+        :type ack_timeout: ``float``
+        :param ack_poll_interval: seconds between two acknowledgement polls.
+        :type ack_poll_interval: ``float``
+        :param timeout: timeout in seconds of a request.
+        :type timeout: ``float``
+        :param compress: gzip request body.
+        :type compress: ``bool``
+        :param disable_ssl_cert_validation: skip server certificate validation.
+        :type disable_ssl_cert_validation: ``bool``
+        :param session: a `requests.Session` to use instead of a new one.
+        """
+        if not url or not token:
+            raise ConfigException("HEC url and token are required")
+
+        base_url = url.rstrip("/")
+        self._event_url = base_url + "/services/collector/event"
+        self._ack_url = base_url + "/services/collector/ack"
+        self._metadata = {
+            k: v
+            for k, v in (
+                ("index", index),
+                ("host", host),
+                ("source", source),
+                ("sourcetype", sourcetype),
+            )
+            if v
+        }
+        self._use_ack = use_ack
+        self._channel = channel or str(uuid.uuid4())
+        self._batch_size = max(batch_size or defaults.hec_batch_size, 1)
+        self._batch_bytes = max(batch_bytes or defaults.hec_batch_bytes, 1)
+        self._flush_interval = (
+            defaults.hec_flush_interval if flush_interval is None else flush_interval
+        )
+        self._retries = defaults.hec_retries if retries is None else retries
+        self._retry_backoff = retry_backoff
+        self._ack_timeout = ack_timeout or defaults.hec_ack_timeout
+        self._ack_poll_interval = ack_poll_interval or defaults.hec_ack_poll_interval
+        self._timeout = timeout or defaults.timeout
+        self._compress = compress
+        if disable_ssl_cert_validation is None:
+            disable_ssl_cert_validation = defaults.disable_ssl_cert_validation
+        self._verify = not disable_ssl_cert_validation
+
+        workers = max(workers or defaults.hec_workers, 1)
+        self._session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers + 1)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._headers = {
+            "Authorization": "Splunk " + token,
+            "Content-Type": "application/json",
+            "X-Splunk-Request-Channel": self._channel,
+        }
+        if self._compress:
+            self._headers["Content-Encoding"] = "gzip"
+
+        self._queue = queue.Queue(maxsize=queue_size or defaults.hec_queue_size)
+        self._lock = threading.Lock()
+        self._ack_lock = threading.Lock()
+        # ack id -> [body, event count, sent time, send times]
+        self._pending_acks = {}
+        self._last_ack_poll = 0
+        # failed_events when flush returned last time.
+        self._flushed_failures = 0
+        self._stats = {
+            "queued_events": 0,
+            "sent_events": 0,
+            "sent_batches": 0,
+            "sent_bytes": 0,
+            "failed_events": 0,
+            "retries": 0,
+            "acked_events": 0,
+        }
+        self._closed = False
+        self._flushing = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"hec-sink-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def channel(self):
+        return self._channel
+
+    def stats(self):
+        """Return counters of sink as a `dict`."""
+        with self._lock:
+            result = dict(self._stats)
+        result["queue_depth"] = self._queue.qsize()
+        result["pending_acks"] = len(self._pending_acks)
+        return result
+
+    def _incr(self, **kwargs):
+        with self._lock:
+            for name, value in kwargs.items():
+                self._stats[name] += value
+
+    def _to_hec_events(self, event):
+        if isinstance(event, dict):
+            if "event" in event:
+                yield event
+            else:
+                yield dict(self._metadata, event=event)
+            return
+        if not isinstance(event, str):
+            event = str(event)
+        if not event.startswith(_STREAM_START):
+            yield dict(self._metadata, event=event)
+            return
+
+        # A string starts with the root element can't carry a DTD, so it's
+        # safe to parse it with ElementTree.
+        try:
+            root = ET.fromstring(event)
+        except ET.ParseError:
+            yield dict(self._metadata, event=event)
+            return
+        for element in root.iter("event"):
+            record = dict(self._metadata)
+            stanza = element.get("stanza")
+            if stanza and "source" not in record:
+                record["source"] = stanza
+            data = ""
+            for child in element:
+                if child.tag == "data":
+                    data = child.text or ""
+                elif child.tag == "time":
+                    record["time"] = float(child.text)
+                elif child.tag in _METADATA_TAGS and child.text:
+                    record[child.tag] = child.text
+            record["event"] = data
+            yield record
+
+    def write_events(self, events):
+        if self._closed:
+            return False
+        if not isinstance(events, (list, tuple)):
+            events = [events]
+
+        items = [
+            json.dumps(record, separators=(",", ":")).encode("utf-8")
+            for event in events
+            for record in self._to_hec_events(event)
+        ]
+        with metrics.timer("hec_enqueue"):
+            for item in items:
+                while True:
+                    if self._closed:
+                        return False
+                    try:
+                        self._queue.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        self._incr(queued_events=len(items))
+        return True
+
+    def write_batch(self, events):
+        return self.write_events(list(events))
+
+    def _next_batch(self, wait):
+        try:
+            item = self._queue.get(timeout=wait)
+        except queue.Empty:
+            return []
+        batch = [item]
+        size = len(item)
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size and size < self._batch_bytes:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._flushing.is_set():
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            size += len(item)
+        return batch
+
+    def _run(self):
+        wait = self._flush_interval or 0.1
+        if self._use_ack:
+            wait = min(wait, self._ack_poll_interval)
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch(wait)
+            if batch:
+                try:
+                    self._send_batch(batch)
+                except Exception:
+                    _logger.exception("Failed to send %s events to HEC", len(batch))
+                    self._incr(failed_events=len(batch))
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            if self._use_ack:
+                self._poll_acks()
+
+    def _send_batch(self, batch):
+        body = b"\n".join(batch)
+        if self._compress:
+            body = gzip.compress(body, compresslevel=6)
+        sent, ack_id = self._post(body, len(batch))
+        if sent and self._use_ack and ack_id is not None:
+            with self._ack_lock:
+                self._pending_acks[ack_id] = [body, len(batch), time.monotonic(), 1]
+
+    def _post(self, body, count):
+        """Post a batch, return whether it's sent and the ack id returned."""
+        error = None
+        for attempt in range(self._retries + 1):
+            if attempt:
+                self._incr(retries=1)
+                backoff = self._retry_backoff * 2 ** (attempt - 1)
+                if self._stopping.wait(min(backoff, 30)):
+                    break
+            try:
+                with metrics.timer("hec_post"):
+                    response = self._session.post(
+                        self._event_url,
+                        data=body,
+                        headers=self._headers,
+                        timeout=self._timeout,
+                        verify=self._verify,
+                    )
+            except requests.RequestException as ex:
+                error = ex
+                continue
+            if response.status_code == 200:
+                self._incr(sent_events=count, sent_batches=1, sent_bytes=len(body))
+                metrics.incr("hec_events_sent", count)
+                try:
+                    return True, response.json().get("ackId")
+                except ValueError:
+                    return True, None
+            error = f"status={response.status_code} body={response.text[:200]}"
+            if response.status_code not in defaults.retry_statuses:
+                break
+        _logger.error("Dropped %s events failed to send to HEC: %s", count, error)
+        self._incr(failed_events=count)
+        return False, None
+
+    def _poll_acks(self):
+        now = time.monotonic()
+        if (
+            not self._pending_acks
+            or now - self._last_ack_poll < self._ack_poll_interval
+        ):
+            return
+        if not self._ack_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_ack_poll = now
+            pending = dict(self._pending_acks)
+            try:
+                response = self._session.post(
+                    self._ack_url,
+                    data=json.dumps({"acks": list(pending)}),
+                    headers={
+                        k: v
+                        for k, v in self._headers.items()
+                        if k != "Content-Encoding"
+                    },
+                    timeout=self._timeout,
+                    verify=self._verify,
+                )
+                acks = response.json().get("acks", {}) if response.ok else {}
+            except (requests.RequestException, ValueError) as ex:
+                _logger.warning("Failed to poll HEC acknowledgements: %s", ex)
+                acks = {}
+
+            expired = []
+            for ack_id, (body, count, sent_at, sends) in pending.items():
+                if acks.get(str(ack_id)):
+                    del self._pending_acks[ack_id]
+                    self._incr(acked_events=count)
+                elif now - sent_at >= self._ack_timeout:
+                    del self._pending_acks[ack_id]
+                    expired.append((body, count, sends))
+        finally:
+            self._ack_lock.release()
+
+        for body, count, sends in expired:
+            if sends > self._retries:
+                _logger.error(
+                    "Dropped %s events not acknowledged by HEC after %s sends",
+                    count,
+                    sends,
+                )
+                self._incr(failed_events=count)
+                continue
+            _logger.warning("%s events not acknowledged by HEC, resend them", count)
+            self._incr(retries=1)
+            sent, ack_id = self._post(body, count)
+            if sent and ack_id is not None:
+                with self._ack_lock:
+                    self._pending_acks[ack_id] = [
+                        body,
+                        count,
+                        time.monotonic(),
+                        sends + 1,
+                    ]
+
+    def flush(self):
+        """Wait until queued events are sent, and acknowledged if ack is
+        enabled. Return `False` if events were dropped since last flush."""
+        self._flushing.set()
+        try:
+            self._queue.join()
+        finally:
+            self._flushing.clear()
+        if self._use_ack:
+            deadline = time.monotonic() + self._ack_timeout * (self._retries + 1)
+            while self._pending_acks and time.monotonic() < deadline:
+                self._poll_acks()
+                time.sleep(0.05)
+        with self._lock:
+            failed = self._stats["failed_events"] - self._flushed_failures
+            self._flushed_failures = self._stats["failed_events"]
+        if failed:
+            _logger.warning("%s events failed to send to HEC since last flush", failed)
+        return not (failed or self._pending_acks)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._session.close()
+        _logger.info("HEC sink closed, stats=%s", self.stats())
+
+
+class AsyncSink(EventSink):
+    """
+    Write events to another sink in a dedicated writer thread, so that a slow
+    event writer or stdout pipe doesn't stall collection. Writes are buffered
+    in a bounded queue and drained in batches. Producers block once the queue
+    is full, unless `spill_dir` is given.
+
+    With `spill_dir`, writes are appended to a `SpillJournal` there once the
+    queue is full, and batches the underlying sink rejects are appended to it
+    too instead of being dropped. Spilled writes are written in order after
+    the queue is drained, retried every `async_spill_retry_interval` seconds
+    while the sink rejects them, and replayed after a restart if the process
+    exits before writing them.
+
+    A write is accepted once it's queued or spilled, callers must `flush`
+    before recording progress, e.g. persisting a checkpoint, which depends
+    on the events being delivered. `flush` returns once queued writes are
+    delivered or spilled and spilled writes are on disk. Without a flush,
+    writes pending in memory are lost if the process dies, the sink is
+    at-most-once for them.
+
+    Without `spill_dir`, if the underlying sink fails to write a batch, the
+    batch is dropped and all following writes are rejected, like the
+    underlying sink does.
+    """
+
+    def __init__(
+        self,
+        sink,
+        queue_size=None,
+        batch_size=None,
+        spill_dir=None,
+        spill_max_bytes=None,
+    ):
+        """
+        :param sink: sink events are written to.
+        :type sink: ``EventSink``
+        :param queue_size: maximum writes buffered in memory.
+        :type queue_size: ``integer``
+        :param batch_size: maximum writes passed to sink at once.
+        :type batch_size: ``integer``
+        :param spill_dir: directory of the journal writes are spilled to
+            once the queue is full or the sink rejects them, producers block
+            and rejected writes are dropped if not given.
+        :type spill_dir: ``string``
+        :param spill_max_bytes: maximum size of the journal, see
+            `SpillJournal`.
+        :type spill_max_bytes: ``integer``
+        """
+        self._sink = sink
+        self._queue_size = max(queue_size or defaults.async_queue_size, 1)
+        self._batch_size = max(batch_size or defaults.async_batch_size, 1)
+        self._journal = None
+        if spill_dir:
+            self._journal = SpillJournal(
+                spill_dir, fsync=False, max_bytes=spill_max_bytes
+            )
+        # Writes are spilled while the journal has records to keep them in
+        # order, e.g. records left by last run.
+        self._spilling = bool(self._journal is not None and len(self._journal))
+        self._retry_at = 0
+        self._queue = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._failed = False
+        self._stopping = False
+        self._stats = {
+            "written_events": 0,
+            "written_batches": 0,
+            "dropped_events": 0,
+            "spilled_events": 0,
+            "replayed_events": 0,
+            "blocked_writes": 0,
+            "blocked_seconds": 0.0,
+            "max_queue_depth": 0,
+        }
+        self._thread = threading.Thread(
+            target=self._run, name="async-sink-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def sink(self):
+        return self._sink
+
+    def stats(self):
+        """Return counters of sink as a `dict`."""
+        with self._cond:
+            result = dict(self._stats)
+            result["queue_depth"] = len(self._queue)
+            result["spill_depth"] = len(self._journal) if self._journal else 0
+        return result
+
+    def _spill(self, writes):
+        """Append writes to the journal, return `False` if they are dropped."""
+        try:
+            self._journal.append(writes)
+        except (OSError, TypeError, ValueError):
+            _logger.exception("Failed to spill %s events", len(writes))
+            return False
+        if not self._spilling:
+            _logger.warning(
+                "The event writer is stalled or unavailable, spill events to %s",
+                self._journal.directory,
+            )
+            self._spilling = True
+        self._stats["spilled_events"] += len(writes)
+        metrics.incr("output_spilled", len(writes))
+        return True
+
+    def write_events(self, events):
+        with self._cond:
+            if self._journal is None:
+                started = None
+                while len(self._queue) >= self._queue_size and not (
+                    self._failed or self._closed
+                ):
+                    if started is None:
+                        started = time.monotonic()
+                    self._cond.wait(0.5)
+                if started is not None:
+                    blocked = time.monotonic() - started
+                    self._stats["blocked_writes"] += 1
+                    self._stats["blocked_seconds"] += blocked
+                    metrics.observe("output_blocked", blocked)
+            if self._failed or self._closed:
+                return False
+
+            if self._journal is not None and (
+                self._spilling or len(self._queue) >= self._queue_size
+            ):
+                if not self._spill([events]):
+                    self._stats["dropped_events"] += 1
+                    return False
+            else:
+                self._queue.append(events)
+                depth = len(self._queue)
+                if depth > self._stats["max_queue_depth"]:
+                    self._stats["max_queue_depth"] = depth
+            self._cond.notify_all()
+        return True
+
+    def _take(self):
+        """Return the next batch to write, `_REPLAY` to write spilled
+        writes, or `None` once the sink is stopping."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    count = min(len(self._queue), self._batch_size)
+                    batch = [self._queue.popleft() for _ in range(count)]
+                    self._in_flight = len(batch)
+                    self._cond.notify_all()
+                    return batch
+                if self._journal is not None and len(self._journal):
+                    wait = self._retry_at - time.monotonic()
+                    if wait <= 0:
+                        return _REPLAY
+                    if self._stopping:
+                        return None
+                    self._cond.wait(wait)
+                    continue
+                self._spilling = False
+                if self._stopping:
+                    return None
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            if batch is _REPLAY:
+                self._replay()
+            else:
+                self._write(batch)
+
+    def _write(self, batch):
+        written = False
+        if not self._failed:
+            try:
+                written = self._sink.write_batch(batch)
+            except Exception:
+                _logger.exception("Failed to write %s events", len(batch))
+        with self._cond:
+            self._in_flight = 0
+            if written:
+                self._stats["written_events"] += len(batch)
+                self._stats["written_batches"] += 1
+            elif self._journal is not None and not self._failed:
+                # Queued writes are spilled too, so that they are written
+                # after the rejected batch.
+                batch.extend(self._queue)
+                self._queue.clear()
+                if self._spill(batch):
+                    self._retry_later()
+                else:
+                    self._stats["dropped_events"] += len(batch)
+                    self._failed = True
+            else:
+                self._stats["dropped_events"] += len(batch)
+                if not self._failed:
+                    _logger.error(
+                        "The event writer is stopped or encountered "
+                        "exception, %s events are discarded",
+                        len(batch),
+                    )
+                self._failed = True
+            self._cond.notify_all()
+
+    def _retry_later(self):
+        self._retry_at = time.monotonic() + defaults.async_spill_retry_interval
+
+    def _replay(self):
+        """Write a batch of spilled writes, retry later if the sink rejects
+        them."""
+        written = []
+        rejected = []
+
+        def _write_spilled(batch):
+            try:
+                if self._sink.write_batch(batch):
+                    written.append(len(batch))
+                    return True
+            except Exception:
+                _logger.exception("Failed to write %s spilled events", len(batch))
+            rejected.append(len(batch))
+            return False
+
+        try:
+            self._journal.replay(_write_spilled, max_records=self._batch_size)
+        except (OSError, ValueError):
+            _logger.exception("Failed to replay spill journal")
+            rejected.append(0)
+        with self._cond:
+            self._stats["written_events"] += sum(written)
+            self._stats["written_batches"] += len(written)
+            self._stats["replayed_events"] += sum(written)
+            if rejected:
+                self._retry_later()
+            self._cond.notify_all()
+
+    def _drained(self):
+        return not (self._queue or self._in_flight)
+
+    def flush(self):
+        with self._cond:
+            while not (self._drained() or self._failed):
+                self._cond.wait(0.5)
+            failed = self._failed
+        if self._journal is not None:
+            try:
+                self._journal.sync()
+            except OSError:
+                _logger.exception("Failed to flush spill journal")
+                failed = True
+        return self._sink.flush() is not False and not failed
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            while not (self._drained() or self._failed):
+                self._cond.wait(0.5)
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._journal is not None:
+            if len(self._journal):
+                _logger.warning(
+                    "%s spilled writes are left in %s, they are written after "
+                    "restart",
+                    len(self._journal),
+                    self._journal.directory,
+                )
+            self._journal.sync()
+            self._journal.close()
+        self._sink.close()
+        _logger.info("Async sink closed, stats=%s", self.stats())
@@ -0,0 +1,284 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Append-only journal `AsyncSink` spills writes to when its sink is stalled
+or unavailable, so that they are written once the sink recovers or after
+restart instead of being discarded.
+
+A journal is a directory of segment files. Each record is the JSON encoded
+list of writes, prefixed with its length and CRC32, so a record torn by a
+crash is detected and ignored. Records are flushed to disk before `append`
+returns if `fsync` is enabled, or by `sync` otherwise. The position of the
+next record to replay is kept in a cursor file, which is saved every
+`cursor_interval` records and once a segment is replayed, segments are
+removed once replayed. The journal is capped at `max_bytes`, the oldest
+segments are evicted once it grows beyond.
+"""
+
+import json
+import os
+import os.path as op
+import struct
+import threading
+import zlib
+
+from ..common.log import get_cc_logger
+from . import defaults
+
+_logger = get_cc_logger()
+
+_HEADER = struct.Struct(">II")
+_SEGMENT_SUFFIX = ".journal"
+_CURSOR_FILE = "cursor.json"
+
+
+class SpillJournal:
+    def __init__(
+        self,
+        directory,
+        segment_bytes=None,
+        fsync=True,
+        max_bytes=None,
+        cursor_interval=None,
+    ):
+        """
+        :param directory: directory of segment files.
+        :type directory: ``string``
+        :param segment_bytes: a new segment is started once current one
+            exceeds this size.
+        :type segment_bytes: ``integer``
+        :param fsync: flush records to disk before `append` returns, or
+            only when `sync` is called.
+        :type fsync: ``bool``
+        :param max_bytes: maximum size of all segments, the oldest segments
+            are evicted with their records once it's exceeded, 0 means
+            unlimited.
+        :type max_bytes: ``integer``
+        :param cursor_interval: records replayed between two saves of the
+            cursor, at most this many records are replayed again after a
+            crash during replay.
+        :type cursor_interval: ``integer``
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._segment_bytes = segment_bytes or defaults.spill_journal_segment_bytes
+        self._fsync = fsync
+        self._max_bytes = (
+            defaults.spill_journal_max_bytes if max_bytes is None else max_bytes
+        )
+        self._cursor_interval = max(
+            cursor_interval or defaults.spill_journal_cursor_interval, 1
+        )
+        self._lock = threading.Lock()
+        self._writer = None
+        self._segments = self._list_segments()
+        self._bytes = sum(
+            op.getsize(self._segment_path(sequence)) for sequence in self._segments
+        )
+        self._cursor = self._load_cursor()
+        self._next_sequence = max(self._segments[-1:] + [self._cursor[0]]) + 1
+        self._pending = self._count_pending()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def __len__(self):
+        """Count of records not replayed yet."""
+        return self._pending
+
+    @property
+    def size(self):
+        """Bytes of all segment files."""
+        return self._bytes
+
+    def _segment_path(self, sequence):
+        return op.join(self._directory, f"{sequence:020d}{_SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        return sorted(
+            int(name[: -len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self._directory)
+            if name.endswith(_SEGMENT_SUFFIX)
+            and name[: -len(_SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def _load_cursor(self):
+        path = op.join(self._directory, _CURSOR_FILE)
+        try:
+            with open(path) as f:
+                cursor = json.load(f)
+            return int(cursor["segment"]), int(cursor["offset"])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError):
+            _logger.warning(
+                "Invalid spill journal cursor %s, replay from beginning", path
+            )
+        return (self._segments[0] if self._segments else 0), 0
+
+    def _save_cursor(self):
+        path = op.join(self._directory, _CURSOR_FILE)
+        temp = path + ".tmp"
+        segment, offset = self._cursor
+        with open(temp, "w") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            if self._fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    def _read_records(self, sequence, offset):
+        """Yield (records, end offset) of a segment from `offset`, stop at
+        the first torn or corrupted record."""
+        with open(self._segment_path(sequence), "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    _logger.warning(
+                        "Ignore torn record in spill journal segment %s offset %s",
+                        self._segment_path(sequence),
+                        offset,
+                    )
+                    return
+                offset += _HEADER.size + length
+                yield json.loads(payload.decode("utf-8")), offset
+
+    def _count_records(self, sequence):
+        """Count records of a segment not replayed yet."""
+        if sequence < self._cursor[0]:
+            return 0
+        offset = self._cursor[1] if sequence == self._cursor[0] else 0
+        return sum(1 for _ in self._read_records(sequence, offset))
+
+    def _count_pending(self):
+        return sum(self._count_records(sequence) for sequence in self._segments)
+
+    def append(self, events):
+        """Append a record of events.
+        :param events: list of events which could be dumped as JSON.
+        """
+        payload = json.dumps(events).encode("utf-8")
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._writer is None or self._writer.tell() >= self._segment_bytes:
+                self._open_segment()
+            self._writer.write(record)
+            self._writer.flush()
+            if self._fsync:
+                os.fsync(self._writer.fileno())
+            self._pending += 1
+            self._bytes += len(record)
+            if 0 < self._max_bytes < self._bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove the oldest segments until the journal fits in `max_bytes`,
+        the segment being written is kept."""
+        dropped = 0
+        while self._bytes > self._max_bytes and len(self._segments) > 1:
+            sequence = self._segments[0]
+            dropped += self._count_records(sequence)
+            if sequence >= self._cursor[0]:
+                self._cursor = (sequence + 1, 0)
+                self._save_cursor()
+            self._remove_segment(sequence)
+        if dropped:
+            self._pending -= dropped
+            _logger.warning(
+                "Spill journal %s exceeds %s bytes, discard %s oldest records",
+                self._directory,
+                self._max_bytes,
+                dropped,
+            )
+
+    def sync(self):
+        """Flush records appended so far to disk."""
+        with self._lock:
+            if self._writer is not None:
+                os.fsync(self._writer.fileno())
+
+    def _open_segment(self):
+        if self._writer is not None:
+            # Only the segment being written is flushed by `sync`.
+            if not self._fsync:
+                os.fsync(self._writer.fileno())
+            self._writer.close()
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._writer = open(self._segment_path(sequence), "ab")
+        self._segments.append(sequence)
+        if not self._pending:
+            self._cursor = (sequence, 0)
+
+    def replay(self, write, max_records=None):
+        """Replay records in order with `write`, which returns `False` if the
+        record can't be written, replay stops at that record.
+        :param max_records: stop after replaying this many records, all
+            records are replayed if not given.
+        :type max_records: ``integer``
+        :return: count of records replayed.
+        """
+        replayed = 0
+        with self._lock:
+            if not self._pending:
+                return 0
+            for sequence in list(self._segments):
+                if sequence < self._cursor[0]:
+                    self._remove_segment(sequence)
+                    continue
+                offset = self._cursor[1] if sequence == self._cursor[0] else 0
+                for events, end in self._read_records(sequence, offset):
+                    if replayed == max_records or not write(events):
+                        self._save_cursor()
+                        return replayed
+                    self._cursor = (sequence, end)
+                    self._pending -= 1
+                    replayed += 1
+                    if replayed % self._cursor_interval == 0:
+                        self._save_cursor()
+                # Records appended to the segment being written are replayed
+                # too, it's closed so that it could be removed.
+                if self._writer is not None and sequence == self._segments[-1]:
+                    self._writer.close()
+                    self._writer = None
+                # Save the cursor first, a segment left behind by a crash
+                # is behind the cursor and removed on next replay.
+                self._cursor = (sequence + 1, 0)
+                self._save_cursor()
+                self._remove_segment(sequence)
+            self._pending = 0
+        return replayed
+
+    def _remove_segment(self, sequence):
+        self._segments.remove(sequence)
+        path = self._segment_path(sequence)
+        try:
+            self._bytes -= op.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -15,10 +15,13 @@
 #
 import copy
 import threading
+import time
+import traceback
 from abc import abstractmethod
 
 from cloudconnectlib.common.log import get_cc_logger
-from cloudconnectlib.core import defaults
+from cloudconnectlib.core import defaults, metrics, offload
+from cloudconnectlib.core.cache import HTTPValidatorCache
 from cloudconnectlib.core.checkpoint import CheckpointManagerAdapter
 from cloudconnectlib.core.exceptions import (
     CCESplitError,
@@ -26,13 +29,18 @@ from cloudconnectlib.core.exceptions import (
     QuitJobError,
     StopCCEIteration,
 )
-from cloudconnectlib.core.ext import lookup_method
-from cloudconnectlib.core.http import HttpClient, get_proxy_info
+from cloudconnectlib.core.ext import lookup_batch_method, lookup_method
+from cloudconnectlib.core.http import HttpClient, get_proxy_info, is_blank_body
 from cloudconnectlib.core.models import BasicAuthorization, DictToken, Request, _Token
+from cloudconnectlib.core.pipemgr import PipeManager
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_consts as c
 
 logger = get_cc_logger()
 
 _RESPONSE_KEY = "__response__"
+# Count of leading pre-process handlers already executed for a context by
+# `BaseTask.batch_pre_process`.
+_BATCHED_KEY = "__cce_batched_handlers__"
 _AUTH_TYPES = {"basic_auth": BasicAuthorization}
 
 
@@ -43,10 +51,11 @@ class ProcessHandler:
         self.output = output
 
     def execute(self, context):
-        args = [arg.render(context) for arg in self.arguments]
-        logger.debug("%s arguments found for method %s", len(args), self.method)
-        callable_method = lookup_method(self.method)
-        result = callable_method(*args)
+        with metrics.timer("handler." + self.method):
+            args = [arg.render(context) for arg in self.arguments]
+            logger.debug("%s arguments found for method %s", len(args), self.method)
+            callable_method = lookup_method(self.method)
+            result = callable_method(*args)
 
         data = {}
         if self.output:
@@ -54,6 +63,38 @@ class ProcessHandler:
 
         return data
 
+    def execute_batch(self, contexts):
+        """
+        Execute the batch variant of the method once over contexts, the
+        output of each context is updated with its result. Return False if
+        the method has no batch variant.
+        """
+        batch_method = lookup_batch_method(self.method)
+        if batch_method is None:
+            return False
+        with metrics.timer("batch_handler." + self.method):
+            columns = [
+                [arg.render(context) for context in contexts] for arg in self.arguments
+            ]
+            results = batch_method(*columns)
+        if results is None or len(results) != len(contexts):
+            logger.warning(
+                "Batch method %s returned %s results for %s elements, "
+                "execute it for each element instead",
+                self.method,
+                "no" if results is None else len(results),
+                len(contexts),
+            )
+            return False
+        if self.output:
+            for context, result in zip(contexts, results):
+                context[self.output] = result
+        return True
+
+
+def _handler_spec(handler):
+    return handler.method, [arg.source for arg in handler.arguments], handler.output
+
 
 class Condition:
     def __init__(self, method, arguments):
@@ -77,6 +118,9 @@ class ConditionGroup:
     def is_meet(self, context):
         return any(cdn.is_meet(context) for cdn in self._conditions)
 
+    def __len__(self):
+        return len(self._conditions)
+
 
 class ProxyTemplate:
     def __init__(self, proxy_setting):
@@ -219,7 +263,7 @@ class BaseTask:
         self._skip_post_conditions.add(Condition(method, input))
 
     @staticmethod
-    def _execute_handlers(skip_conditions, handlers, context, phase):
+    def _execute_handlers(skip_conditions, handlers, context, phase, offloaded=False):
         if skip_conditions.is_meet(context):
             logger.debug("%s process skip conditions are met", phase.capitalize())
             return
@@ -227,28 +271,107 @@ class BaseTask:
             logger.debug("No handler found in %s process", phase)
             return
 
-        for handler in handlers:
+        def _execute(handler):
             data = handler.execute(context)
             if data:
                 # FIXME
                 context.update(data)
-            if context.get("is_token_refreshed"):
-                # In case of OAuth flow after refreshing access token retrying again with the query to collect records
-                logger.info(
-                    "The access token is refreshed hence skipping the rest post process handler tasks. Retrying again."
-                )
-                return
+            return not context.get("is_token_refreshed")
+
+        if offloaded:
+            finished = offload.execute(
+                handlers, _handler_spec, context, _execute, "is_token_refreshed"
+            )
+        else:
+            finished = all(_execute(handler) for handler in handlers)
+        if not finished:
+            # In case of OAuth flow after refreshing access token retrying again with the query to collect records
+            logger.info(
+                "The access token is refreshed hence skipping the rest post process handler tasks. Retrying again."
+            )
+            return
         logger.debug("Execute handlers finished successfully.")
 
-    def _pre_process(self, context):
-        self._execute_handlers(
-            self._skip_pre_conditions, self._pre_process_handler, context, "pre"
+    def batch_pre_process(self, contexts):
+        """
+        Execute leading pre-process handlers having batch variants once over
+        all contexts, e.g. the contexts split by the previous task, instead of
+        once for each context. They are skipped by the next pre-process of
+        each context.
+        :param contexts: contexts this task is going to perform with.
+        :type contexts: ``list``
+        """
+        if len(contexts) < 2 or len(self._skip_pre_conditions):
+            return
+        handlers = self._pre_process_handler
+        if not handlers or not self._is_batchable(handlers[0]):
+            return
+        count = 0
+        for handler in handlers:
+            if not self._is_batchable(handler):
+                break
+            try:
+                if not handler.execute_batch(contexts):
+                    break
+            except Exception:
+                # Let each context fail or stop on its own as without batch
+                logger.warning(
+                    "Batch method %s failed, execute it for each element "
+                    "instead: %s",
+                    handler.method,
+                    traceback.format_exc(),
+                )
+                break
+            count += 1
+        if count:
+            logger.debug(
+                "Executed %s pre-process handlers once for %s contexts",
+                count,
+                len(contexts),
+            )
+            for context in contexts:
+                context[_BATCHED_KEY] = count
+
+    def _is_batchable(self, handler):
+        """A handler could be executed ahead of `perform` if it has a batch
+        variant and doesn't use variables `perform` sets before pre-process,
+        e.g. the checkpoint."""
+        if lookup_batch_method(handler.method) is None:
+            return False
+        names = self._perform_variables()
+        if not names:
+            return True
+        if handler.output in names:
+            return False
+        return not any(
+            names & offload._referenced_names(arg.source)
+            for arg in handler.arguments
+            if isinstance(arg.source, str)
         )
 
-    def _post_process(self, context):
-        self._execute_handlers(
-            self._skip_post_conditions, self._post_process_handler, context, "post"
-        )
+    def _perform_variables(self):
+        """Return names of variables `perform` sets before pre-process."""
+        return frozenset()
+
+    def _pre_process(self, context):
+        handlers = self._pre_process_handler
+        batched = context.pop(_BATCHED_KEY, 0)
+        if batched:
+            handlers = handlers[batched:]
+            if not handlers:
+                return
+        with metrics.timer("pre_process"):
+            self._execute_handlers(self._skip_pre_conditions, handlers, context, "pre")
+
+    def _post_process(self, context, offloaded=False):
+        with metrics.timer("post_process"):
+            self._execute_handlers(
+                self._skip_post_conditions,
+                self._post_process_handler,
+                context,
+                "post",
+                offloaded,
+            )
 
     @abstractmethod
     def perform(self, context):
@@ -328,6 +451,20 @@ class CCEHTTPRequestTask(BaseTask):
             To handle status code using custom logic, return (response, bool).
                 Bool decides whether to break or continue the code flow
         :type custom_func: ``function``
+        :param conditional_request: Send conditional requests with the
+            `ETag`/`Last-Modified` validators of previous responses which are
+            persisted alongside checkpoint. Only takes effect when checkpoint
+            is configured.
+        :type conditional_request: ``bool``
+        :param compress_request_body: Gzip request body which is large
+            enough before sending it.
+        :type compress_request_body: ``bool``
+        :param max_response_size: Maximum size in bytes of a response, the
+            task stops with an error once it's exceeded. 0 means unlimited.
+        :type max_response_size: ``integer``
+        :param offload_post_process: Run side-effect free post-process
+            handlers in worker processes, see `core.offload`.
+        :type offload_post_process: ``bool``
         """
         super().__init__(name)
         self._request = RequestTemplate(request)
@@ -336,16 +473,26 @@ class CCEHTTPRequestTask(BaseTask):
         self._max_iteration_count = defaults.max_iteration_count
 
         self._checkpointer = None
+        self._checkpoint_variables = frozenset()
         self._task_config = task_config
         self._meta_config = meta_config
 
         self._http_client = None
+        self._validator_cache = None
         self._authorizer = None
         self._stopped = threading.Event()
         self._stop_signal_received = False
         if kwargs.get("custom_func"):
             self.custom_handle_status_code = kwargs["custom_func"]
         self.requests_verify = kwargs.get("verify", True)
+        self._conditional_request = kwargs.get(
+            "conditional_request", defaults.conditional_request
+        )
+        self._compress_request_body = kwargs.get("compress_request_body", False)
+        self._max_response_size = kwargs.get("max_response_size")
+        self._offload_post_process = kwargs.get(
+            "offload_post_process", defaults.offload_post_process
+        )
 
     def stop(self, block=False, timeout=30):
         """
@@ -453,6 +600,7 @@ class CCEHTTPRequestTask(BaseTask):
             meta_config=self._meta_config,
             task_config=self._task_config,
         )
+        self._checkpoint_variables = frozenset(content)
 
     def _should_exit(self, done_count, context):
         if 0 < self._max_iteration_count <= done_count:
@@ -478,8 +626,18 @@ class CCEHTTPRequestTask(BaseTask):
 
         status = response.status_code
 
+        if status == defaults.not_modified_status:
+            logger.info(
+                "The response of request which url=%s and method=%s is not"
+                " modified since last request, status=%s.",
+                request.url,
+                request.method,
+                status,
+            )
+            return None, True
+
         if status in defaults.success_statuses:
-            if not (response.body or "").strip():
+            if is_blank_body(response):
                 logger.info(
                     "The response body of request which url=%s and"
                     " method=%s is empty, status=%s.",
@@ -511,12 +669,42 @@ class CCEHTTPRequestTask(BaseTask):
         if not self._checkpointer:
             logger.debug("Checkpoint is not configured. Skip persisting checkpoint.")
             return
+        # Events must be delivered before the checkpoint moves past them.
+        if not PipeManager().flush():
+            logger.error(
+                "Events written so far are not delivered, checkpoint is not"
+                " persisted."
+            )
+            return
         try:
             self._checkpointer.save(context)
         except Exception:
             logger.exception("Error while persisting checkpoint")
+            return
         else:
             logger.debug("Checkpoint has been updated successfully.")
+        self._persist_validators(context)
+
+    def _persist_validators(self, context):
+        cache = self._validator_cache
+        if cache is None or not cache.dirty or not len(cache):
+            return
+        try:
+            self._checkpointer.save_validators(context, cache.dump())
+        except Exception:
+            logger.exception("Error while persisting HTTP validators")
+        else:
+            cache.mark_clean()
+
+    def _load_validator_cache(self, ctx):
+        if not (self._checkpointer and self._conditional_request):
+            return None
+        try:
+            validators = self._checkpointer.load_validators(ctx)
+        except Exception:
+            logger.exception("Error while loading HTTP validators")
+            validators = None
+        return HTTPValidatorCache(validators)
 
     def _load_checkpoint(self, ctx):
         if not self._checkpointer:
@@ -526,20 +714,32 @@ class CCEHTTPRequestTask(BaseTask):
 
     def _prepare_http_client(self, ctx):
         proxy = self._proxy_info.render(ctx) if self._proxy_info else None
-        self._http_client = HttpClient(proxy, self.requests_verify)
+        self._validator_cache = self._load_validator_cache(ctx)
+        self._http_client = HttpClient(
+            proxy,
+            self.requests_verify,
+            validator_cache=self._validator_cache,
+            compress_request_body=self._compress_request_body,
+            max_response_size=self._max_response_size,
+            breaker_scope=(self._task_config or {}).get(c.stanza_name),
+        )
 
     def _flush_checkpoint(self):
         if self._checkpointer:
             # Flush checkpoint cache to disk
             self._checkpointer.close()
 
+    def _perform_variables(self):
+        return self._checkpoint_variables
+
     def perform(self, context):
         logger.info("Starting to perform task=%s", self)
+        started = time.perf_counter()
 
-        self._prepare_http_client(context)
         done_count = 0
 
         context.update(self._load_checkpoint(context))
+        self._prepare_http_client(context)
         update_source = False if context.get("source") else True
         self._request.reset()
 
@@ -556,10 +756,12 @@ class CCEHTTPRequestTask(BaseTask):
             if self._check_if_stop_needed():
                 break
 
-            r = self._request.render(context)
-            if self._authorizer:
-                self._authorizer(r.headers, context)
+            with metrics.timer("render"):
+                r = self._request.render(context)
+                if self._authorizer:
+                    self._authorizer(r.headers, context)
 
+            metrics.incr("requests")
             response, need_exit = self._send_request(r)
             context[_RESPONSE_KEY] = response
 
@@ -575,7 +777,7 @@ class CCEHTTPRequestTask(BaseTask):
                 context["source"] = r.url.split("?")[0]
 
             try:
-                self._post_process(context)
+                self._post_process(context, self._offload_post_process)
             except StopCCEIteration:
                 logger.info("Task=%s exits in post_process stage", self)
                 break
@@ -583,7 +785,8 @@ class CCEHTTPRequestTask(BaseTask):
                 self._flush_checkpoint()
                 raise
 
-            self._persist_checkpoint(context)
+            with metrics.timer("checkpoint"):
+                self._persist_checkpoint(context)
 
             if self._check_if_stop_needed():
                 break
@@ -593,6 +796,7 @@ class CCEHTTPRequestTask(BaseTask):
                 break
         if update_source and context.get("source"):
             del context["source"]
+        metrics.observe("task", time.perf_counter() - started)
         yield context
 
         self._stopped.set()
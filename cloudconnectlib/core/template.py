@@ -21,16 +21,48 @@ from jinja2 import Template
 # token1}}", "{{ token2 }"
 PATTERN = re.compile(r"^\{\{\s*(\w+)\s*\}\}$")
 
+# This pattern matches the template with only one attribute lookup inside like
+# "{{ __response__.body }}"
+ATTR_PATTERN = re.compile(r"^\{\{\s*(\w+(?:\.\w+)+)\s*\}\}$")
+
+# Attribute values of these types are returned without rendering. Rendering
+# a string returns it as it is and bytes can't be rendered meaningfully.
+_RAW_TYPES = (str, bytes, bytearray, memoryview)
+
+_MISSING = object()
+
+
+def _lookup(context, path):
+    """Lookup a dotted path in context the same way as jinja2 does"""
+    value = context.get(path[0], _MISSING)
+    for name in path[1:]:
+        if value is _MISSING:
+            break
+        try:
+            value = getattr(value, name)
+        except AttributeError:
+            try:
+                value = value[name]
+            except (TypeError, LookupError):
+                value = _MISSING
+    return value
+
 
 def compile_template(template):
     _origin_template = template
     _template = Template(template)
+    match = re.match(PATTERN, _origin_template)
+    attr_match = None if match else re.match(ATTR_PATTERN, _origin_template)
+    path = attr_match.group(1).split(".") if attr_match else None
 
     def translate_internal(context):
-        match = re.match(PATTERN, _origin_template)
         if match:
             context_var = context.get(match.groups()[0])
             return context_var if context_var else ""
+        if path:
+            value = _lookup(context, path)
+            if isinstance(value, _RAW_TYPES):
+                return value
         return _template.render(context)
 
     return translate_internal
@@ -15,10 +15,10 @@
 #
 import configparser
 import os.path as op
+import sys
 
 from ..common.lib_util import get_app_root_dir, get_main_file, get_mod_input_script_name
 from .data_collection import ta_mod_input as ta_input
-from .ta_cloud_connect_client import TACloudConnectClient as CollectorCls
 
 
 def _load_options_from_inputs_spec(app_root, stanza_name):
@@ -75,8 +75,12 @@ def run(single_instance=False):
     ucc_config_path = _find_ucc_global_config_json(app_root, "globalConfig.json")
 
     schema_params = _load_options_from_inputs_spec(app_root, script_name)
+    collector_cls = None
+    if len(sys.argv) <= 1:
+        # Only running inputs needs the collector and its dependencies
+        from .ta_cloud_connect_client import TACloudConnectClient as collector_cls
     ta_input.main(
-        CollectorCls,
+        collector_cls,
         schema_file_path=ucc_config_path,
         log_suffix=script_name,
         cc_json_file=cce_config_file,
@@ -13,10 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import json
 import logging
+import os.path as op
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
 from solnlib import log
 
+# Maximum records waiting in queue before logging threads get blocked.
+LOG_QUEUE_SIZE = 10000
+
 
 def set_log_level(log_level):
     """
@@ -65,3 +73,142 @@ def reset_logger(name):
 
     global logger
     logger = log.Logs().get_logger(name)
+
+
+class LazyJson:
+    """Serialize `obj` to JSON only when a log record is really emitted."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        try:
+            return json.dumps(self.obj)
+        except (TypeError, ValueError):
+            return repr(self.obj)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler which only merges message arguments in the logging thread,
+    formatting and I/O are left to the handlers run by `QueueListener`.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # Block instead of dropping records once the queue is full
+        self.queue.put(record)
+
+
+_queue_listeners = {}
+_queue_lock = threading.Lock()
+
+
+def start_queue_logging(target=None, maxsize=LOG_QUEUE_SIZE):
+    """
+    Move the handlers of logger `target` behind a queue, so that records are
+    formatted and written by a background thread instead of the thread
+    logging them. Global logger is used if `target` is not given.
+    """
+    target = target or logger
+    with _queue_lock:
+        if target.name in _queue_listeners:
+            return
+        handlers = [h for h in target.handlers if not isinstance(h, QueueHandler)]
+        if not handlers:
+            return
+        log_queue = queue.Queue(maxsize)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            target.removeHandler(handler)
+        target.addHandler(_DeferredQueueHandler(log_queue))
+        listener.start()
+        _queue_listeners[target.name] = (target, listener)
+
+
+def stop_queue_logging():
+    """Flush queued records and restore handlers of all queued loggers."""
+    with _queue_lock:
+        listeners = list(_queue_listeners.values())
+        _queue_listeners.clear()
+    for target, listener in listeners:
+        listener.stop()
+        for handler in list(target.handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                target.removeHandler(handler)
+        for handler in listener.handlers:
+            target.addHandler(handler)
+
+
+class _ForwardHandler(QueueHandler):
+    """
+    Handler which sends records to another process with `send`, it takes
+    the place of the file handler of a logger so that only one process
+    writes and rotates the log file.
+    """
+
+    def __init__(self, send, base_filename):
+        super().__init__(None)
+        self._send = send
+        # solnlib checks it to avoid adding the file handler again
+        self.baseFilename = base_filename
+
+    def enqueue(self, record):
+        self._send(record)
+
+
+def _forward_file_handlers(target, send):
+    for handler in list(target.handlers):
+        if isinstance(handler, logging.FileHandler):
+            target.removeHandler(handler)
+            handler.close()
+            target.addHandler(_ForwardHandler(send, handler.baseFilename))
+
+
+def forward_logging(send):
+    """
+    Replace the file handlers of loggers in current process with handlers
+    passing records to `send`, which should deliver them to a process
+    calling `handle_forwarded_record`. Loggers created later by
+    `solnlib.log.Logs` are forwarded as soon as they are created.
+    """
+    for target in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(target, logging.Logger):
+            _forward_file_handlers(target, send)
+
+    logs = log.Logs()
+    # The hook is set on the singleton instead of the class of solnlib
+    logs.__dict__.pop("get_logger", None)
+    get_logger = logs.get_logger
+
+    def _get_logger(name):
+        target = get_logger(name)
+        _forward_file_handlers(target, send)
+        return target
+
+    logs.get_logger = _get_logger
+
+
+def stop_forward_logging():
+    """Stop forwarding loggers created later, see `forward_logging`."""
+    log.Logs().__dict__.pop("get_logger", None)
+
+
+def handle_forwarded_record(record):
+    """Handle a record forwarded by `forward_logging` of another process."""
+    target = logging.getLogger(record.name)
+    if not target.handlers and record.name.endswith(".log"):
+        # Loggers of solnlib are named by their log files
+        name = op.basename(record.name)[: -len(".log")]
+        namespace = log.Logs._default_namespace
+        if namespace and name.startswith(namespace + "_"):
+            name = name[len(namespace) + 1 :]
+        target = log.Logs().get_logger(name)
+    # Level was checked by the logger in the other process
+    target.handle(record)
@@ -13,12 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import json
 import re
 
 from solnlib.utils import is_true
 from splunktalib import state_store as ss
 
+from ...core import metrics
 from ..common import log as stulog
 from . import ta_consts as c
 from . import ta_helper as th
@@ -26,6 +26,7 @@ from . import ta_helper as th
 
 class TACheckPointMgr:
     SEPARATOR = "_" * 3
+    HTTP_VALIDATORS_NAMESPACE = "__http_validators__"
 
     # FIXME We'd better move all default values together
     _DEFAULT_MAX_CACHE_SECONDS = 5
@@ -122,9 +123,10 @@ class TACheckPointMgr:
 
     def get_ckpt(self, namespaces=None, show_namespaces=False):
         key, namespaces = self.get_ckpt_key(namespaces)
-        raw_checkpoint = self._store.get_state(key)
+        with metrics.timer("checkpoint_get"):
+            raw_checkpoint = self._store.get_state(key)
         stulog.logger.debug(
-            "Get checkpoint key='%s' value='%s'", key, json.dumps(raw_checkpoint)
+            "Get checkpoint key='%s' value='%s'", key, stulog.LazyJson(raw_checkpoint)
         )
         if not show_namespaces and raw_checkpoint:
             return raw_checkpoint.get("data")
@@ -145,10 +147,25 @@ class TACheckPointMgr:
             return
         key, namespaces = self.get_ckpt_key(namespaces)
         value = {"namespaces": namespaces, "data": ckpt}
-        stulog.logger.info(
-            "Update checkpoint key='%s' value='%s'", key, json.dumps(value)
+        stulog.logger.debug(
+            "Update checkpoint key='%s' value='%s'", key, stulog.LazyJson(value)
+        )
+        with metrics.timer("checkpoint_update"):
+            self._store.update_state(key, value)
+
+    def _http_validators_namespaces(self, namespaces=None):
+        namespaces = list(namespaces or [self._task_config[c.stanza_name]])
+        return namespaces + [self.HTTP_VALIDATORS_NAMESPACE]
+
+    def get_http_validators(self, namespaces=None):
+        """Return HTTP validators saved alongside checkpoint of namespaces"""
+        return self.get_ckpt(self._http_validators_namespaces(namespaces)) or {}
+
+    def update_http_validators(self, validators, namespaces=None):
+        """Save HTTP validators alongside checkpoint of namespaces"""
+        self.update_ckpt(
+            validators, namespaces=self._http_validators_namespaces(namespaces)
         )
-        self._store.update_state(key, value)
 
     def remove_ckpt(self, namespaces=None):
         key, namespaces = self.get_ckpt_key(namespaces)
@@ -157,18 +174,19 @@ class TACheckPointMgr:
     def _key_formatter(self, namespaces=None):
         if not namespaces:
             stanza = self._task_config[c.stanza_name]
-            stulog.logger.info(
-                f"Namespaces is empty, using stanza name {stanza} instead."
+            stulog.logger.debug(
+                "Namespaces is empty, using stanza name %s instead.", stanza
             )
             namespaces = [stanza]
         key_str = TACheckPointMgr.SEPARATOR.join(namespaces)
         hashed_file = th.format_name_for_file(key_str)
-        stulog.logger.info("raw_file='%s' hashed_file='%s'", key_str, hashed_file)
+        stulog.logger.debug("raw_file='%s' hashed_file='%s'", key_str, hashed_file)
         return hashed_file, namespaces
 
     def close(self, key=None):
         try:
-            self._store.close(key)
-            stulog.logger.info("Closed state store successfully. key=%s", key)
+            with metrics.timer("checkpoint_close"):
+                self._store.close(key)
+            stulog.logger.debug("Closed state store successfully. key=%s", key)
         except Exception:
             stulog.logger.exception("Error closing state store. key=%s", key)
@@ -108,6 +108,9 @@ class TaConfig:
     def get_input_type(self):
         return self._input_type
 
+    def get_stanza_name(self):
+        return self._stanza_name
+
     def _get_checkpoint_storage_type(self, config):
         cs_type = config.get(c.checkpoint_storage_type)
         stulog.logger.debug("Checkpoint storage type=%s", cs_type)
@@ -54,6 +54,60 @@ use_cache_file = "builtin_system_use_cache_file"
 max_cache_seconds = "builtin_system_max_cache_seconds"
 # For kv store
 collection_name = "builtin_system_kvstore_collection_name"
+# For metrics
+metrics_enabled = "builtin_system_metrics_enabled"
+metrics_interval = "builtin_system_metrics_interval"
+metrics_output = "builtin_system_metrics_output"
+
+# Possible values for metrics output
+metrics_output_log = "log"
+metrics_output_event = "event"
+metrics_sourcetype = "cloudconnectlib:metrics"
+# For writing logs in a background thread
+log_queue_enabled = "builtin_system_log_queue_enabled"
+# For profiling pipeline functions
+profiling_enabled = "builtin_system_profiling_enabled"
+profiling_interval = "builtin_system_profiling_interval"
+profiling_top_n = "builtin_system_profiling_top_n"
+# For sending events to HTTP Event Collector instead of stdout
+output_mode = "builtin_system_output_mode"
+hec_url = "builtin_system_hec_url"
+hec_token = "builtin_system_hec_token"
+hec_use_ack = "builtin_system_hec_use_ack"
+hec_batch_size = "builtin_system_hec_batch_size"
+hec_disable_ssl_cert_validation = "builtin_system_hec_disable_ssl_cert_validation"
+
+# Possible values for output mode
+output_mode_stdout = "stdout"
+output_mode_hec = "hec"
+# For writing events in a background thread
+async_output_enabled = "builtin_system_async_output_enabled"
+async_output_queue_size = "builtin_system_async_output_queue_size"
+async_output_spill = "builtin_system_async_output_spill"
+# For spilling events to a journal on disk when the output is stalled or
+# not available, async_output_spill enables it too
+spill_journal_enabled = "builtin_system_spill_journal_enabled"
+spill_journal_max_size = "builtin_system_spill_journal_max_size"
+# For running post-process handlers in worker processes
+offload_post_process = "builtin_system_offload_post_process"
+offload_workers = "builtin_system_offload_workers"
+# For sharding stanzas across worker processes in single instance mode
+shard_workers = "builtin_system_shard_workers"
+# For spreading runs of stanzas over the collection interval
+schedule_mode = "builtin_system_schedule_mode"
+schedule_jitter = "builtin_system_schedule_jitter"
+schedule_startup_window = "builtin_system_schedule_startup_window"
+schedule_overrun = "builtin_system_schedule_overrun"
+
+# Possible values for schedule mode
+schedule_mode_lockstep = "lockstep"
+schedule_mode_staggered = "staggered"
+# Possible values for schedule overrun
+schedule_overrun_skip = "skip"
+schedule_overrun_immediate = "immediate"
+schedule_overrun_adaptive = "adaptive"
+# For applying conf file changes without restarting the process
+hot_reload = "builtin_system_hot_reload"
 
 settings = "__settings__"
 configs = "__configs__"
@@ -16,13 +16,12 @@
 #
 import threading
 import time
-from collections import namedtuple
-
-from splunktalib.common import util as scu
 
+from ...core import metrics
 from ..common import log as stulog
 from . import ta_consts as c
 
+# Kept for backward compatibility, events are formatted by `format_events`
 evt_fmt = (
     "<stream><event><host>{0}</host>"
     "<source><![CDATA[{1}]]></source>"
@@ -32,6 +31,7 @@ evt_fmt = (
     "<![CDATA[{5}]]></data></event></stream>"
 )
 
+# Kept for backward compatibility
 unbroken_evt_fmt = (
     "<stream>"
     '<event unbroken="1">'
@@ -46,9 +46,14 @@ unbroken_evt_fmt = (
     "</stream>"
 )
 
-event_tuple = namedtuple(
-    "Event",
-    [
+
+class Event:
+    """
+    Compact record of an event to be indexed. It's compatible with the
+    namedtuple it replaces, fields could be accessed by name or position.
+    """
+
+    __slots__ = (
         "host",
         "source",
         "sourcetype",
@@ -57,8 +62,110 @@ event_tuple = namedtuple(
         "raw_data",
         "is_unbroken",
         "is_done",
-    ],
-)
+    )
+    _fields = __slots__
+
+    def __init__(
+        self,
+        host=None,
+        source=None,
+        sourcetype=None,
+        time=None,
+        index=None,
+        raw_data="",
+        is_unbroken=False,
+        is_done=False,
+    ):
+        self.host = host
+        self.source = source
+        self.sourcetype = sourcetype
+        self.time = time
+        self.index = index
+        self.raw_data = raw_data
+        self.is_unbroken = is_unbroken
+        self.is_done = is_done
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+    def _replace(self, **kwargs):
+        values = self._asdict()
+        values.update(kwargs)
+        return self.__class__(**values)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Event, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"Event({fields})"
+
+
+# Kept for backward compatibility
+event_tuple = Event
+
+
+def escape_cdata(data):
+    """
+    Same as `splunktalib.common.util.escape_cdata` with a fast path for
+    ASCII data, which never needs character references.
+    """
+    if not data.isascii():
+        data = data.encode("utf-8", errors="xmlcharrefreplace").decode("utf-8")
+    if "]]>" in data:
+        data = data.replace("]]>", "]]&gt;")
+    if data.endswith("]"):
+        data = data[:-1] + "%5D"
+    return data
+
+
+def format_events(events):
+    """
+    Format events into a single `<stream>` element, so that a batch of
+    events is written with one write.
+    :param events: list of `Event`
+    :return: A `string`
+    """
+    parts = ["<stream>"]
+    append = parts.append
+    for event in events:
+        assert event.raw_data, "the raw data of events is empty"
+        if event.is_unbroken:
+            append('<event unbroken="1">')
+        else:
+            append("<event>")
+        append(
+            f"<host>{event.host or ''}</host>"
+            f"<source><![CDATA[{event.source or ''}]]></source>"
+            f"<sourcetype><![CDATA[{event.sourcetype or ''}]]></sourcetype>"
+            f"<time>{event.time or ''}</time>"
+            f"<index>{event.index or ''}</index>"
+            f"<data><![CDATA[{escape_cdata(event.raw_data)}]]></data>"
+        )
+        if event.is_done and event.is_unbroken:
+            append("<done/></event>")
+        else:
+            append("</event>")
+    append("</stream>")
+    return "".join(parts)
 
 
 class TADataCollector:
@@ -91,6 +198,9 @@ class TADataCollector:
     def get_interval(self):
         return self._task_config[c.interval]
 
+    def is_single_instance(self):
+        return self._ta_config.is_single_instance()
+
     def _get_logger_prefix(self):
         pairs = [f'{c.stanza_name}="{self._task_config[c.stanza_name]}"']
         return "[{}]".format(" ".join(pairs))
@@ -100,6 +210,14 @@ class TADataCollector:
         if self._client:
             self._client.stop()
 
+    def wait_stopped(self, timeout=None):
+        """Wait for the running round to finish after `stop`, return
+        `False` if it's still running after `timeout` seconds."""
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        self._lock.release()
+        return True
+
     def __call__(self):
         self.index_data()
 
@@ -108,30 +226,7 @@ class TADataCollector:
             return None
         if not isinstance(events, list):
             events = [events]
-        evts = []
-        for event in events:
-            assert event.raw_data, "the raw data of events is empty"
-            if event.is_unbroken:
-                evt = unbroken_evt_fmt.format(
-                    event.host or "",
-                    event.source or "",
-                    event.sourcetype or "",
-                    event.time or "",
-                    event.index or "",
-                    scu.escape_cdata(event.raw_data),
-                    "<done/>" if event.is_done else "",
-                )
-            else:
-                evt = evt_fmt.format(
-                    event.host or "",
-                    event.source or "",
-                    event.sourcetype or "",
-                    event.time or "",
-                    event.index or "",
-                    scu.escape_cdata(event.raw_data),
-                )
-            evts.append(evt)
-        return evts
+        return [format_events(events)]
 
     def _create_data_client(self):
         return self.data_client_cls(
@@ -142,6 +237,8 @@ class TADataCollector:
         )
 
     def index_data(self):
+        if self._stopped:
+            return
         if self._lock.locked():
             stulog.logger.debug(
                 "Last round of stanza={} is not done yet".format(
@@ -150,6 +247,7 @@ class TADataCollector:
             )
             return
         with self._lock:
+            metrics.set_stanza(self._task_config[c.stanza_name])
             try:
                 self._do_safe_index()
                 self._checkpoint_manager.close()
@@ -19,11 +19,13 @@ Data Loader main entry point
 import configparser
 import os.path as op
 import queue
+import threading
 
 from solnlib import log
 from solnlib import timer_queue as tq
 from splunktalib.concurrent import concurrent_executor as ce
-from splunktalib.schedule import job as sjob
+
+from . import ta_schedule as ts
 
 # Global logger
 logger = log.Logs().get_logger("util")
@@ -48,6 +50,9 @@ class TADataLoader:
         self._event_writer = event_writer
         self._wakeup_queue = queue.Queue()
         self._scheduler = job_scheduler
+        self._tear_down_callbacks = []
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
         self._timer_queue = tq.TimerQueue()
         self._executor = ce.ConcurrentExecutor(self._settings)
         self._started = False
@@ -63,26 +68,54 @@ class TADataLoader:
         self._scheduler.start()
         logger.info("TADataLoader started.")
 
-        def _enqueue_io_job(job):
-            job_props = job.get_props()
-            real_job = job_props["real_job"]
-            self.run_io_jobs((real_job,))
-
-        for job in jobs:
-            j = sjob.Job(_enqueue_io_job, {"real_job": job}, job.get_interval())
-            self._scheduler.add_jobs((j,))
+        self.add_jobs(jobs)
 
         self._wait_for_tear_down()
 
-        for job in jobs:
-            job.stop()
+        self.remove_jobs(self.get_jobs())
 
         self._scheduler.tear_down()
         self._timer_queue.stop()
         self._executor.tear_down()
+        for callback in self._tear_down_callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Failed to run tear down callback %s", callback)
         self._event_writer.tear_down()
         logger.info("DataLoader stopped.")
 
+    def _enqueue_io_job(self, job):
+        round_job = ts.start_round(job)
+        if round_job is not None:
+            self.run_io_jobs((round_job,))
+
+    def add_jobs(self, jobs):
+        """Schedule data collectors, it could be called while running."""
+        for job in jobs:
+            schedule_job = ts.create_job(self._enqueue_io_job, job)
+            with self._jobs_lock:
+                self._jobs[job] = schedule_job
+            self._scheduler.add_jobs((schedule_job,))
+
+    def remove_jobs(self, jobs):
+        """Stop scheduling and stop data collectors, rounds running are
+        notified to stop but not waited. Return the removed collectors."""
+        removed = []
+        for job in jobs:
+            with self._jobs_lock:
+                schedule_job = self._jobs.pop(job, None)
+            if schedule_job is None:
+                continue
+            self._scheduler.remove_jobs((schedule_job,))
+            job.stop()
+            removed.append(job)
+        return removed
+
+    def get_jobs(self):
+        with self._jobs_lock:
+            return list(self._jobs)
+
     def _wait_for_tear_down(self):
         wakeup_q = self._wakeup_queue
         while 1:
@@ -122,6 +155,11 @@ class TADataLoader:
     def remove_timer(self, timer):
         self._timer_queue.remove_timer(timer)
 
+    def add_tear_down_callback(self, callback):
+        """Add a callback to run after jobs stopped and before the event
+        writer stops, e.g. to flush events buffered by jobs."""
+        self._tear_down_callbacks.append(callback)
+
     def write_events(self, events):
         return self._event_writer.write_events(events)
 
@@ -166,15 +204,16 @@ class GlobalDataLoader:
         GlobalDataLoader.__instance = None
 
 
-def create_data_loader():
+def create_data_loader(event_writer=None):
     """
     create a data loader with default event_writer, job_scheudler
+    @event_writer: writer used instead of the default one
     """
 
     from splunktalib import event_writer as ew
     from splunktalib.schedule import scheduler as sched
 
-    writer = ew.EventWriter()
+    writer = event_writer or ew.EventWriter()
     scheduler = sched.Scheduler()
     loader = GlobalDataLoader.get_data_loader(scheduler, writer)
     return loader
@@ -0,0 +1,210 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Watch conf files of a TA for changes. inotify is used on Linux so that
+changes are noticed right away without polling, files are polled with
+the timer queue of data loader on other platforms or if inotify is not
+available.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import os.path as op
+import select
+import struct
+import sys
+import threading
+import time
+
+from solnlib import file_monitor as fm
+
+from ...core import defaults
+from ..common import log as stulog
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    """
+    Watch files with inotify in a background thread. The directories of
+    files are watched so that files created later or replaced by renaming
+    are noticed too. Events are debounced and `callback` is called with
+    the changed files.
+    """
+
+    def __init__(self, callback, files, debounce=None):
+        """
+        :param callback: function called with a `list` of changed files.
+        :param files: files to watch with full path.
+        :type files: ``list``
+        :param debounce: seconds without further events before `callback`
+            is called.
+        :type debounce: ``float``
+        """
+        self._callback = callback
+        self._files = {op.abspath(f) for f in files}
+        self._debounce = defaults.file_watch_debounce if debounce is None else debounce
+        self._libc = _load_libc()
+        self._fd = None
+        self._dirs = {}
+        self._wakeup = None
+        self._thread = None
+
+    @staticmethod
+    def is_available():
+        return _load_libc() is not None
+
+    def start(self):
+        """Start watching, raise `OSError` if inotify can't be used."""
+        if self._libc is None:
+            raise OSError("inotify is not available")
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            for directory in {op.dirname(f) for f in self._files}:
+                wd = self._libc.inotify_add_watch(
+                    fd, os.fsencode(directory), _WATCH_MASK
+                )
+                if wd < 0:
+                    errno = ctypes.get_errno()
+                    raise OSError(errno, os.strerror(errno), directory)
+                self._dirs[wd] = directory
+        except OSError:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._wakeup = os.pipe()
+        self._thread = threading.Thread(
+            target=self._watch, name="InotifyWatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        os.write(self._wakeup[1], b"x")
+        self._thread.join()
+        self._thread = None
+        for fd in (self._fd, *self._wakeup):
+            os.close(fd)
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = op.join(directory, os.fsdecode(name))
+            if path in self._files:
+                changed.add(path)
+        return changed
+
+    def _watch(self):
+        pending = set()
+        while True:
+            timeout = self._debounce if pending else None
+            readable, _, _ = select.select([self._fd, self._wakeup[0]], [], [], timeout)
+            if self._wakeup[0] in readable:
+                return
+            if self._fd in readable:
+                pending |= self._read_events()
+                continue
+            # No more events within debounce time
+            changed, pending = sorted(pending), set()
+            try:
+                self._callback(changed)
+            except Exception:
+                stulog.logger.exception("Failed to handle changes of %s", changed)
+
+
+class PollingWatcher:
+    """Check modification time of files periodically with the timer queue
+    of data loader."""
+
+    def __init__(self, callback, files, data_loader, interval=None):
+        self._checker = fm.FileChangesChecker(callback, files)
+        self._data_loader = data_loader
+        self._interval = interval or defaults.file_watch_interval
+        self._timer = None
+
+    def start(self):
+        self._timer = self._data_loader.add_timer(
+            self._checker.check_changes, time.time(), self._interval
+        )
+
+    def stop(self):
+        if self._timer is not None:
+            self._data_loader.remove_timer(self._timer)
+            self._timer = None
+
+
+def create_file_watcher(callback, files, data_loader):
+    """
+    Start watching `files` and return the watcher, inotify is preferred and
+    polling is the fallback.
+    """
+    if InotifyWatcher.is_available():
+        watcher = InotifyWatcher(callback, files)
+        try:
+            watcher.start()
+        except OSError as ex:
+            stulog.logger.info("Unable to watch files with inotify: %s", ex)
+        else:
+            stulog.logger.info("Watch changes of %s with inotify", files)
+            return watcher
+    watcher = PollingWatcher(callback, files, data_loader)
+    watcher.start()
+    stulog.logger.info("Check changes of %s periodically", files)
+    return watcher
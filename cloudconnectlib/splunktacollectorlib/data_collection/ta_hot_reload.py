@@ -0,0 +1,104 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Apply changes of conf files without restarting the modular input. Task
+configs are loaded again and compared with the running ones by stanza
+name, only collectors of added, removed or changed stanzas are started or
+stopped.
+"""
+
+import threading
+
+from ...core import defaults
+from ..common import log as stulog
+from . import ta_consts as c
+
+
+class HotReloader:
+    """
+    Reload task configs when conf files change and update collectors run
+    by the data loader. The data loader is torn down, i.e. the process
+    restarts as before, if task configs can't be reloaded or stopped
+    collectors don't finish in time.
+    """
+
+    def __init__(self, data_loader, load_task_configs, create_collector):
+        """
+        :param data_loader: `TADataLoader` running the collectors.
+        :param load_task_configs: function loads task configs again and
+            returns `(tconfig, task_configs)`.
+        :param create_collector: function creates a collector with
+            `(tconfig, task_config)`.
+        """
+        self._data_loader = data_loader
+        self._load_task_configs = load_task_configs
+        self._create_collector = create_collector
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def reload(self, changed_files):
+        """Callback of file watcher."""
+        stulog.logger.info("Detect %s changed, reload task configs", changed_files)
+        with self._lock:
+            try:
+                self._reload()
+            except Exception:
+                stulog.logger.exception("Failed to reload task configs, reboot itself")
+                self._data_loader.tear_down()
+
+    def _reload(self):
+        tconfig, task_configs = self._load_task_configs()
+        new_configs = {t[c.stanza_name]: t for t in task_configs}
+        running = {
+            job.get_task_config()[c.stanza_name]: job
+            for job in self._data_loader.get_jobs()
+        }
+
+        stopping = []
+        starting = []
+        for name, job in running.items():
+            config = new_configs.get(name)
+            if config is None or config != job.get_task_config():
+                stopping.append(job)
+        for name, config in new_configs.items():
+            job = running.get(name)
+            if job is None or job in stopping:
+                starting.append(config)
+
+        if not stopping and not starting:
+            stulog.logger.info("Task configs are not changed")
+            return
+
+        self._data_loader.remove_jobs(stopping)
+        for job in stopping:
+            # Rounds of the same stanza must not overlap
+            if not job.wait_stopped(defaults.hot_reload_stop_timeout):
+                stulog.logger.warning(
+                    "Collector of stanza=%s doesn't stop in time, reboot itself",
+                    job.get_task_config()[c.stanza_name],
+                )
+                self._data_loader.tear_down()
+                return
+
+        self._data_loader.add_jobs(
+            [self._create_collector(tconfig, config) for config in starting]
+        )
+        self.reloads += 1
+        stulog.logger.info(
+            "Task configs reloaded, stopped=%s started=%s",
+            sorted(job.get_task_config()[c.stanza_name] for job in stopping),
+            sorted(config[c.stanza_name] for config in starting),
+        )
@@ -23,21 +23,36 @@ import platform
 import sys
 import time
 
-from solnlib import file_monitor as fm
-from solnlib import orphan_process_monitor as opm
-from solnlib import utils
-from splunktalib import modinput
-from splunktalib.common import util as sc_util
-
-from ...common.lib_util import get_app_root_dir, get_mod_input_script_name
+from ...common.lib_util import (
+    get_app_root_dir,
+    get_mod_input_script_name,
+    lazy_import,
+)
+from ...core import defaults
+from ...core.exceptions import ConfigException
 from ..common import load_schema_file as ld
-from ..common import log as stulog
-from . import ta_checkpoint_manager as cpmgr
-from . import ta_config as tc
-from . import ta_data_client as tdc
-from . import ta_data_loader as dl
-
-utils.remove_http_proxy_env_vars()
+from . import ta_consts as c
+
+# Modules used to run inputs are imported lazily, so that splunkd calling
+# the script with --scheme or --validate-arguments doesn't import them.
+opm = lazy_import("solnlib.orphan_process_monitor")
+utils = lazy_import("solnlib.utils")
+modinput = lazy_import("splunktalib.modinput")
+sc_util = lazy_import("splunktalib.common.util")
+util = lazy_import("...common.util", __package__)
+metrics = lazy_import("...core.metrics", __package__)
+offload = lazy_import("...core.offload", __package__)
+profiler = lazy_import("...core.profiler", __package__)
+pipemgr = lazy_import("...core.pipemgr", __package__)
+sinks = lazy_import("...core.sinks", __package__)
+stulog = lazy_import("..common.log", __package__)
+cpmgr = lazy_import(".ta_checkpoint_manager", __package__)
+tc = lazy_import(".ta_config", __package__)
+tdc = lazy_import(".ta_data_client", __package__)
+dl = lazy_import(".ta_data_loader", __package__)
+fw = lazy_import(".ta_file_watcher", __package__)
+hr = lazy_import(".ta_hot_reload", __package__)
+sup = lazy_import(".ta_supervisor", __package__)
 
 __CHECKPOINT_DIR_MAX_LEN__ = 180
 
@@ -138,6 +153,256 @@ def _handle_file_changes(data_loader):
     return _handle_refresh
 
 
+def _get_int_setting(config, key, default):
+    try:
+        return int(config.get(key) or default)
+    except ValueError:
+        stulog.logger.warning(
+            "The %s '%s' is not a valid integer, set it to %s",
+            key,
+            config.get(key),
+            default,
+        )
+        return default
+
+
+def _setup_metrics(data_loader, task_configs):
+    """
+    Enable metrics if any input enables it and report metrics periodically
+    as log lines or metrics events. Return the report interval in seconds or
+    `None` if metrics are disabled.
+    """
+    configs = [t for t in task_configs if utils.is_true(t.get(c.metrics_enabled))]
+    if not configs:
+        return None
+    metrics.enable()
+
+    interval = max(
+        _get_int_setting(configs[0], c.metrics_interval, defaults.metrics_interval),
+        1,
+    )
+    output = configs[0].get(c.metrics_output) or c.metrics_output_log
+
+    def _write_metrics_events():
+        records = [
+            metrics.format_metrics(stanza, value)
+            for stanza, value in metrics.snapshot(reset=True).items()
+        ]
+        if records:
+            data_loader.write_events(
+                util.format_events(
+                    records, time=time.time(), sourcetype=c.metrics_sourcetype
+                )
+            )
+
+    if output == c.metrics_output_event:
+        callback = _write_metrics_events
+    else:
+        callback = metrics.log_metrics
+    data_loader.add_timer(callback, time.time() + interval, interval)
+    stulog.logger.info(
+        "Metrics enabled, interval=%s seconds output=%s", interval, output
+    )
+    return interval
+
+
+def _setup_profiling(data_loader, task_configs):
+    """
+    Enable profiling of pipeline functions if any input enables it and log
+    the top N functions of each stanza periodically.
+    """
+    configs = [t for t in task_configs if utils.is_true(t.get(c.profiling_enabled))]
+    if not configs:
+        return
+    profiler.enable()
+
+    interval = max(
+        _get_int_setting(configs[0], c.profiling_interval, defaults.profiling_interval),
+        1,
+    )
+    top_n = _get_int_setting(configs[0], c.profiling_top_n, defaults.profiling_top_n)
+
+    def _log_report():
+        profiler.log_report(top_n)
+
+    data_loader.add_timer(_log_report, time.time() + interval, interval)
+    stulog.logger.info(
+        "Profiling of pipeline functions enabled, interval=%s seconds top_n=%s",
+        interval,
+        top_n,
+    )
+
+
+def _setup_offload(task_configs):
+    """
+    Run post-process handlers in worker processes if any input enables it.
+    Return `True` if enabled.
+    """
+    configs = [t for t in task_configs if utils.is_true(t.get(c.offload_post_process))]
+    if not configs:
+        return False
+    defaults.offload_post_process = True
+    defaults.offload_workers = _get_int_setting(
+        configs[0], c.offload_workers, defaults.offload_workers
+    )
+    stulog.logger.info(
+        "Post-process handlers run in worker processes, workers=%s",
+        defaults.offload_workers or "cpu count",
+    )
+    return True
+
+
+def _create_hec_sink(task_configs):
+    """
+    Create a HEC sink if any input sends events to HTTP Event Collector,
+    events are written to stdout if HEC is not configured properly.
+    """
+    configs = [t for t in task_configs if t.get(c.output_mode) == c.output_mode_hec]
+    if not configs:
+        return None
+    config = configs[0]
+    try:
+        sink = sinks.HECSink(
+            config.get(c.hec_url),
+            config.get(c.hec_token),
+            use_ack=utils.is_true(config.get(c.hec_use_ack)),
+            batch_size=_get_int_setting(
+                config, c.hec_batch_size, defaults.hec_batch_size
+            ),
+            disable_ssl_cert_validation=utils.is_true(
+                config.get(c.hec_disable_ssl_cert_validation)
+            ),
+        )
+    except ConfigException:
+        stulog.logger.exception("Invalid HEC settings, write events to stdout")
+        return None
+    stulog.logger.info(
+        "Events are sent to HEC url=%s channel=%s",
+        config.get(c.hec_url),
+        sink.channel,
+    )
+    return sink
+
+
+def _create_output_sink(data_loader, task_configs, spill_dir):
+    """
+    Create the output sink of events written by pipelines, `None` means
+    writing events to the event writer of data loader directly. Events are
+    spilled to a journal in `spill_dir` if the async sink is full or its
+    sink is unavailable and spilling is enabled.
+    """
+    sink = _create_hec_sink(task_configs)
+    configs = [t for t in task_configs if utils.is_true(t.get(c.async_output_enabled))]
+    spill_configs = [
+        t
+        for t in task_configs
+        if utils.is_true(t.get(c.spill_journal_enabled))
+        or (t in configs and utils.is_true(t.get(c.async_output_spill)))
+    ]
+    if not configs and not spill_configs:
+        return sink
+
+    config = (configs or spill_configs)[0]
+    spill_max_bytes = None
+    if spill_configs:
+        spill_max_bytes = _get_spill_max_bytes(spill_configs[0])
+    else:
+        spill_dir = None
+    if sink is None and spill_dir is None:
+        # The event writer already queues events for its own writer thread,
+        # another queue in front of it only adds latency.
+        stulog.logger.info(
+            "Async output without spilling has no effect on the event writer"
+        )
+        return None
+    sink = sinks.AsyncSink(
+        sink or sinks.EventWriterSink(data_loader.get_event_writer()),
+        queue_size=_get_int_setting(
+            config, c.async_output_queue_size, defaults.async_queue_size
+        ),
+        spill_dir=spill_dir,
+        spill_max_bytes=spill_max_bytes,
+    )
+    stulog.logger.info("Events are written asynchronously, spill_dir=%s", spill_dir)
+    return sink
+
+
+def _get_spill_max_bytes(config):
+    """Maximum size of spill journal, given in MB by task config."""
+    max_size = _get_int_setting(config, c.spill_journal_max_size, 0)
+    if max_size <= 0:
+        return defaults.spill_journal_max_bytes
+    return max_size * 1024 * 1024
+
+
+def _report_output_stats(data_loader, sink, interval):
+    """Log counters of output sink, e.g. queue depth, periodically."""
+    if interval is None or not hasattr(sink, "stats"):
+        return
+
+    def _log_stats():
+        stulog.logger.info("Output sink stats=%s", sink.stats())
+
+    data_loader.add_timer(_log_stats, time.time() + interval, interval)
+
+
+def _watch_conf_files(data_loader, settings, callback):
+    """Call `callback` with changed files once conf files of TA change."""
+    try:
+        watcher = fw.create_file_watcher(
+            callback, _get_conf_files(settings), data_loader
+        )
+    except Exception:
+        stulog.logger.exception("Fail to add files for monitoring")
+        return
+    data_loader.add_tear_down_callback(watcher.stop)
+
+
+def _create_hot_reloader(
+    data_loader,
+    tconfig,
+    meta_config,
+    task_configs,
+    collector_cls,
+    settings,
+    checkpoint_cls,
+    config_cls,
+    log_suffix,
+    single_instance,
+):
+    """
+    Create a reloader applying conf file changes to collectors if any input
+    enables it, `None` means rebooting the process on changes.
+    """
+    configs = [t for t in task_configs if utils.is_true(t.get(c.hot_reload))]
+    if not configs and not defaults.hot_reload:
+        return None
+
+    def _load_task_configs():
+        new_tconfig = (config_cls or tc.TaConfig)(
+            meta_config,
+            settings,
+            log_suffix,
+            tconfig.get_stanza_name(),
+            tconfig.get_input_type(),
+            single_instance=single_instance,
+        )
+        return new_tconfig, new_tconfig.get_task_configs()
+
+    def _create_collector(new_tconfig, task_config):
+        return tdc.create_data_collector(
+            data_loader,
+            new_tconfig,
+            meta_config,
+            task_config,
+            collector_cls,
+            checkpoint_cls=checkpoint_cls or cpmgr.TACheckPointMgr,
+        )
+
+    stulog.logger.info("Conf file changes are applied without reboot")
+    return hr.HotReloader(data_loader, _load_task_configs, _create_collector)
+
+
 def _get_conf_files(settings):
     rest_root = settings.get("meta").get("restRoot")
     file_list = [rest_root + "_settings.conf"]
@@ -164,6 +429,7 @@ def run(
     Main loop. Run this TA forever
     """
     ta_short_name = settings["meta"]["name"].lower()
+    utils.remove_http_proxy_env_vars()
 
     # This is for stdout flush
     sc_util.disable_stdout_buffer()
@@ -176,15 +442,6 @@ def run(
     # handle signal
     _setup_signal_handler(loader, ta_short_name)
 
-    # monitor files to reboot
-    try:
-        monitor = fm.FileMonitor(
-            _handle_file_changes(loader), _get_conf_files(settings)
-        )
-        loader.add_timer(monitor.check_changes, time.time(), 10)
-    except Exception:
-        stulog.logger.exception("Fail to add files for monitoring")
-
     # add orphan process handling, which will check each 1 second
     orphan_checker = opm.OrphanProcessChecker(loader.tear_down)
     loader.add_timer(orphan_checker.check_orphan, time.time(), 1)
@@ -200,6 +457,9 @@ def run(
     meta_config = tconfig.get_meta_config()
     meta_config["cc_json_file"] = cc_json_file
 
+    metrics_interval = _setup_metrics(loader, task_configs)
+    _setup_profiling(loader, task_configs)
+
     if tconfig.is_shc_member():
         # Don't support SHC env
         stulog.logger.error(
@@ -217,6 +477,71 @@ def run(
         )
         return
 
+    shards = _get_shard_workers(tconfig, task_configs)
+    if shards > 1:
+        _watch_conf_files(loader, settings, _handle_file_changes(loader))
+        _run_supervisor(
+            loader,
+            shards,
+            task_configs,
+            (
+                collector_cls,
+                settings,
+                checkpoint_cls,
+                config_cls,
+                log_suffix,
+                single_instance,
+                meta_config,
+                tconfig.get_stanza_name(),
+                tconfig.get_input_type(),
+            ),
+        )
+        return
+
+    reloader = _create_hot_reloader(
+        loader,
+        tconfig,
+        meta_config,
+        task_configs,
+        collector_cls,
+        settings,
+        checkpoint_cls,
+        config_cls,
+        log_suffix,
+        single_instance,
+    )
+    _run_tasks(
+        loader,
+        tconfig,
+        meta_config,
+        task_configs,
+        collector_cls,
+        checkpoint_cls,
+        metrics_interval,
+        op.join(meta_config["checkpoint_dir"], "output_spill"),
+        lambda: _watch_conf_files(
+            loader,
+            settings,
+            reloader.reload if reloader else _handle_file_changes(loader),
+        ),
+    )
+
+
+def _run_tasks(
+    loader,
+    tconfig,
+    meta_config,
+    task_configs,
+    collector_cls,
+    checkpoint_cls,
+    metrics_interval,
+    spill_dir,
+    watch_conf_files=None,
+):
+    """
+    Run tasks of `task_configs` in current process until the data loader
+    is torn down. `watch_conf_files` is called once collectors are added.
+    """
     jobs = [
         tdc.create_data_collector(
             loader,
@@ -229,7 +554,120 @@ def run(
         for task_config in task_configs
     ]
 
-    loader.run(jobs)
+    queue_logging = any(utils.is_true(t.get(c.log_queue_enabled)) for t in task_configs)
+    if queue_logging:
+        stulog.start_queue_logging()
+    offloaded = _setup_offload(task_configs)
+    sink = _create_output_sink(loader, task_configs, spill_dir)
+    if sink:
+        pipemgr.PipeManager(event_writer=loader.get_event_writer()).set_sink(sink)
+        loader.add_tear_down_callback(sink.close)
+        _report_output_stats(loader, sink, metrics_interval)
+    # Collectors are added before watching so that a reload sees them
+    loader.add_jobs(jobs)
+    if watch_conf_files is not None:
+        watch_conf_files()
+    try:
+        loader.run([])
+    finally:
+        if sink:
+            sink.close()
+        if offloaded:
+            offload.shutdown_pool()
+        if queue_logging:
+            stulog.stop_queue_logging()
+
+
+def _get_shard_workers(tconfig, task_configs):
+    """
+    Return the number of worker processes stanzas are sharded across, `0`
+    means running all stanzas in current process.
+    """
+    configs = [t for t in task_configs if t.get(c.shard_workers)]
+    if not configs or not tconfig.is_single_instance():
+        return 0
+    workers = _get_int_setting(configs[0], c.shard_workers, 0)
+    return min(workers, len(task_configs))
+
+
+def _run_supervisor(loader, shards, task_configs, args):
+    """
+    Run stanzas in shard worker processes, current process writes events,
+    log records and metrics sent by workers and restarts crashed workers.
+    Signals, orphan detection and conf file changes stop the workers with
+    the data loader.
+    """
+    supervisor = sup.ShardSupervisor(
+        _run_shard,
+        shards,
+        [t[c.stanza_name] for t in task_configs],
+        loader.write_events,
+        args,
+    )
+    loader.add_timer(supervisor.check_workers, time.time() + 1, 1)
+    loader.add_tear_down_callback(supervisor.stop)
+    supervisor.start()
+    loader.run([])
+
+
+def _run_shard(
+    shard,
+    shards,
+    channel,
+    collector_cls,
+    settings,
+    checkpoint_cls,
+    config_cls,
+    log_suffix,
+    single_instance,
+    meta_config,
+    stanza_name,
+    input_type,
+):
+    """
+    Entry point of a shard worker process, run tasks of the stanzas in
+    shard `shard` until the worker is terminated or becomes orphan.
+    """
+    ta_short_name = settings["meta"]["name"].lower()
+    utils.remove_http_proxy_env_vars()
+    time.strptime("2016-01-01", "%Y-%m-%d")
+
+    stulog.forward_logging(channel.send_log)
+    loader = dl.create_data_loader(event_writer=channel)
+    _setup_signal_handler(loader, ta_short_name)
+    orphan_checker = opm.OrphanProcessChecker(loader.tear_down)
+    loader.add_timer(orphan_checker.check_orphan, time.time(), 1)
+
+    tconfig = (config_cls or tc.TaConfig)(
+        meta_config,
+        settings,
+        log_suffix,
+        stanza_name,
+        input_type,
+        single_instance=single_instance,
+    )
+    all_task_configs = tconfig.get_task_configs()
+    task_configs = [
+        t for t in all_task_configs if sup.shard_of(t[c.stanza_name], shards) == shard
+    ]
+    if any(utils.is_true(t.get(c.metrics_enabled)) for t in all_task_configs):
+        # Metrics are reported by the supervisor
+        metrics.enable()
+        loader.add_timer(channel.send_metrics, time.time() + 1, 1)
+        loader.add_tear_down_callback(channel.send_metrics)
+    _setup_profiling(loader, task_configs)
+    stulog.logger.info("Shard %s worker runs %s stanzas", shard, len(task_configs))
+
+    _run_tasks(
+        loader,
+        tconfig,
+        tconfig.get_meta_config(),
+        task_configs,
+        collector_cls,
+        checkpoint_cls,
+        None,
+        op.join(meta_config["checkpoint_dir"], "output_spill", f"shard_{shard}"),
+    )
 
 
 def _is_checkpoint_dir_length_exceed_limit(config, checkpoint_dir):
@@ -272,7 +710,6 @@ def main(
     """
     Main entry point
     """
-    assert collector_cls, "ucc modinput collector is None."
     assert schema_file_path, "ucc modinput schema file is None"
 
     settings = ld(schema_file_path)
@@ -294,6 +731,7 @@ def main(
         else:
             usage()
     else:
+        assert collector_cls, "ucc modinput collector is None."
         try:
             run(
                 collector_cls,
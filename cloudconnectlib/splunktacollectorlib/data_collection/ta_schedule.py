@@ -0,0 +1,316 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Scheduling of data collectors. In staggered mode each stanza runs at a
+fixed phase of its interval derived from the stanza name, so that stanzas
+with the same interval don't fire in lockstep, and the first runs after
+start are spread over a short window instead of firing at once. Staggering
+only applies to single instance modular inputs, other ones run a single
+round per invocation which must not be delayed.
+
+Jobs also know whether the previous round of their stanza is still
+running. Triggers fired meanwhile are coalesced and the overrun is
+reported, then the job either waits for the next trigger, runs once right
+after the round finishes or stretches its interval to the observed round
+duration.
+"""
+
+import math
+import random
+import threading
+import time
+import zlib
+
+from splunktalib.schedule import job as sjob
+
+from ...core import defaults, metrics
+from ..common import log as stulog
+from . import ta_consts as c
+
+
+def phase_of(name):
+    """Return the phase of stanza `name` as a fraction in [0, 1), it's the
+    same across processes and restarts."""
+    return zlib.crc32(name.encode("utf-8")) / 2.0**32
+
+
+class CollectorJob(sjob.Job):
+    """
+    Job of a data collector which tracks the rounds of its stanza. The
+    function of job should call `start_round` before running a round and
+    `finish_round` after it.
+    """
+
+    def __init__(self, func, job_props, interval, name, overrun=None, when=None):
+        """
+        :param name: stanza name.
+        :type name: ``string``
+        :param overrun: what to do with triggers fired while a round is
+            running, one of `skip`, `immediate` and `adaptive`.
+        :type overrun: ``string``
+        """
+        super().__init__(func, job_props, interval, when=when)
+        self._name = name
+        self._overrun = overrun or defaults.schedule_overrun
+        self._base_interval = interval
+        self._round_lock = threading.Lock()
+        self._running_since = None
+        self._missed = 0
+        self._duration = None
+        self.rounds = 0
+        self.missed_triggers = 0
+        self.overrun_seconds = 0.0
+
+    def get_name(self):
+        return self._name
+
+    def start_round(self):
+        """
+        Return `True` if a round should start, `False` if the previous round
+        is still running and the trigger is coalesced into it.
+        """
+        with self._round_lock:
+            if self._running_since is not None:
+                self._missed += 1
+                self.missed_triggers += 1
+                metrics.incr("missed_triggers", stanza=self._name)
+                return False
+            self._running_since = time.time()
+            return True
+
+    def finish_round(self):
+        """
+        Record the duration of the finished round. Return `True` if another
+        round should start right away for the coalesced triggers, the round
+        is started already in that case.
+        """
+        with self._round_lock:
+            now = time.time()
+            duration = now - self._running_since
+            missed, self._missed = self._missed, 0
+            self._running_since = None
+            self.rounds += 1
+            if self._duration is None:
+                self._duration = duration
+            else:
+                self._duration = 0.8 * self._duration + 0.2 * duration
+            overrun = duration - self._interval
+            if self._interval and overrun > 0:
+                self.overrun_seconds += overrun
+                metrics.observe("overrun", overrun, stanza=self._name)
+                stulog.logger.warning(
+                    "Round of stanza=%s took %.3f seconds, %.3f seconds longer"
+                    " than interval, %s triggers were coalesced",
+                    self._name,
+                    duration,
+                    overrun,
+                    missed,
+                )
+            if self._overrun == c.schedule_overrun_adaptive:
+                self._adapt_interval()
+            if (
+                missed
+                and self._overrun == c.schedule_overrun_immediate
+                and not self.stopped()
+            ):
+                self._running_since = now
+                return True
+            return False
+
+    def _adapt_interval(self):
+        if not self._base_interval:
+            return
+        interval = min(
+            max(
+                self._base_interval,
+                self._duration * defaults.schedule_adaptive_headroom,
+            ),
+            self._base_interval * defaults.schedule_adaptive_max_factor,
+        )
+        if interval == self._interval:
+            return
+        # Small changes are ignored unless it goes back to configured one
+        if (
+            interval == self._base_interval
+            or abs(interval - self._interval) > 0.1 * self._interval
+        ):
+            stulog.logger.info(
+                "Interval of stanza=%s is changed from %.3f to %.3f seconds"
+                " according to round duration",
+                self._name,
+                self._interval,
+                interval,
+            )
+            self._interval = interval
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "missed_triggers": self.missed_triggers,
+            "overrun_seconds": round(self.overrun_seconds, 3),
+            "interval": self._interval,
+            "round_seconds": round(self._duration or 0.0, 3),
+        }
+
+
+class StaggeredJob(CollectorJob):
+    """
+    Job runs at `phase * interval` within each interval. A random delay up
+    to `jitter * interval` is added to each run without shifting the
+    following ones.
+    """
+
+    def __init__(
+        self,
+        func,
+        job_props,
+        interval,
+        name,
+        jitter=0.0,
+        startup_window=None,
+        now=None,
+        overrun=None,
+    ):
+        """
+        :param name: stanza name the phase is derived from.
+        :type name: ``string``
+        :param jitter: maximum random delay of a run as a fraction of
+            interval.
+        :type jitter: ``float``
+        :param startup_window: seconds the first runs of stanzas are spread
+            over, it's capped by interval.
+        :type startup_window: ``float``
+        """
+        if startup_window is None:
+            startup_window = defaults.schedule_startup_window
+        phase = phase_of(name)
+        now = time.time() if now is None else now
+        self._offset = phase * interval
+        self._jitter = min(max(jitter, 0.0), 1.0)
+        self._due = now + phase * min(startup_window, interval)
+        super().__init__(func, job_props, interval, name, overrun, when=self._due)
+        self._when += self._delay()
+
+    def _delay(self):
+        if not self._jitter or not self._interval:
+            return 0.0
+        return random.uniform(0, self._jitter * self._interval)
+
+    def update_expiration(self):
+        if not self._interval:
+            return super().update_expiration()
+        # Move to the phase of stanza, at least half an interval after the
+        # previous run so that the first run isn't followed by another soon.
+        after = self._due + self._interval / 2.0
+        slots = math.floor((after - self._offset) / self._interval) + 1
+        self._due = self._offset + slots * self._interval
+        self._when = self._due + self._delay()
+
+
+def _get_float_setting(config, key, default):
+    try:
+        return float(config.get(key) or default)
+    except ValueError:
+        stulog.logger.warning(
+            "The %s '%s' is not a valid number, set it to %s",
+            key,
+            config.get(key),
+            default,
+        )
+        return default
+
+
+def start_round(job):
+    """
+    Return a function running a round of the data collector of `job`, or
+    `None` if the previous round is still running and the trigger is
+    coalesced into it.
+    """
+    real_job = job.get_props()["real_job"]
+    if not isinstance(job, CollectorJob):
+        return real_job
+    if not job.start_round():
+        stulog.logger.debug(
+            "Last round of stanza=%s is not done yet, trigger is coalesced",
+            job.get_name(),
+        )
+        return None
+
+    def _run():
+        again = True
+        while again:
+            try:
+                real_job()
+            finally:
+                again = job.finish_round()
+
+    return _run
+
+
+def create_job(func, real_job):
+    """
+    Create the scheduler job of a data collector according to the schedule
+    settings of its task config.
+    :param func: function called with the scheduler job when it's due.
+    :param real_job: data collector, `real_job` of the job properties.
+        Runs are only staggered if its `is_single_instance` returns `True`.
+    """
+    props = {"real_job": real_job}
+    interval = real_job.get_interval()
+    get_task_config = getattr(real_job, "get_task_config", None)
+    config = get_task_config() if get_task_config else None
+    if not config or c.stanza_name not in config:
+        return sjob.Job(func, props, interval)
+
+    name = config[c.stanza_name]
+    overrun = config.get(c.schedule_overrun) or defaults.schedule_overrun
+    if overrun not in (
+        c.schedule_overrun_skip,
+        c.schedule_overrun_immediate,
+        c.schedule_overrun_adaptive,
+    ):
+        stulog.logger.warning(
+            "The %s '%s' is invalid, set it to '%s'",
+            c.schedule_overrun,
+            overrun,
+            c.schedule_overrun_skip,
+        )
+        overrun = c.schedule_overrun_skip
+    is_single_instance = getattr(real_job, "is_single_instance", None)
+    if not (is_single_instance and is_single_instance()):
+        # Collector runs one round and exits, it's due right away.
+        return CollectorJob(func, props, interval, name, overrun)
+    mode = config.get(c.schedule_mode) or defaults.schedule_mode
+    if mode == c.schedule_mode_lockstep:
+        return CollectorJob(func, props, interval, name, overrun)
+    if mode != c.schedule_mode_staggered:
+        stulog.logger.warning(
+            "The %s '%s' is invalid, set it to '%s'",
+            c.schedule_mode,
+            mode,
+            c.schedule_mode_staggered,
+        )
+    return StaggeredJob(
+        func,
+        props,
+        interval,
+        name,
+        overrun=overrun,
+        jitter=_get_float_setting(config, c.schedule_jitter, defaults.schedule_jitter),
+        startup_window=_get_float_setting(
+            config, c.schedule_startup_window, defaults.schedule_startup_window
+        ),
+    )
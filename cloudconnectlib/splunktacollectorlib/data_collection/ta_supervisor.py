@@ -0,0 +1,290 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Supervisor which shards the stanzas of a single instance modular input
+across worker processes by hash of stanza name. Workers send events, log
+records and metrics back through a pipe, so that the supervisor stays the
+only process writing to stdout and log files. A write of events returns
+once the supervisor has written them and replied, so that checkpoints of a
+worker never get ahead of its events.
+"""
+
+import multiprocessing
+import threading
+import time
+import zlib
+from multiprocessing.connection import wait
+
+from ...core import defaults, metrics
+from ..common import log as stulog
+
+_EVENTS = "events"
+_LOG = "log"
+_METRICS = "metrics"
+
+
+def shard_of(stanza_name, shards):
+    """Return the shard a stanza belongs to, it's stable across processes
+    and restarts unlike `hash`."""
+    return zlib.crc32(stanza_name.encode("utf-8")) % shards
+
+
+class ShardChannel:
+    """
+    Worker end of the pipe between a worker and the supervisor. It's also
+    the event writer of the data loader in worker process.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+        # Writes of events wait for replies one at a time, replies come in
+        # the order events are sent.
+        self._events_lock = threading.Lock()
+        self._closed = False
+
+    def _send(self, kind, payload):
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._conn.send((kind, payload))
+            except (OSError, ValueError):
+                # Supervisor is gone, orphan checker will stop the worker
+                self._closed = True
+                return False
+        return True
+
+    def start(self):
+        pass
+
+    def tear_down(self):
+        pass
+
+    def isopen(self):
+        return not self._closed
+
+    def write_events(self, events):
+        """Send events to the supervisor and wait until they are written.
+        :return: `True` if the supervisor has written events."""
+        if events is None:
+            return not self._closed
+        with self._events_lock:
+            if not self._send(_EVENTS, events):
+                return False
+            try:
+                return bool(self._conn.recv())
+            except (EOFError, OSError):
+                # Supervisor is gone before writing events
+                self._closed = True
+                return False
+
+    def send_log(self, record):
+        self._send(_LOG, record)
+
+    def send_metrics(self):
+        histograms, counters = metrics.drain()
+        if histograms or counters:
+            self._send(_METRICS, (histograms, counters))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+
+def _worker_main(target, shard, shards, conn, args):
+    channel = ShardChannel(conn)
+    try:
+        target(shard, shards, channel, *args)
+    finally:
+        channel.close()
+
+
+class _Worker:
+    def __init__(self, shard):
+        self.shard = shard
+        self.process = None
+        self.started_at = 0
+        self.restart_at = None
+        self.restart_delay = defaults.shard_restart_delay
+        self.restarts = 0
+
+
+class ShardSupervisor:
+    """
+    Start a worker process per shard and restart crashed ones with backoff.
+    `check_workers` should be called periodically and `stop` once the
+    modular input is going to exit.
+    """
+
+    def __init__(self, target, shards, stanzas, write_events, args=()):
+        """
+        :param target: function runs in worker process as
+            `target(shard, shards, channel, *args)`, it should run tasks of
+            stanzas of the shard and write events with `channel`.
+        :param shards: number of shards.
+        :type shards: ``integer``
+        :param stanzas: stanza names, shards without stanza are not started.
+        :type stanzas: ``list``
+        :param write_events: function writes events sent by workers.
+        :param args: extra arguments passed to `target`, they must be
+            picklable.
+        :type args: ``tuple``
+        """
+        self._target = target
+        self._shards = shards
+        self._write_events = write_events
+        self._args = tuple(args)
+        self._context = multiprocessing.get_context(defaults.shard_start_method)
+        self._workers = [
+            _Worker(shard)
+            for shard in sorted({shard_of(stanza, shards) for stanza in stanzas})
+        ]
+        self._readers = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._receiver = None
+
+    def start(self):
+        for worker in self._workers:
+            self._start_worker(worker)
+        self._receiver = threading.Thread(
+            target=self._receive, name="ShardSupervisor", daemon=True
+        )
+        self._receiver.start()
+        stulog.logger.info(
+            "Started %s shard workers for %s shards",
+            len(self._workers),
+            self._shards,
+        )
+
+    def _start_worker(self, worker):
+        reader, writer = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._target, worker.shard, self._shards, writer, self._args),
+            name=f"shard-{worker.shard}",
+        )
+        process.start()
+        writer.close()
+        with self._lock:
+            self._readers[reader] = worker.shard
+        worker.process = process
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        stulog.logger.info("Shard %s worker started, pid=%s", worker.shard, process.pid)
+
+    def check_workers(self):
+        """Restart workers which exited unexpectedly, used as a timer
+        callback."""
+        if self._stopping.is_set():
+            return
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.process.is_alive():
+                continue
+            if worker.restart_at is None:
+                if now - worker.started_at > defaults.shard_max_restart_delay:
+                    # The worker ran long enough, don't punish it for old crashes
+                    worker.restart_delay = defaults.shard_restart_delay
+                worker.restart_at = now + worker.restart_delay
+                stulog.logger.warning(
+                    "Shard %s worker pid=%s exited with code %s, restart it in %s"
+                    " seconds",
+                    worker.shard,
+                    worker.process.pid,
+                    worker.process.exitcode,
+                    worker.restart_delay,
+                )
+                worker.restart_delay = min(
+                    worker.restart_delay * 2, defaults.shard_max_restart_delay
+                )
+            elif now >= worker.restart_at:
+                worker.restarts += 1
+                self._start_worker(worker)
+
+    def stop(self):
+        """Stop workers with SIGTERM, kill those don't exit in time."""
+        self._stopping.set()
+        processes = [w.process for w in self._workers if w.process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + defaults.shard_stop_timeout
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                stulog.logger.warning(
+                    "Shard worker pid=%s doesn't exit in time, kill it", process.pid
+                )
+                process.kill()
+                process.join()
+        if self._receiver is not None:
+            self._receiver.join(defaults.shard_stop_timeout)
+        stulog.logger.info("Shard workers stopped")
+
+    def stats(self):
+        """Return pid, status and restarts of each worker."""
+        return {
+            worker.shard: {
+                "pid": worker.process.pid if worker.process else None,
+                "alive": bool(worker.process and worker.process.is_alive()),
+                "restarts": worker.restarts,
+            }
+            for worker in self._workers
+        }
+
+    def _receive(self):
+        while True:
+            with self._lock:
+                readers = list(self._readers)
+            if not readers:
+                if self._stopping.is_set():
+                    return
+                time.sleep(0.1)
+                continue
+            for conn in wait(readers, timeout=0.5):
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    # Worker exited, messages it sent were all received
+                    with self._lock:
+                        self._readers.pop(conn, None)
+                    conn.close()
+                    continue
+                except Exception:
+                    stulog.logger.exception("Failed to receive from shard worker")
+                    continue
+                written = self._dispatch(kind, payload)
+                if kind == _EVENTS:
+                    try:
+                        conn.send(written)
+                    except (OSError, ValueError):
+                        # Worker exited, the pipe is closed on next receive
+                        pass
+
+    def _dispatch(self, kind, payload):
+        try:
+            if kind == _EVENTS:
+                return bool(self._write_events(payload))
+            elif kind == _LOG:
+                stulog.handle_forwarded_record(payload)
+            elif kind == _METRICS:
+                metrics.merge(*payload)
+        except Exception:
+            stulog.logger.exception("Failed to handle %s sent by shard worker", kind)
+        return False
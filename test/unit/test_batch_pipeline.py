@@ -0,0 +1,183 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from cloudconnectlib.core import task as task_module
+from cloudconnectlib.core.ext import (
+    _batch_extension_functions,
+    _extension_functions,
+    elementwise,
+    lookup_batch_method,
+    lookup_method,
+    scalar,
+)
+from cloudconnectlib.core.job import CCEJob
+from cloudconnectlib.core.plugin import cce_pipeline_batch_plugin
+from cloudconnectlib.core.task import BaseTask, CCEHTTPRequestTask, CCESplitTask
+
+
+class RecordingTask(BaseTask):
+    def __init__(self, name):
+        super().__init__(name)
+        self.contexts = []
+
+    def perform(self, context):
+        self._pre_process(context)
+        self.contexts.append(context)
+        yield context
+
+
+def _run_job(job):
+    jobs = [job]
+    while jobs:
+        jobs.extend(jobs.pop(0).run() or ())
+
+
+def test_elementwise_and_scalar():
+    batch_add = elementwise(lambda a, b: a + b)
+    assert batch_add([1, 2], [10, 20]) == [11, 22]
+    assert scalar(batch_add)(1, 2) == 3
+
+    assert lookup_batch_method("json_path")(
+        ['{"a": 1}', '{"a": 2}'], ["$.a", "$.a"]
+    ) == [1, 2]
+    assert lookup_batch_method("std_output") is None
+    assert lookup_batch_method("cce_unit_test_not_exist") is None
+
+
+def test_batch_plugin():
+    calls = []
+
+    @cce_pipeline_batch_plugin
+    def cce_unit_test_batch_upper(values):
+        calls.append(list(values))
+        return [value.upper() for value in values]
+
+    try:
+        assert lookup_method("cce_unit_test_batch_upper")("a") == "A"
+        assert lookup_batch_method("cce_unit_test_batch_upper")(["a", "b"]) == [
+            "A",
+            "B",
+        ]
+        assert calls == [["a"], ["a", "b"]]
+    finally:
+        _extension_functions.pop("cce_unit_test_batch_upper", None)
+        _batch_extension_functions.pop("cce_unit_test_batch_upper", None)
+
+
+def test_split_then_batch_pre_process():
+    calls = []
+
+    @cce_pipeline_batch_plugin
+    def cce_unit_test_batch_name(apps, suffixes):
+        calls.append(list(apps))
+        return [app + suffix for app, suffix in zip(apps, suffixes)]
+
+    try:
+        split = CCESplitTask("split")
+        split.configure_split("split_by", "{{apps}}", "app")
+        task = RecordingTask("next")
+        task.add_preprocess_handler(
+            "cce_unit_test_batch_name", ["{{app}}", "_name"], "name"
+        )
+        task.add_preprocess_handler("regex_match", ["^app", "{{name}}"], "matched")
+        task.add_preprocess_handler("set_var", ["{{name}}!"], "shout")
+
+        _run_job(CCEJob({"apps": ["app1", "app2", "app3"]}, [split, task]))
+
+        # Called once for all split elements
+        assert calls == [["app1", "app2", "app3"]]
+        assert sorted(c["name"] for c in task.contexts) == [
+            "app1_name",
+            "app2_name",
+            "app3_name",
+        ]
+        assert all(c["matched"] is True for c in task.contexts)
+        assert sorted(c["shout"] for c in task.contexts) == [
+            "app1_name!",
+            "app2_name!",
+            "app3_name!",
+        ]
+        assert all("__cce_batched_handlers__" not in c for c in task.contexts)
+    finally:
+        _extension_functions.pop("cce_unit_test_batch_name", None)
+        _batch_extension_functions.pop("cce_unit_test_batch_name", None)
+
+
+def test_failed_batch_falls_back_to_each_element():
+    calls = []
+
+    @cce_pipeline_batch_plugin
+    def cce_unit_test_batch_fragile(values):
+        calls.append(list(values))
+        if len(values) > 1:
+            raise ValueError("batch not supported")
+        return values
+
+    try:
+        split = CCESplitTask("split")
+        split.configure_split("split_by", "{{apps}}", "app")
+        task = RecordingTask("next")
+        task.add_preprocess_handler("cce_unit_test_batch_fragile", ["{{app}}"], "out")
+
+        _run_job(CCEJob({"apps": ["app1", "app2"]}, [split, task]))
+
+        assert calls[0] == ["app1", "app2"]
+        assert sorted(calls[1:]) == [["app1"], ["app2"]]
+        assert sorted(c["out"] for c in task.contexts) == ["app1", "app2"]
+    finally:
+        _extension_functions.pop("cce_unit_test_batch_fragile", None)
+        _batch_extension_functions.pop("cce_unit_test_batch_fragile", None)
+
+
+def test_batch_stops_at_handlers_using_checkpoint(monkeypatch):
+    loads = []
+
+    class Checkpointer:
+        def __init__(self, **kwargs):
+            pass
+
+        def load(self, ctx):
+            loads.append(ctx["app"])
+            return {"since": "since-" + ctx["app"]}
+
+    monkeypatch.setattr(task_module, "CheckpointManagerAdapter", Checkpointer)
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/{{app}}", "method": "GET"},
+        name="http",
+    )
+    # Contexts share the checkpoint namespace
+    task.configure_checkpoint("shared", {"since": "{{since}}"})
+    task.add_preprocess_handler("set_var", ["{{app}}"], "name")
+    task.add_preprocess_handler("set_var", ["{{since}}"], "start")
+    task.add_preprocess_handler("set_var", ["{{app}}"], "after")
+    contexts = [{"app": "a1"}, {"app": "a2"}]
+    task.batch_pre_process(contexts)
+
+    # Checkpoints are loaded by perform of each context in turn
+    assert loads == []
+    assert [c["name"] for c in contexts] == ["a1", "a2"]
+    assert all("start" not in c and "after" not in c for c in contexts)
+    assert all(c["__cce_batched_handlers__"] == 1 for c in contexts)
+
+    # A handler overwriting a checkpoint variable isn't batched either
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/{{app}}", "method": "GET"},
+        name="http",
+    )
+    task.configure_checkpoint("shared", {"since": "{{since}}"})
+    task.add_preprocess_handler("set_var", ["{{app}}"], "since")
+    contexts = [{"app": "a1"}, {"app": "a2"}]
+    task.batch_pre_process(contexts)
+    assert contexts == [{"app": "a1"}, {"app": "a2"}]
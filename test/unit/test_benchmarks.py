@@ -0,0 +1,76 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+from urllib.request import urlopen
+
+from benchmarks.compare import compare
+from benchmarks.drivers import CountingEventWriter, run_engine_v2
+from benchmarks.mock_server import MockAPIServer, ServerOptions
+from benchmarks.startup import BUDGETS, over_budget
+from benchmarks.startup import run as run_startup
+from cloudconnectlib.core.pipemgr import PipeManager
+
+
+def test_mock_server_pagination():
+    options = ServerOptions(total_events=5, page_size=2, gzip_enabled=False)
+    with MockAPIServer(options) as server:
+        pages = []
+        offset = 0
+        while True:
+            with urlopen(f"{server.url}/events?offset={offset}") as resp:
+                page = json.loads(resp.read())
+            if not page["events"]:
+                break
+            pages.append([e["id"] for e in page["events"]])
+            offset = page["next_offset"]
+        assert pages == [[0, 1], [2, 3], [4]]
+        assert server.stats.to_dict()["pages"] == 4
+
+
+def test_engine_v2_driver(monkeypatch):
+    # Use a new PipeManager which writes to the counting event writer
+    monkeypatch.setattr(PipeManager, "_instance", None)
+    writer = CountingEventWriter()
+    options = ServerOptions(total_events=30, page_size=10)
+    with MockAPIServer(options) as server:
+        run_engine_v2(server.url, 2, options.page_size, writer)
+        stats = server.stats.to_dict()
+    assert writer.events == 60
+    # 3 pages of events and an empty page for each stream
+    assert stats["pages"] == 8
+    assert stats["events"] == 60
+
+
+def test_compare():
+    base = {("client", "baseline"): {"events_per_sec": 100.0}}
+    new = {("client", "baseline"): {"events_per_sec": 80.0}}
+    lines, regressed = compare(base, new, 0.1)
+    assert regressed
+    assert "REGRESSED" in lines[0]
+    _, regressed = compare(base, new, 0.3)
+    assert not regressed
+
+
+def test_over_budget():
+    result = {"scheme_seconds": 0.1, "run_seconds": 10.0, "run_peak_rss_mb": None}
+    budgets = {"scheme_seconds": 1.0, "run_seconds": 5.0, "run_peak_rss_mb": 100}
+    assert over_budget(result, budgets) == {"run_seconds": (10.0, 5.0)}
+
+
+def test_startup_within_budget():
+    result = run_startup(repeat=1)
+    assert result["splunkd_requests"] > 0
+    assert over_budget(result) == {}, f"budgets={BUDGETS} result={result}"
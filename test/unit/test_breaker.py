@@ -0,0 +1,200 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+from cloudconnectlib.core import defaults, http
+from cloudconnectlib.core.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    get_circuit_breaker,
+    get_circuit_breaker_states,
+    reset_circuit_breakers,
+)
+from cloudconnectlib.core.exceptions import CircuitOpenError
+from cloudconnectlib.core.http import HttpClient
+from cloudconnectlib.core.models import Request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockedResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def iter_content(self, chunk_size):
+        return iter([b"{}"])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    reset_circuit_breakers()
+    yield
+    reset_circuit_breakers()
+
+
+def test_circuit_breaker_states():
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        "host", failure_threshold=2, recovery_timeout=10, clock=clock
+    )
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_after() == 10
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    # Only one probe is allowed
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot() == {
+        "name": "host",
+        "state": CLOSED,
+        "consecutive_failures": 0,
+        "rejected_requests": 2,
+        "retry_after": 0,
+    }
+
+
+def test_circuit_breaker_shared_by_host():
+    assert get_circuit_breaker("https://Example.com/a") is get_circuit_breaker(
+        "https://example.com/b?page=1"
+    )
+    assert get_circuit_breaker("https://example.com") is not get_circuit_breaker(
+        "https://example.org"
+    )
+    assert len(get_circuit_breaker_states()) == 2
+
+
+def test_http_client_fails_fast(monkeypatch):
+    sent = []
+    sleeps = []
+
+    def mock_send(self, uri, method, headers=None, body=None, proxy_info=None):
+        sent.append(uri)
+        return MockedResponse(503)
+
+    monkeypatch.setattr(HttpClient, "_send_internal", mock_send)
+    monkeypatch.setattr(HttpClient, "_initialize_connection", lambda self: None)
+    monkeypatch.setattr(http.time, "sleep", sleeps.append)
+    monkeypatch.setattr(defaults, "circuit_breaker_failure_threshold", 2)
+
+    client = HttpClient()
+    request = Request("GET", "https://example.com/api", {}, None)
+    # Retrying stops once circuit is open
+    assert client.send(request).status_code == 503
+    assert len(sent) == 2
+    assert sleeps == [1]
+
+    with pytest.raises(CircuitOpenError) as err:
+        client.send(request)
+    assert err.value.host == "https://example.com"
+    assert len(sent) == 2
+
+    state = get_circuit_breaker_states()[0]
+    assert state["state"] == OPEN
+    assert state["rejected_requests"] == 1
+
+    monkeypatch.setattr(defaults, "circuit_breaker_enabled", False)
+    assert client.send(request).status_code == 503
+    assert len(sent) == 6
+
+
+def test_circuit_breaker_scoped_by_stanza(monkeypatch):
+    assert get_circuit_breaker("https://example.com", "stanza_one") is (
+        get_circuit_breaker("https://example.com", "stanza_two")
+    )
+    monkeypatch.setattr(defaults, "circuit_breaker_scope", "stanza")
+    one = get_circuit_breaker("https://example.com/a", "stanza_one")
+    assert one is get_circuit_breaker("https://example.com/b", "stanza_one")
+    assert one is not get_circuit_breaker("https://example.com/a", "stanza_two")
+    assert one is not get_circuit_breaker("https://example.com/a")
+    assert one.name == "https://example.com [stanza_one]"
+
+
+def test_rate_limited_responses_not_counted(monkeypatch):
+    statuses = iter([503, 503, 429, 429, 429, 429])
+
+    def mock_send(self, uri, method, headers=None, body=None, proxy_info=None):
+        return MockedResponse(next(statuses))
+
+    monkeypatch.setattr(HttpClient, "_send_internal", mock_send)
+    monkeypatch.setattr(HttpClient, "_initialize_connection", lambda self: None)
+    monkeypatch.setattr(http.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(defaults, "circuit_breaker_failure_threshold", 3)
+    monkeypatch.setattr(defaults, "retries", 5)
+
+    client = HttpClient(breaker_scope="stanza_one")
+    request = Request("GET", "https://example.com/api", {}, None)
+    assert client.send(request).status_code == 429
+    state = get_circuit_breaker_states()[0]
+    assert state["name"] == "https://example.com"
+    assert state["state"] == CLOSED
+
+
+def test_stanzas_share_open_circuit(monkeypatch):
+    sent = []
+
+    def mock_send(self, uri, method, headers=None, body=None, proxy_info=None):
+        sent.append(self.breaker_scope)
+        return MockedResponse(503)
+
+    monkeypatch.setattr(HttpClient, "_send_internal", mock_send)
+    monkeypatch.setattr(HttpClient, "_initialize_connection", lambda self: None)
+    monkeypatch.setattr(http.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(defaults, "circuit_breaker_failure_threshold", 2)
+
+    request = Request("GET", "https://example.com/api", {}, None)
+    assert HttpClient(breaker_scope="one").send(request).status_code == 503
+    # The circuit opened by one stanza protects the host from others
+    with pytest.raises(CircuitOpenError):
+        HttpClient(breaker_scope="two").send(request)
+    assert sent == ["one", "one"]
+    assert len(get_circuit_breaker_states()) == 1
+
+
+def test_transition_log(caplog):
+    breaker = CircuitBreaker("host", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    breaker.record_success()
+    messages = [r.getMessage() for r in caplog.records if "Circuit" in r.getMessage()]
+    assert "after 1 failures" in messages[0]
+    assert all("failures" not in message for message in messages[1:])
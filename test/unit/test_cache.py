@@ -0,0 +1,169 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import os.path as op
+import shutil
+
+from cloudconnectlib.core.cache import HTTPValidatorCache
+from cloudconnectlib.core.checkpoint import CheckpointManagerAdapter
+from cloudconnectlib.core.http import HttpClient
+from cloudconnectlib.core.models import Request
+from cloudconnectlib.core.task import CCEHTTPRequestTask
+
+
+class MockedResponse:
+    def __init__(self, status_code, headers=None, body=""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+
+    @property
+    def header(self):
+        return self
+
+
+def _request(url="https://example.com/api?page=1", headers=None):
+    return Request(method="GET", url=url, headers=headers or {}, body=None)
+
+
+def test_key_ignores_conditional_headers():
+    plain = _request(headers={"Accept": "application/json"})
+    conditional = _request(
+        headers={"Accept": "application/json", "If-None-Match": '"abc"'}
+    )
+    assert HTTPValidatorCache.key_for(plain) == HTTPValidatorCache.key_for(conditional)
+    other = _request(headers={"Accept": "text/plain"})
+    assert HTTPValidatorCache.key_for(plain) != HTTPValidatorCache.key_for(other)
+
+
+def test_apply_and_update():
+    cache = HTTPValidatorCache()
+    request = _request()
+    cache.apply(request)
+    assert request.headers == {}
+
+    cache.update(
+        request,
+        MockedResponse(
+            200, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        ),
+    )
+    assert cache.dirty
+
+    request = _request()
+    cache.apply(request)
+    assert request.headers["If-None-Match"] == '"v1"'
+    assert request.headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    # Headers given by user are kept
+    request = _request(headers={"if-none-match": '"user"'})
+    cache.apply(request)
+    assert request.headers["if-none-match"] == '"user"'
+    assert "If-None-Match" not in request.headers
+
+    # 304 without validators keeps the previous ones
+    cache.mark_clean()
+    cache.update(_request(), MockedResponse(304))
+    assert not cache.dirty
+    assert len(cache) == 1
+
+    # Validators are forgotten once server stops returning them
+    cache.update(_request(), MockedResponse(200))
+    assert cache.dirty
+    assert len(cache) == 0
+
+
+def test_post_and_error_responses_are_not_cached():
+    cache = HTTPValidatorCache()
+    post = Request(method="POST", url="https://example.com", headers={}, body="{}")
+    cache.update(post, MockedResponse(200, {"ETag": '"v1"'}))
+    cache.update(_request(), MockedResponse(500, {"ETag": '"v1"'}))
+    assert len(cache) == 0
+
+
+def test_capacity():
+    cache = HTTPValidatorCache(capacity=2)
+    for page in range(3):
+        cache.update(
+            _request(url=f"https://example.com/api?page={page}"),
+            MockedResponse(200, {"ETag": f'"{page}"'}),
+        )
+    assert len(cache) == 2
+    request = _request(url="https://example.com/api?page=0")
+    cache.apply(request)
+    assert "If-None-Match" not in request.headers
+
+    restored = HTTPValidatorCache(cache.dump())
+    request = _request(url="https://example.com/api?page=2")
+    restored.apply(request)
+    assert request.headers["If-None-Match"] == '"2"'
+
+
+def test_http_client_sends_conditional_request(monkeypatch):
+    sent_headers = []
+
+    def mock_send(self, uri, method="GET", headers=None, body=None):
+        sent_headers.append(dict(headers))
+        if "If-None-Match" in headers:
+            return MockedResponse(304)
+        return MockedResponse(200, {"ETag": '"v1"'}, body="data")
+
+    monkeypatch.setattr(HttpClient, "_retry_send_request_if_needed", mock_send)
+    monkeypatch.setattr(HttpClient, "_initialize_connection", lambda self: None)
+
+    client = HttpClient(validator_cache=HTTPValidatorCache())
+    assert client.send(_request()).status_code == 200
+    assert client.send(_request()).status_code == 304
+    assert "If-None-Match" not in sent_headers[0]
+    assert sent_headers[1]["If-None-Match"] == '"v1"'
+
+
+def test_not_modified_stops_iteration(monkeypatch):
+    def mock_send(self, request):
+        return MockedResponse(304)
+
+    monkeypatch.setattr(HttpClient, "send", mock_send)
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/api", "method": "GET"}, name="test"
+    )
+    task.add_postprocess_handler("set_var", ["processed"], "__processed__")
+    context = {}
+    for _ in task.perform(context):
+        pass
+    assert context["__response__"] is None
+    assert "__processed__" not in context
+
+
+def test_validators_persisted_alongside_checkpoint():
+    checkpoint_dir = op.join(op.dirname(op.abspath(__file__)), "validator_ckpt_dir")
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    try:
+        task_conf = {"appname": "TEST_APPNAME", "stanza_name": "TEST_STANZA_NAME"}
+        meta_conf = {"checkpoint_dir": checkpoint_dir}
+        cmgr = CheckpointManagerAdapter(
+            ["{{name}}"], {"checkpoint": "{{checkpoint}}"}, meta_conf, task_conf
+        )
+        ctx = {"name": "TEST_NAME", "checkpoint": "CHECKPOINT"}
+        assert cmgr.load_validators(ctx) == {}
+
+        cmgr.save(ctx)
+        cmgr.save_validators(ctx, {"key": {"etag": '"v1"'}})
+        cmgr.close()
+
+        assert cmgr.load(ctx) == {"checkpoint": "CHECKPOINT"}
+        assert cmgr.load_validators(ctx) == {"key": {"etag": '"v1"'}}
+    finally:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
@@ -0,0 +1,85 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+from splunktalib.common import util as scu
+
+from cloudconnectlib.splunktacollectorlib.data_collection import (
+    ta_data_collector as tdc,
+)
+from cloudconnectlib.splunktacollectorlib.data_collection.ta_data_client import (
+    build_event,
+)
+
+
+def _legacy_format(event):
+    """Format an event in its own stream as TADataCollector used to do."""
+    if event.is_unbroken:
+        return tdc.unbroken_evt_fmt.format(
+            event.host or "",
+            event.source or "",
+            event.sourcetype or "",
+            event.time or "",
+            event.index or "",
+            scu.escape_cdata(event.raw_data),
+            "<done/>" if event.is_done else "",
+        )
+    return tdc.evt_fmt.format(
+        event.host or "",
+        event.source or "",
+        event.sourcetype or "",
+        event.time or "",
+        event.index or "",
+        scu.escape_cdata(event.raw_data),
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    ["plain", "café 中文", "a]]>b]]>", "ends with ]", "\ud800 lone", "]"],
+)
+def test_escape_cdata(data):
+    assert tdc.escape_cdata(data) == scu.escape_cdata(data)
+
+
+def test_event_record():
+    event = build_event(host="h", raw_data="data", time=1.5)
+    assert isinstance(event, tdc.Event)
+    assert event.host == "h"
+    assert event[5] == "data"
+    assert tuple(event) == ("h", None, None, 1.5, None, "data", False, False)
+    assert event == tdc.event_tuple._make(tuple(event))
+    assert event._replace(host="x").host == "x"
+    assert event._asdict()["time"] == 1.5
+    assert not hasattr(event, "__dict__")
+    with pytest.raises(Exception):
+        build_event(raw_data="data", is_unbroken=False, is_done=True)
+
+
+def test_format_events_in_one_stream():
+    events = [
+        build_event("h", "s", "st", 1.0, "main", "<xml> & ]]> data"),
+        build_event(raw_data="café]", is_unbroken=True),
+        build_event("h", raw_data="last", is_unbroken=True, is_done=True),
+    ]
+    legacy = "".join(
+        _legacy_format(e)[len("<stream>") : -len("</stream>")] for e in events
+    )
+    assert tdc.format_events(events) == "<stream>" + legacy + "</stream>"
+
+    collector = tdc.TADataCollector.__new__(tdc.TADataCollector)
+    assert collector._build_event(events) == [tdc.format_events(events)]
+    assert collector._build_event(events[0]) == [tdc.format_events(events[:1])]
+    assert collector._build_event([]) is None
@@ -99,3 +99,43 @@ def test_stop_jobs():
     cc_engine.start([HTTPJob(counter), SplitJob(split_counter, stop_counter)])
     assert counter.value() == 1
     assert stop_counter.value() + split_counter.value() <= 10
+
+
+class GeneratorJob:
+    def __init__(self, threads, depth):
+        self._threads = threads
+        self._depth = depth
+
+    def run(self):
+        time.sleep(0.1)
+        self._threads.append(threading.current_thread().name)
+        if self._depth:
+            yield GeneratorJob(self._threads, self._depth - 1)
+
+    def stop(self):
+        pass
+
+
+def test_generator_jobs_run_in_engine_loop_by_default():
+    threads = []
+    cc_engine = engine.CloudConnectEngine(max_workers=4)
+    cc_engine.start([GeneratorJob(threads, 1) for _ in range(2)])
+    assert threads == [threading.current_thread().name] * 4
+
+
+def test_generator_jobs_run_in_pool():
+    threads = []
+    cc_engine = engine.CloudConnectEngine(max_workers=4, concurrent_jobs=True)
+    start = time.time()
+    cc_engine.start([GeneratorJob(threads, 2) for _ in range(4)])
+    assert len(threads) == 12
+    assert threading.main_thread().name not in threads
+    # jobs of different chains run concurrently
+    assert time.time() - start < 1.0
+
+
+def test_fixed_thread_pool():
+    counter = Counter()
+    cc_engine = engine.CloudConnectEngine(max_workers=2, adaptive=False)
+    cc_engine.start([SplitJob(counter)])
+    assert counter.value() == 10
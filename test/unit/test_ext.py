@@ -66,6 +66,7 @@ def test_json_path():
     test_cases = [
         ({"foo": [{"baz": 1}, {"baz": 2}]}, "foo[*].baz", 2, [1, 2]),
         ('{"foo": [{"baz": 1}, {"baz": 2}]}', "foo[*].baz", 2, [1, 2]),
+        (b'{"foo": [{"baz": 1}, {"baz": 2}]}', "foo[*].baz", 2, [1, 2]),
         ([{"baz": 1}, {"baz": 2}], "[*].baz", 2, [1, 2]),
         (
             {"a": {"x": {"b": 1, "c": "number one"}, "y": {"b": 2, "c": "number two"}}},
@@ -0,0 +1,182 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import threading
+import time
+
+import pytest
+
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_consts as c
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_data_loader as dl
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_file_watcher as fw
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_hot_reload as hr
+
+
+class MockedCollector:
+    def __init__(self, config):
+        self.config = config
+        self.stopped = False
+
+    def get_interval(self):
+        return 60
+
+    def get_task_config(self):
+        return self.config
+
+    def stop(self):
+        self.stopped = True
+
+    def wait_stopped(self, timeout=None):
+        return True
+
+
+class MockedScheduler:
+    def __init__(self):
+        self.jobs = set()
+
+    def add_jobs(self, jobs):
+        self.jobs.update(jobs)
+
+    def remove_jobs(self, jobs):
+        self.jobs.difference_update(jobs)
+
+
+def _config(name, value="1"):
+    return {c.stanza_name: name, "value": value}
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    settings = {
+        "process_size": 0,
+        "thread_min_size": 1,
+        "thread_max_size": 1,
+        "task_queue_size": 10,
+    }
+    monkeypatch.setattr(
+        dl.TADataLoader, "_read_default_settings", staticmethod(lambda: dict(settings))
+    )
+    loader = dl.TADataLoader(MockedScheduler(), None)
+    loader.torn_down = False
+
+    def tear_down():
+        loader.torn_down = True
+
+    loader.tear_down = tear_down
+    return loader
+
+
+@pytest.mark.skipif(not fw.InotifyWatcher.is_available(), reason="no inotify")
+def test_inotify_watcher(tmp_path):
+    watched = tmp_path / "ta_settings.conf"
+    changes = []
+    changed = threading.Event()
+
+    def callback(files):
+        changes.append(files)
+        changed.set()
+
+    watcher = fw.InotifyWatcher(callback, [str(watched)], debounce=0.05)
+    watcher.start()
+    try:
+        (tmp_path / "other.conf").write_text("ignored")
+        watched.write_text("a")
+        watched.write_text("b")
+        assert changed.wait(5)
+        assert changes == [[str(watched)]]
+
+        # Files replaced by renaming are noticed too
+        changed.clear()
+        (tmp_path / "tmp.conf").write_text("c")
+        os.replace(tmp_path / "tmp.conf", watched)
+        assert changed.wait(5)
+        assert changes[-1] == [str(watched)]
+    finally:
+        watcher.stop()
+
+
+def test_polling_watcher(tmp_path, loader):
+    watched = tmp_path / "ta_settings.conf"
+    watched.write_text("a")
+    changes = []
+    watcher = fw.PollingWatcher(changes.append, [str(watched)], loader)
+    watcher.start()
+    assert watcher._timer is not None
+    os.utime(watched, (time.time() + 10, time.time() + 10))
+    watcher._checker.check_changes()
+    assert changes == [[str(watched)]]
+    watcher.stop()
+
+
+def test_loader_add_and_remove_jobs(loader):
+    collectors = [MockedCollector(_config(f"input_{i}")) for i in range(3)]
+    loader.add_jobs(collectors)
+    assert loader.get_jobs() == collectors
+    assert len(loader._scheduler.jobs) == 3
+
+    assert loader.remove_jobs(collectors[:1] + collectors[:1]) == collectors[:1]
+    assert collectors[0].stopped
+    assert loader.get_jobs() == collectors[1:]
+    assert len(loader._scheduler.jobs) == 2
+
+
+def test_hot_reload(loader):
+    loader.add_jobs(
+        [
+            MockedCollector(_config("unchanged")),
+            MockedCollector(_config("changed")),
+            MockedCollector(_config("removed")),
+        ]
+    )
+    before = {j.config[c.stanza_name]: j for j in loader.get_jobs()}
+    new_configs = [_config("unchanged"), _config("changed", "2"), _config("added")]
+    reloader = hr.HotReloader(
+        loader,
+        lambda: ("tconfig", new_configs),
+        lambda tconfig, config: MockedCollector(config),
+    )
+    reloader.reload(["ta_settings.conf"])
+
+    after = {j.config[c.stanza_name]: j for j in loader.get_jobs()}
+    assert sorted(after) == ["added", "changed", "unchanged"]
+    assert after["unchanged"] is before["unchanged"]
+    assert after["changed"] is not before["changed"]
+    assert after["changed"].config["value"] == "2"
+    assert before["changed"].stopped and before["removed"].stopped
+    assert not before["unchanged"].stopped
+    assert reloader.reloads == 1 and not loader.torn_down
+
+    reloader.reload(["ta_settings.conf"])
+    assert reloader.reloads == 1
+
+
+def test_hot_reload_falls_back_to_reboot(loader):
+    def load_task_configs():
+        raise ValueError("invalid interval")
+
+    reloader = hr.HotReloader(loader, load_task_configs, None)
+    reloader.reload(["ta_settings.conf"])
+    assert loader.torn_down
+
+    class StuckCollector(MockedCollector):
+        def wait_stopped(self, timeout=None):
+            return False
+
+    loader.torn_down = False
+    loader.add_jobs([StuckCollector(_config("stuck"))])
+    reloader = hr.HotReloader(loader, lambda: ("tconfig", []), None)
+    reloader.reload(["ta_settings.conf"])
+    assert loader.torn_down
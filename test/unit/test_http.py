@@ -13,7 +13,66 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from cloudconnectlib.core.http import _make_prepare_url_func
+import gc
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from cloudconnectlib.core import defaults
+from cloudconnectlib.core.exceptions import ResponseTooLargeError
+from cloudconnectlib.core.http import (
+    HttpClient,
+    HTTPResponse,
+    _make_prepare_url_func,
+    get_accept_encoding,
+    get_oversized_response_count,
+    get_process_budget,
+    is_blank_body,
+)
+from cloudconnectlib.core.models import Request
+
+_PAYLOAD = json.dumps([{"id": i, "name": "event %s" % i} for i in range(2000)])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, received=b""):
+        body = _PAYLOAD.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("X-Accept-Encoding", self.headers.get("Accept-Encoding", ""))
+        self.send_header("X-Received", received.decode("utf-8")[:32])
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        self._reply(data)
+
+
+@pytest.fixture
+def server_url():
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%s/api" % server.server_port
+    server.shutdown()
+    server.server_close()
 
 
 def test_make_prepare_url_func():
@@ -57,3 +116,117 @@ def test_make_prepare_url_func():
     assert rurl7 == "https://jira.splunk.com/browse/Query?JIRA=ADDON%2012156"
     assert rurl8 == url8
     assert rurl9 == url9
+
+
+def test_accept_encoding(monkeypatch):
+    assert "gzip" in get_accept_encoding()
+    monkeypatch.setattr(defaults, "accept_encoding", "identity")
+    assert get_accept_encoding() == "identity"
+
+
+def test_streaming_decompression(server_url, monkeypatch):
+    monkeypatch.setattr(defaults, "content_chunk_size", 1024)
+    client = HttpClient()
+    response = client.send(Request("GET", server_url, {}, None))
+    assert response.status_code == 200
+    assert response.header.headers["Content-Encoding"] == "gzip"
+    assert "gzip" in response.header.headers["X-Accept-Encoding"]
+    assert json.loads(response.body) == json.loads(_PAYLOAD)
+
+
+def test_compress_request_body(server_url):
+    body = json.dumps({"query": "x" * 2048})
+    client = HttpClient(compress_request_body=True)
+    response = client.send(Request("POST", server_url, {}, body))
+    assert response.header.headers["X-Received"] == body[:32]
+
+    headers, compressed = HttpClient._compress_body({}, body)
+    assert headers == {"Content-Encoding": "gzip"}
+    assert gzip.decompress(compressed).decode("utf-8") == body
+
+    # Small body or body already encoded is sent as it is
+    assert HttpClient._compress_body({}, "{}") == ({}, "{}")
+    encoded = {"content-encoding": "br"}
+    assert HttpClient._compress_body(encoded, body) == (encoded, body)
+
+
+class MockedRawResponse:
+    def __init__(self, content_type):
+        self.headers = CaseInsensitiveDict({"Content-Type": content_type})
+        self.status_code = 200
+
+
+def test_response_decoded_lazily(monkeypatch):
+    decoded = []
+    origin = HTTPResponse._decode_content
+
+    def mock_decode(response, content, charset=None):
+        decoded.append(content)
+        return origin(response, content, charset)
+
+    monkeypatch.setattr(HTTPResponse, "_decode_content", staticmethod(mock_decode))
+    content = "caf\u00e9".encode("latin-1")
+    response = HTTPResponse(MockedRawResponse("text/plain; charset=latin-1"), content)
+    assert response.raw_bytes is content
+    assert bytes(response.raw_view) == content
+    assert not decoded
+
+    assert response.charset == "latin-1"
+    assert response.body == "caf\u00e9"
+    assert response.body == "caf\u00e9"
+    assert len(decoded) == 1
+
+
+def test_is_blank_body():
+    raw = MockedRawResponse("application/json")
+    assert is_blank_body(HTTPResponse(raw, b""))
+    assert is_blank_body(HTTPResponse(raw, b" \r\n"))
+    assert not is_blank_body(HTTPResponse(raw, b"{}"))
+
+
+def test_max_response_size(server_url, monkeypatch):
+    monkeypatch.setattr(defaults, "content_chunk_size", 1024)
+    payload_size = len(_PAYLOAD)
+    count = get_oversized_response_count().get("request", 0)
+
+    # Compressed response is checked against its decompressed size
+    client = HttpClient(max_response_size=payload_size - 1)
+    with pytest.raises(ResponseTooLargeError) as err:
+        client.send(Request("GET", server_url, {}, None))
+    assert err.value.scope == "request"
+    assert err.value.limit == payload_size - 1
+
+    # Unencoded response fails fast with Content-Length
+    client = HttpClient(max_response_size=1024)
+    headers = {"Accept-Encoding": "identity"}
+    with pytest.raises(ResponseTooLargeError) as err:
+        client.send(Request("GET", server_url, headers, None))
+    assert err.value.size == payload_size
+    assert get_oversized_response_count()["request"] == count + 2
+
+    monkeypatch.setattr(defaults, "max_response_size", 1024)
+    client = HttpClient(max_response_size=payload_size)
+    assert len(client.send(Request("GET", server_url, {}, None)).body) == payload_size
+
+
+def test_process_response_budget(server_url, monkeypatch):
+    budget = get_process_budget()
+    gc.collect()
+    assert budget.used == 0
+
+    client = HttpClient()
+    response = client.send(Request("GET", server_url, {}, None))
+    assert budget.used == len(_PAYLOAD)
+
+    monkeypatch.setattr(defaults, "max_process_response_size", len(_PAYLOAD) + 1)
+    with pytest.raises(ResponseTooLargeError) as err:
+        client.send(Request("GET", server_url, {}, None))
+    assert err.value.scope == "process"
+    assert budget.used == len(_PAYLOAD)
+
+    # Budget is released once response is collected
+    del response
+    gc.collect()
+    assert budget.used == 0
+    response = client.send(Request("GET", server_url, {}, None))
+    assert len(response.body) == len(_PAYLOAD)
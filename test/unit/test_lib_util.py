@@ -13,9 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import subprocess
 import sys
 
-from cloudconnectlib.common.lib_util import register_module
+import pytest
+
+from cloudconnectlib.common.lib_util import lazy_import, register_module
 
 
 def test_register_module():
@@ -36,3 +39,34 @@ def test_register_module():
     assert system_path[0] == module_exist
 
     del system_path[0]
+
+
+def test_lazy_import():
+    module = lazy_import("cloudconnectlib.common.lib_util")
+    assert module.__dict__["_lazy_module"] is None
+    assert module.register_module is register_module
+    assert module.__dict__["_lazy_module"] is not None
+
+    relative = lazy_import(".lib_util", "cloudconnectlib.common")
+    assert relative.lazy_import is lazy_import
+
+    missing = lazy_import("cloudconnect_module_not_exist")
+    with pytest.raises(ImportError):
+        missing.anything
+
+
+def test_mod_input_imports_no_heavy_dependencies():
+    code = (
+        "import sys\n"
+        "import cloudconnectlib.splunktacollectorlib.cloud_connect_mod_input\n"
+        "heavy = ('solnlib', 'splunktalib', 'splunktaucclib', 'jinja2',\n"
+        "         'jsonschema', 'jsonpath_ng', 'munch', 'requests')\n"
+        "print(','.join(m for m in heavy if m in sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    assert proc.stdout.strip() == ""
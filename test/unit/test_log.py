@@ -0,0 +1,129 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import logging
+import threading
+
+from solnlib import log as solnlib_log
+
+from cloudconnectlib.common.log import CloudClientLogAdapter
+from cloudconnectlib.splunktacollectorlib.common import log as stulog
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((self.format(record), threading.current_thread()))
+
+
+def test_lazy_json():
+    class Unserializable:
+        def __repr__(self):
+            return "unserializable"
+
+    assert str(stulog.LazyJson({"a": [1]})) == '{"a": [1]}'
+    assert str(stulog.LazyJson(Unserializable())) == "unserializable"
+
+
+def test_lazy_json_not_serialized_if_disabled():
+    dumped = []
+
+    class RecordingLazyJson(stulog.LazyJson):
+        def __str__(self):
+            dumped.append(self.obj)
+            return super().__str__()
+
+    logger = logging.getLogger("test_lazy_json_not_serialized")
+    logger.propagate = False
+    logger.addHandler(RecordingHandler())
+    logger.setLevel(logging.INFO)
+    logger.debug("value=%s", RecordingLazyJson({"a": 1}))
+    assert dumped == []
+    logger.info("value=%s", RecordingLazyJson({"a": 1}))
+    assert dumped == [{"a": 1}]
+
+
+def test_queue_logging():
+    logger = logging.getLogger("test_queue_logging")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+
+    stulog.start_queue_logging(logger)
+    assert handler not in logger.handlers
+    args = {"key": "before"}
+    logger.info("value=%s", args)
+    args["key"] = "after"
+    stulog.stop_queue_logging()
+
+    assert logger.handlers == [handler]
+    message, thread = handler.records[0]
+    assert message == "value={'key': 'before'}"
+    assert thread is not threading.current_thread()
+
+
+def test_log_adapter_prefix():
+    logger = logging.getLogger("test_log_adapter_prefix")
+    logger.propagate = False
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    adapter = CloudClientLogAdapter(logger)
+    origin_logger, origin_prefix = adapter.logger, adapter.cc_prefix
+    try:
+        adapter.logger = logger
+        adapter.cc_prefix = ""
+        adapter.warning("message")
+        adapter.cc_prefix = "[stanza]"
+        adapter.warning("message")
+    finally:
+        adapter.logger, adapter.cc_prefix = origin_logger, origin_prefix
+    assert [r[0] for r in handler.records] == ["message", "[stanza] message"]
+
+
+def test_forward_logging(tmp_path):
+    log_file = str(tmp_path / "forwarded.log")
+    target = logging.getLogger(log_file)
+    target.propagate = False
+    target.setLevel(logging.INFO)
+    target.addHandler(logging.FileHandler(log_file))
+    forwarded = []
+    try:
+        stulog.forward_logging(forwarded.append)
+        assert not any(isinstance(h, logging.FileHandler) for h in target.handlers)
+        target.info("hello %s", "world")
+        target.debug("filtered")
+        assert [r.getMessage() for r in forwarded] == ["hello world"]
+
+        # Records are written by the handlers of the receiving process
+        handler = RecordingHandler()
+        for h in list(target.handlers):
+            target.removeHandler(h)
+        target.addHandler(handler)
+        stulog.handle_forwarded_record(forwarded[0])
+        assert handler.records[0][0] == "hello world"
+
+        # Loggers created later are forwarded once they are created
+        created = solnlib_log.Logs().get_logger("forward_logging_test")
+        assert not any(isinstance(h, logging.FileHandler) for h in created.handlers)
+        created.info("created later")
+        assert forwarded[-1].getMessage() == "created later"
+    finally:
+        stulog.stop_forward_logging()
+        for h in list(target.handlers):
+            target.removeHandler(h)
@@ -0,0 +1,115 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import threading
+
+import pytest
+
+from cloudconnectlib.core import metrics
+from cloudconnectlib.core.http import HttpClient
+from cloudconnectlib.core.task import CCEHTTPRequestTask
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+    metrics.set_stanza(None)
+
+
+def test_disabled_metrics_are_noop():
+    assert not metrics.is_enabled()
+    assert metrics.timer("stage") is metrics.timer("other")
+    with metrics.timer("stage"):
+        metrics.incr("counter")
+    metrics.observe("stage", 1)
+    assert metrics.snapshot() == {}
+
+
+def test_histogram():
+    histogram = metrics.Histogram()
+    for ms in (0.5, 3, 3, 40, 2000):
+        histogram.observe(ms)
+    result = histogram.to_dict()
+    assert result["count"] == 5
+    assert result["min_ms"] == 0.5
+    assert result["max_ms"] == 2000
+    assert result["p50_ms"] == 5
+    assert result["p99_ms"] == 2000
+
+
+def test_metrics_per_stanza(enabled_metrics):
+    def run(stanza):
+        metrics.set_stanza(stanza)
+        with metrics.timer("stage"):
+            metrics.incr("counter", 2)
+
+    threads = [threading.Thread(target=run, args=(s,)) for s in ("s1", "s2")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.incr("counter")
+
+    result = metrics.snapshot(reset=True)
+    assert result["s1"]["counters"] == {"counter": 2}
+    assert result["s2"]["stages"]["stage"]["count"] == 1
+    assert result[metrics.GLOBAL_STANZA]["counters"] == {"counter": 1}
+    assert metrics.snapshot() == {}
+    assert '"stanza": "s1"' in metrics.format_metrics("s1", result["s1"])
+
+
+class MockedResponse:
+    status_code = 200
+    body = '{"events": []}'
+    raw_bytes = body.encode("utf-8")
+
+
+def test_task_stages(enabled_metrics, monkeypatch):
+    monkeypatch.setattr(HttpClient, "send", lambda self, request: MockedResponse())
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/api", "method": "GET"}, name="test"
+    )
+    task.add_postprocess_handler("set_var", ["{{__response__.body}}"], "content")
+    task.set_iteration_count(2)
+    metrics.set_stanza("stanza")
+    for _ in task.perform({}):
+        pass
+
+    result = metrics.snapshot()["stanza"]
+    assert result["counters"]["requests"] == 2
+    for stage in ("render", "post_process", "handler.set_var", "checkpoint"):
+        assert result["stages"][stage]["count"] == 2
+    assert result["stages"]["task"]["count"] == 1
+
+
+def test_drain_and_merge(enabled_metrics):
+    metrics.observe("stage", 0.003, stanza="a")
+    metrics.incr("counter", 2, stanza="a")
+    histograms, counters = metrics.drain()
+    assert metrics.snapshot() == {}
+
+    # Metrics of another process are added to the recorded ones
+    metrics.observe("stage", 0.040, stanza="a")
+    metrics.merge(histograms, counters)
+    metrics.merge(histograms, counters)
+    result = metrics.snapshot()["a"]
+    assert result["counters"] == {"counter": 4}
+    assert result["stages"]["stage"]["count"] == 3
+    assert result["stages"]["stage"]["min_ms"] == 3
+    assert result["stages"]["stage"]["max_ms"] == 40
@@ -0,0 +1,173 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import threading
+
+import pytest
+
+from cloudconnectlib.core import defaults, offload
+from cloudconnectlib.core.http import HttpClient, HTTPResponse
+from cloudconnectlib.core.task import CCEHTTPRequestTask
+
+
+class MockedResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {"content-type": "application/json"}
+
+
+@pytest.fixture(autouse=True)
+def process_pool(monkeypatch):
+    monkeypatch.setattr(defaults, "offload_workers", 2)
+    yield
+    offload.shutdown_pool()
+
+
+def _page(count=2000):
+    items = [{"id": i, "name": f"item-{i}", "value": "ü" * 10} for i in range(count)]
+    return json.dumps({"items": items}).encode("utf-8")
+
+
+def _spec(handler):
+    return handler
+
+
+def test_group_handlers():
+    handlers = [
+        ("json_path", [], "a"),
+        ("splunk_xml", [], "b"),
+        ("std_output", [], None),
+        ("set_var", [], "c"),
+    ]
+    groups = offload.group_handlers(handlers, _spec)
+    assert [(o, len(g)) for o, g in groups] == [(True, 2), (False, 1), (True, 1)]
+
+
+def test_run_handlers_with_shared_memory(monkeypatch):
+    monkeypatch.setattr(defaults, "offload_shm_min_size", 1024)
+    response = HTTPResponse(MockedResponse(), _page())
+    specs = [
+        ("json_path", ["{{__response__.body}}", "$.items[*]"], "__items__"),
+        ("splunk_xml", ["{{__items__}}", "", "{{index}}", "", "test"], "__xml__"),
+        ("set_var", ["{{__response__.status_code}}"], "__status__"),
+    ]
+    context = {"__response__": response, "index": "main", "unused": object()}
+    outputs = offload.run_handlers(specs, context)
+
+    local = offload._run_in_worker(
+        specs, {"__response__": response, "index": "main"}, None
+    )
+    assert outputs == local
+    assert len(outputs["__items__"]) == 2000
+    assert outputs["__items__"][1]["value"] == "ü" * 10
+    assert outputs["__status__"] == "200"
+
+
+def test_run_handlers_stop_key():
+    specs = [
+        ("set_var", ["{{flag}}"], "is_token_refreshed"),
+        ("set_var", ["after"], "__after__"),
+    ]
+    assert offload.run_handlers(specs, {"flag": "yes"}, "is_token_refreshed") == {
+        "is_token_refreshed": "yes"
+    }
+    assert offload.run_handlers(specs, {"flag": ""}, "is_token_refreshed") == {
+        "is_token_refreshed": "",
+        "__after__": "after",
+    }
+
+
+def test_execute_falls_back_to_local():
+    local = []
+
+    def run_local(handler):
+        local.append(handler)
+        return True
+
+    # Lock can't be pickled, handlers referencing it run in current process
+    handlers = [("set_var", ["{{lock}}"], "__lock__")]
+    context = {"lock": threading.Lock()}
+    assert offload.execute(handlers, _spec, context, run_local)
+    assert local == handlers
+    assert "__lock__" not in context
+
+
+def test_execute_falls_back_before_pool_exists(monkeypatch):
+    local = []
+
+    def run_local(handler):
+        local.append(handler)
+        return True
+
+    def run_handlers(specs, context, stop_key=None):
+        raise OSError("unable to create shared memory")
+
+    offload.shutdown_pool()
+    monkeypatch.setattr(offload, "run_handlers", run_handlers)
+    handlers = [("set_var", ["{{value}}"], "__value__")]
+    assert offload.execute(handlers, _spec, {"value": 1}, run_local)
+    assert local == handlers
+
+
+def test_execute_raises_handler_errors():
+    local = []
+
+    def run_local(handler):
+        local.append(handler)
+        return True
+
+    # A set can be pickled but can't be dumped as JSON
+    handlers = [("splunk_xml", ["{{items}}"], "__xml__")]
+    with pytest.raises(TypeError) as err:
+        offload.execute(handlers, _spec, {"items": [{1, 2}]}, run_local)
+    assert getattr(err.value, offload._HANDLER_ERROR_ATTR) == "splunk_xml"
+    # Handlers failed in worker don't run again locally
+    assert local == []
+
+
+def _perform(monkeypatch, content, **kwargs):
+    def mock_send(self, request):
+        return HTTPResponse(MockedResponse(), content)
+
+    monkeypatch.setattr(HttpClient, "send", mock_send)
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/api", "method": "GET"},
+        name="test",
+        **kwargs,
+    )
+    task.add_postprocess_handler(
+        "json_path", ["{{__response__.body}}", "$.items[*]"], "__items__"
+    )
+    task.add_postprocess_handler("std_output", ["{{__count__}}"], "")
+    task.add_postprocess_handler(
+        "json_path", ["{{__response__.body}}", "$.items[-1:].id"], "__last__"
+    )
+    task.add_postprocess_handler("set_var", ["{{__items__ | count}}"], "__count__")
+    context = {}
+    for _ in task.perform(context):
+        pass
+    context.pop("__response__")
+    return context
+
+
+def test_task_offload_post_process(monkeypatch):
+    monkeypatch.setattr(defaults, "offload_shm_min_size", 1024)
+    content = _page()
+    local = _perform(monkeypatch, content)
+    offloaded = _perform(monkeypatch, content, offload_post_process=True)
+    assert offloaded == local
+    assert offloaded["__count__"] == "2000"
+    assert offloaded["__last__"] == 1999
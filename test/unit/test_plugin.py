@@ -17,6 +17,7 @@ import importlib
 import logging
 import os
 import sys
+import time
 
 from . import common
 
@@ -116,33 +117,33 @@ def cce_unit_test_func_without_decorator(msg):
         _extension_functions.pop("cce_unit_test_func_with_arg2", None)
         write_py_file(plugin_dir, test_plugin_file1, test_functions)
         init_pipeline_plugins(plugin_dir)
-        assert "cce_unit_test_func_with_arg1" not in list(_extension_functions.keys())
-        assert "cce_unit_test_func_with_arg2" not in list(_extension_functions.keys())
+        assert lookup_method("cce_unit_test_func_with_arg1") is None
+        assert lookup_method("cce_unit_test_func_with_arg2") is None
 
         # Don't have the right prefix
         write_py_file(plugin_dir, test_plugin_file2, import_part + test_functions)
         init_pipeline_plugins(plugin_dir)
-        assert "cce_unit_test_func_with_arg1" not in list(_extension_functions.keys())
-        assert "cce_unit_test_func_with_arg2" not in list(_extension_functions.keys())
+        assert lookup_method("cce_unit_test_func_with_arg1") is None
+        assert lookup_method("cce_unit_test_func_with_arg2") is None
 
         write_py_file(plugin_dir, test_plugin_file3, import_part + test_functions)
         init_pipeline_plugins(plugin_dir)
-        assert "cce_unit_test_func_with_arg1" not in list(_extension_functions.keys())
-        assert "cce_unit_test_func_with_arg2" not in list(_extension_functions.keys())
+        assert lookup_method("cce_unit_test_func_with_arg1") is None
+        assert lookup_method("cce_unit_test_func_with_arg2") is None
 
         # The file name already exists
         write_py_file(plugin_dir, test_plugin_file4, import_part + test_functions)
         init_pipeline_plugins(plugin_dir)
-        assert "cce_unit_test_func_with_arg1" not in list(_extension_functions.keys())
-        assert "cce_unit_test_func_with_arg2" not in list(_extension_functions.keys())
+        assert lookup_method("cce_unit_test_func_with_arg1") is None
+        assert lookup_method("cce_unit_test_func_with_arg2") is None
 
         # The function name already exists
         json_path_value = _extension_functions["json_path"]
         write_py_file(plugin_dir, test_plugin_file5, import_part + test_functions)
         importlib.invalidate_caches()
         init_pipeline_plugins(plugin_dir)
-        assert "cce_unit_test_func_with_arg1" in list(_extension_functions.keys())
-        assert "cce_unit_test_func_with_arg2" in list(_extension_functions.keys())
+        assert lookup_method("cce_unit_test_func_with_arg1") is not None
+        assert lookup_method("cce_unit_test_func_with_arg2") is not None
         assert _extension_functions["json_path"] == json_path_value
 
     finally:
@@ -179,9 +180,11 @@ def cce_unit_test_func_without_decorator(msg):
         _extension_functions.pop("cce_unit_test_func_with_arg1", None)
         _extension_functions.pop("cce_unit_test_func_with_arg2", None)
         write_py_file(plugin_dir, test_plugin_file, test_functions)
+        importlib.invalidate_caches()
         init_pipeline_plugins(plugin_dir)
 
-        assert "cce_unit_test_func_with_arg1" in list(_extension_functions.keys())
+        # The plugin file is imported on first lookup of its functions
+        assert "cce_unit_test_func_with_arg1" not in list(_extension_functions.keys())
         ret = lookup_method("cce_unit_test_func_with_arg1")("hello")
         assert ret == "hello"
 
@@ -261,3 +264,74 @@ def cce_unit_test_func_in_engine_arg2(msg):
         remove_file(plugin_dir, test_plugin_file1 + "c")
         remove_file(plugin_dir, test_plugin_file2)
         remove_file(plugin_dir, test_plugin_file2 + "c")
+
+
+def test_plugin_manifest_cache(tmp_path):
+    from cloudconnectlib.core import plugin
+
+    plugin_dir = str(tmp_path)
+    lazy_functions = """
+from cloudconnectlib.core.plugin import cce_pipeline_plugin
+
+@cce_pipeline_plugin
+def cce_unit_test_manifest_lazy(msg):
+    return msg
+"""
+    eager_functions = """
+from cloudconnectlib.core import plugin
+
+def cce_unit_test_manifest_eager(msg):
+    return msg
+
+plugin.cce_pipeline_plugin(cce_unit_test_manifest_eager)
+"""
+    names = ("cce_unit_test_manifest_lazy", "cce_unit_test_manifest_eager")
+    modules = ("cce_plugin_manifest_lazy", "cce_plugin_manifest_eager")
+    try:
+        write_py_file(plugin_dir, modules[0] + ".py", lazy_functions)
+        past = time.time() - 100
+        os.utime(os.path.join(plugin_dir, modules[0] + ".py"), (past, past))
+        os.utime(plugin_dir, (past, past))
+        init_pipeline_plugins(plugin_dir)
+        manifest = plugin._manifests[plugin_dir]
+        assert manifest.functions == {names[0]: [modules[0]]}
+        assert modules[0] not in sys.modules
+
+        # Cached as long as the directory doesn't change
+        init_pipeline_plugins(plugin_dir)
+        assert plugin._manifests[plugin_dir] is manifest
+
+        # A file edited in place doesn't change the directory
+        write_py_file(
+            plugin_dir,
+            modules[0] + ".py",
+            lazy_functions.replace(names[0], names[0] + "_edited"),
+        )
+        os.utime(os.path.join(plugin_dir, modules[0] + ".py"), (past + 1, past + 1))
+        os.utime(plugin_dir, (past, past))
+        init_pipeline_plugins(plugin_dir)
+        assert plugin._manifests[plugin_dir] is not manifest
+        manifest = plugin._manifests[plugin_dir]
+        assert manifest.functions == {names[0] + "_edited": [modules[0]]}
+        write_py_file(plugin_dir, modules[0] + ".py", lazy_functions)
+        os.utime(os.path.join(plugin_dir, modules[0] + ".py"), (past, past))
+
+        # Registered other than by decorator, imported right away
+        write_py_file(plugin_dir, modules[1] + ".py", eager_functions)
+        os.utime(os.path.join(plugin_dir, modules[1] + ".py"), (past, past))
+        os.utime(plugin_dir, (past + 1, past + 1))
+        importlib.invalidate_caches()
+        init_pipeline_plugins(plugin_dir)
+        assert plugin._manifests[plugin_dir] is not manifest
+        assert names[1] in _extension_functions
+        assert names[0] not in _extension_functions
+
+        assert lookup_method(names[0])("hello") == "hello"
+        assert modules[0] in sys.modules
+    finally:
+        for name in names:
+            _extension_functions.pop(name, None)
+        for module in modules:
+            sys.modules.pop(module, None)
+        plugin._manifests.pop(plugin_dir, None)
+        sys.path.remove(plugin_dir)
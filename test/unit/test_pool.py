@@ -0,0 +1,81 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+
+import pytest
+
+from cloudconnectlib.core import defaults
+from cloudconnectlib.core.pool import AdaptiveThreadPool
+
+
+def _burn(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+    return seconds
+
+
+def test_grows_for_blocking_calls_and_shrinks_when_idle():
+    pool = AdaptiveThreadPool(
+        min_workers=1, max_workers=6, idle_timeout=0.2, adjust_interval=0
+    )
+    futures = [pool.submit(time.sleep, 0.2) for _ in range(12)]
+    for future in futures:
+        future.result()
+    stats = pool.stats()
+    assert stats["peak_workers"] == 6
+    assert stats["grows"] >= 1
+    assert stats["calls"] == 12
+
+    deadline = time.monotonic() + 5
+    while pool.workers > 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.workers == 1
+    assert pool.stats()["shrinks"] == 5
+    pool.shutdown()
+
+
+def test_default_maximum_is_conservative():
+    # Growing beyond it multiplies concurrent requests to the API
+    pool = AdaptiveThreadPool(min_workers=1, adjust_interval=0)
+    futures = [pool.submit(time.sleep, 0.1) for _ in range(12)]
+    for future in futures:
+        future.result()
+    assert pool.stats()["peak_workers"] == defaults.engine_max_workers == 4
+    pool.shutdown()
+
+
+def test_does_not_grow_beyond_cpus_for_cpu_bound_calls():
+    pool = AdaptiveThreadPool(min_workers=1, max_workers=8, adjust_interval=0)
+    pool._cpu_count = 1
+    assert pool.submit(_burn, 0.05).result() == 0.05
+    futures = [pool.submit(_burn, 0.02) for _ in range(5)]
+    for future in futures:
+        future.result()
+    assert pool.stats()["peak_workers"] == 1
+    pool.shutdown()
+
+
+def test_exceptions_and_shutdown():
+    pool = AdaptiveThreadPool(min_workers=2, max_workers=2)
+    future = pool.submit(int, "not a number")
+    with pytest.raises(ValueError):
+        future.result()
+    results = [pool.submit(pow, 2, i) for i in range(5)]
+    pool.shutdown(wait=True)
+    assert [f.result() for f in results] == [1, 2, 4, 8, 16]
+    with pytest.raises(RuntimeError):
+        pool.submit(pow, 2, 2)
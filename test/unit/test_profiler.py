@@ -0,0 +1,73 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+from cloudconnectlib.core import metrics, profiler
+from cloudconnectlib.core.ext import _extension_functions, lookup_method
+
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.reset()
+    profiler.enable(alloc_sample_every=1)
+    yield
+    profiler.disable()
+    profiler.reset()
+    metrics.set_stanza(None)
+
+
+def test_disabled_profiler_returns_original_function():
+    assert not profiler.is_enabled()
+    assert lookup_method("json_path") is _extension_functions["json_path"]
+
+
+def test_profile_pipeline_functions(enabled_profiler, monkeypatch):
+    def outer(value):
+        return lookup_method("inner")(value) * 2
+
+    def inner(value):
+        return [value] * 1000
+
+    def failed():
+        raise ValueError("failed")
+
+    monkeypatch.setitem(_extension_functions, "outer", outer)
+    monkeypatch.setitem(_extension_functions, "inner", inner)
+    monkeypatch.setitem(_extension_functions, "failed", failed)
+
+    wrapped = lookup_method("outer")
+    assert wrapped is not outer
+    assert wrapped is lookup_method("outer")
+    assert wrapped.__name__ == "outer"
+
+    metrics.set_stanza("stanza")
+    for _ in range(3):
+        assert len(wrapped(1)) == 2000
+    with pytest.raises(ValueError):
+        lookup_method("failed")()
+
+    rows = {row["function"]: row for row in profiler.report()["stanza"]}
+    assert rows["outer"]["calls"] == 3
+    assert rows["inner"]["calls"] == 3
+    assert rows["failed"]["errors"] == 1
+    # Time spent in inner is excluded from self time of outer
+    outer_self = rows["outer"]["cum_ms"] - rows["inner"]["cum_ms"]
+    assert rows["outer"]["self_ms"] == pytest.approx(outer_self, abs=0.01)
+    assert rows["inner"]["avg_alloc_bytes"] > 0
+
+    top = profiler.report(top_n=1, sort_by="calls", reset=True)["stanza"]
+    assert len(top) == 1
+    assert profiler.report() == {}
@@ -0,0 +1,192 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+from cloudconnectlib.core import defaults, records
+from cloudconnectlib.core.exceptions import FuncException
+from cloudconnectlib.core.ext import lookup_method, splunk_xml, time_str2str
+from cloudconnectlib.core.records import RecordBatch, from_records
+
+RECORDS = [
+    {"id": 1, "name": "alpha", "ts": "2024-01-02 03:04:05", "extra": "x"},
+    {"id": 2, "name": "beta", "ts": "not a time"},
+    {"id": 1, "name": "alpha", "ts": "2024-01-02 03:04:05"},
+    {"id": 3, "ts": "2024-02-03 04:05:06"},
+]
+
+
+@pytest.fixture
+def python_backend(monkeypatch):
+    monkeypatch.setattr(defaults, "record_batch_backend", "python")
+
+
+def test_round_trip(python_backend):
+    batch = from_records(RECORDS)
+    assert type(batch) is RecordBatch
+    assert len(batch) == 4
+    assert batch.fields == ["id", "name", "ts", "extra"]
+    assert batch.column("name") == ["alpha", "beta", "alpha", None]
+    assert batch.to_records() == RECORDS
+
+    batch = from_records(RECORDS, fields="id, name")
+    assert batch.to_records() == [
+        {"id": 1, "name": "alpha"},
+        {"id": 2, "name": "beta"},
+        {"id": 1, "name": "alpha"},
+        {"id": 3},
+    ]
+    assert from_records([]).to_records() == []
+
+
+def test_select_filter_dedup(python_backend):
+    batch = from_records(RECORDS)
+    assert batch.select(["id", "absent"]).to_records() == [
+        {"id": 1},
+        {"id": 2},
+        {"id": 1},
+        {"id": 3},
+    ]
+    assert batch.filter("name", "^al").column("id") == [1, 1]
+    assert batch.filter("name", "^al", negate=True).column("id") == [2, 3]
+    assert batch.filter("id", "[23]").column("id") == [2, 3]
+    assert len(batch.filter("absent", ".")) == 0
+
+    assert batch.dedup(["id", "name"]).column("id") == [1, 2, 3]
+    assert batch.dedup().column("id") == [1, 2, 1, 3]
+
+    nested = from_records([{"a": {"b": 1}}, {"a": {"b": 1}}, {"a": [1]}])
+    assert nested.dedup("a").to_records() == [{"a": {"b": 1}}, {"a": [1]}]
+    # Operations don't change the batch
+    assert batch.to_records() == RECORDS
+
+
+def test_convert_time_and_apply(python_backend):
+    batch = from_records(RECORDS).convert_time(
+        "ts", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ"
+    )
+    assert batch.column("ts") == [
+        time_str2str(record["ts"], "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ")
+        for record in RECORDS
+    ]
+    assert batch.column("ts")[:2] == ["2024-01-02T03:04:05Z", "not a time"]
+
+    def batch_upper(values, suffix):
+        return [value.upper() + s for value, s in zip(values, suffix)]
+
+    applied = from_records(RECORDS).apply("name", batch_upper, "!")
+    assert applied.column("name") == ["ALPHA!", "BETA!", "ALPHA!", None]
+    assert "name" not in applied.to_records()[3]
+
+    with pytest.raises(ValueError):
+        from_records(RECORDS).apply("name", lambda values: values[:1])
+
+
+def test_pipeline_functions(python_backend):
+    batch = lookup_method("record_batch")(RECORDS + ["dropped"], "id,name,ts")
+    batch = lookup_method("record_filter")(batch, "ts", "^2024")
+    batch = lookup_method("record_dedup")(batch, "id")
+    batch = lookup_method("record_time_str2str")(batch, "ts", "%Y-%m-%d %H:%M:%S", "%s")
+    batch = lookup_method("record_apply")(batch, "name", "is_true")
+    batch = lookup_method("record_select")(batch, ["id", "name", "ts"])
+    assert batch.to_records() == [
+        {"id": 1, "name": False, "ts": "1704164645"},
+        {"id": 3, "ts": "1706933106"},
+    ]
+    assert len(lookup_method("record_batch")("")) == 0
+    assert lookup_method("record_batch")({"id": 1}).to_records() == [{"id": 1}]
+    with pytest.raises(FuncException):
+        lookup_method("record_apply")(batch, "id", "std_output")
+
+    assert splunk_xml(batch, index="main") == splunk_xml(
+        batch.to_records(), index="main"
+    )
+
+
+MIXED_RECORDS = [
+    {"id": 1, "meta": {"a": 1}, "value": 1, "flag": True, "note": None},
+    {"id": 2, "meta": {"b": [1, 2]}, "value": 2.5, "flag": False},
+    {"id": 1, "meta": {"a": 1}, "value": 1, "flag": True, "note": None},
+    {"id": 3, "value": "3", "note": "x"},
+]
+
+
+@pytest.fixture
+def arrow_backend(monkeypatch):
+    if records._import_arrow() is None:
+        pytest.skip("pyarrow is not installed")
+    monkeypatch.setattr(defaults, "record_batch_backend", "arrow")
+
+
+def test_default_backend():
+    assert defaults.record_batch_backend == "python"
+    assert type(from_records(RECORDS)) is RecordBatch
+
+
+def test_arrow_schema():
+    assert records._arrow_schema(RecordBatch.from_records(RECORDS)._columns) == {
+        "id": "int64",
+        "name": "string",
+        "ts": "string",
+        "extra": "string",
+    }
+    # Nested values, ints mixed with floats and None stay in Python.
+    for field in ("meta", "value", "note"):
+        columns = RecordBatch.from_records(MIXED_RECORDS, [field])._columns
+        assert records._arrow_schema(columns) is None
+    assert records._arrow_schema(
+        RecordBatch.from_records(MIXED_RECORDS, ["flag"])._columns
+    ) == {"flag": "bool_"}
+    assert records._arrow_schema({"a": [records._MISSING]}) == {"a": "null"}
+
+
+def test_arrow_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(defaults, "record_batch_backend", "arrow")
+    monkeypatch.setattr(records, "_import_arrow", lambda: None)
+    batch = from_records(RECORDS)
+    assert type(batch) is RecordBatch
+    assert batch.to_records() == RECORDS
+
+
+def test_arrow_backend(arrow_backend):
+    batch = from_records(RECORDS)
+    assert isinstance(batch, records.ArrowRecordBatch)
+    assert batch.to_records() == RECORDS
+    assert batch.filter("name", "^al").column("id") == [1, 1]
+    assert batch.dedup(["id", "name"]).column("id") == [1, 2, 3]
+    assert batch.select("id").to_records() == [{"id": i} for i in (1, 2, 1, 3)]
+    fmt = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ")
+    assert batch.convert_time("ts", *fmt).column("ts") == from_records(
+        RECORDS
+    ).to_python().convert_time("ts", *fmt).column("ts")
+
+
+@pytest.mark.parametrize("data", [RECORDS, MIXED_RECORDS])
+def test_arrow_matches_python(arrow_backend, monkeypatch, data):
+    def run(batch):
+        return [
+            batch.to_records(),
+            batch.select("id,value,note").to_records(),
+            batch.filter("flag", "^True$").to_records(),
+            batch.filter("value", r"\.5", negate=True).to_records(),
+            batch.filter("id", "[12]").to_records(),
+            batch.dedup("id").to_records(),
+            batch.dedup().to_records(),
+            [batch.column(field) for field in batch.fields],
+        ]
+
+    arrow = run(from_records(data))
+    monkeypatch.setattr(defaults, "record_batch_backend", "python")
+    assert arrow == run(from_records(data))
@@ -0,0 +1,180 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import threading
+import time
+
+from splunktalib.schedule import job as sjob
+
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_consts as c
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_schedule as ts
+
+
+class MockedCollector:
+    def __init__(self, name, interval=60, single_instance=True, **settings):
+        self._config = {c.stanza_name: name, c.interval: interval}
+        self._config.update(settings)
+        self._single_instance = single_instance
+
+    def get_interval(self):
+        return self._config[c.interval]
+
+    def is_single_instance(self):
+        return self._single_instance
+
+    def get_task_config(self):
+        return self._config
+
+
+def _noop(job):
+    pass
+
+
+def test_phase_is_deterministic():
+    assert ts.phase_of("input_1") == ts.phase_of("input_1")
+    assert ts.phase_of("input_1") != ts.phase_of("input_2")
+    assert all(0 <= ts.phase_of(f"input_{i}") < 1 for i in range(100))
+
+
+def test_first_runs_spread_over_startup_window():
+    now = 1000.0
+    jobs = [
+        ts.StaggeredJob(_noop, {}, 3600, f"input_{i}", startup_window=60, now=now)
+        for i in range(100)
+    ]
+    due = [job.get_expiration() - now for job in jobs]
+    assert all(0 <= d < 60 for d in due)
+    # No more than a fifth of the stanzas start in the same 6 seconds
+    buckets = [int(d // 6) for d in due]
+    assert max(buckets.count(b) for b in set(buckets)) <= 20
+
+
+def test_runs_aligned_to_phase():
+    job = ts.StaggeredJob(_noop, {}, 60, "input_1", startup_window=10, now=1000.0)
+    offset = ts.phase_of("input_1") * 60
+    runs = []
+    for _ in range(5):
+        runs.append(job.get_expiration())
+        job.update_expiration()
+    assert runs[1] - runs[0] >= 30
+    for previous, current in zip(runs[1:], runs[2:]):
+        assert current - previous == 60
+    assert all(abs((run - offset) % 60) < 1e-6 for run in runs[1:])
+
+
+def test_jitter_does_not_drift():
+    job = ts.StaggeredJob(
+        _noop, {}, 60, "input_1", jitter=0.5, startup_window=0, now=0.0
+    )
+    offset = ts.phase_of("input_1") * 60
+    for _ in range(50):
+        job.update_expiration()
+        delay = (job.get_expiration() - offset) % 60
+        assert 0 <= delay <= 30
+
+
+def test_create_job():
+    staggered = ts.create_job(_noop, MockedCollector("input_1"))
+    assert isinstance(staggered, ts.StaggeredJob)
+    assert staggered.get_props()["real_job"].get_interval() == 60
+
+    lockstep = ts.create_job(
+        _noop, MockedCollector("input_1", **{c.schedule_mode: "lockstep"})
+    )
+    assert type(lockstep) is ts.CollectorJob
+
+    jittered = ts.create_job(
+        _noop, MockedCollector("input_1", **{c.schedule_jitter: "invalid"})
+    )
+    assert isinstance(jittered, ts.StaggeredJob)
+
+    # Runs of a collector running a single round per invocation are not delayed
+    one_shot = ts.create_job(_noop, MockedCollector("input_1", single_instance=False))
+    assert type(one_shot) is ts.CollectorJob
+    assert one_shot.get_expiration() <= time.time()
+
+
+def _collector_job(overrun, interval=60):
+    collector = MockedCollector("input_1", interval, **{c.schedule_overrun: overrun})
+    return ts.create_job(_noop, collector)
+
+
+def test_triggers_coalesced_while_round_running():
+    job = _collector_job("skip")
+    assert job.start_round()
+    assert not job.start_round()
+    assert not job.start_round()
+    assert not job.finish_round()
+    assert job.stats()["missed_triggers"] == 2
+    assert job.start_round()
+
+
+def test_run_immediately_after_overrun():
+    job = _collector_job("immediate")
+    assert job.start_round()
+    assert not job.start_round()
+    # Missed triggers are coalesced into a single round
+    assert job.finish_round()
+    assert not job.finish_round()
+    assert job.stats()["rounds"] == 2
+
+
+def test_start_round_runs_coalesced_round():
+    entered = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    class SlowCollector(MockedCollector):
+        def __call__(self):
+            calls.append(1)
+            if len(calls) == 1:
+                entered.set()
+                release.wait(5)
+
+    collector = SlowCollector("input_1", **{c.schedule_overrun: "immediate"})
+    job = ts.create_job(_noop, collector)
+    thread = threading.Thread(target=ts.start_round(job))
+    thread.start()
+    entered.wait(5)
+    assert ts.start_round(job) is None
+    assert ts.start_round(job) is None
+    release.set()
+    thread.join(5)
+    assert len(calls) == 2
+    assert job.stats()["missed_triggers"] == 2
+
+    plain = sjob.Job(_noop, {"real_job": collector}, 60)
+    assert ts.start_round(plain) is collector
+
+
+def test_adaptive_interval(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(ts.time, "time", lambda: clock[0])
+    job = _collector_job("adaptive", interval=10)
+
+    def run_round(seconds):
+        job.start_round()
+        clock[0] += seconds
+        job.finish_round()
+
+    run_round(30)
+    assert job.get_interval() == 36
+    assert job.stats()["overrun_seconds"] == 20
+    for _ in range(30):
+        run_round(1)
+    # Interval goes back to the configured one once rounds get faster
+    assert job.get_interval() == 10
+    run_round(1000)
+    assert job.get_interval() == 100
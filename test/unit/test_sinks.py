@@ -0,0 +1,345 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_hec import FakeHECServer
+from cloudconnectlib.common.util import format_events
+from cloudconnectlib.core import defaults, ext
+from cloudconnectlib.core.exceptions import ConfigException
+from cloudconnectlib.core.pipemgr import PipeManager
+from cloudconnectlib.core.sinks import AsyncSink, EventSink, EventWriterSink, HECSink
+from cloudconnectlib.core.task import CCEHTTPRequestTask
+
+
+def _sink(server, **kwargs):
+    kwargs.setdefault("flush_interval", 0.05)
+    kwargs.setdefault("retry_backoff", 0.01)
+    return HECSink(server.url, server.token, **kwargs)
+
+
+def test_hec_sink_sends_batches():
+    with FakeHECServer() as server:
+        sink = _sink(server, batch_size=10, index="default_index")
+        stream = format_events(
+            ["a < b", {"k": "v"}],
+            time=1600000000.5,
+            index="main",
+            host="h",
+            source="s",
+            sourcetype="st",
+        )
+        assert sink.write_events(stream)
+        assert sink.write_events([f"raw {i}" for i in range(25)])
+        sink.close()
+
+        assert server.events[:2] == [
+            {
+                "index": "main",
+                "time": 1600000000.5,
+                "host": "h",
+                "source": "s",
+                "sourcetype": "st",
+                "event": "a < b",
+            },
+            {
+                "index": "main",
+                "time": 1600000000.5,
+                "host": "h",
+                "source": "s",
+                "sourcetype": "st",
+                "event": '{"k": "v"}',
+            },
+        ]
+        assert server.events[2] == {"index": "default_index", "event": "raw 0"}
+        assert len(server.events) == 27
+        assert server.requests >= 3
+        assert server.gzip_requests == server.requests
+        assert server.channels == {sink.channel}
+
+        stats = sink.stats()
+        assert stats["sent_events"] == 27
+        assert stats["failed_events"] == 0
+        assert stats["queue_depth"] == 0
+        assert not sink.write_events("closed")
+
+
+def test_hec_sink_retries_and_acks():
+    with FakeHECServer(use_ack=True, fail_every=2, ack_after=1) as server:
+        sink = _sink(server, batch_size=5, use_ack=True, ack_poll_interval=0.01)
+        for i in range(3):
+            assert sink.write_events([f"event {i}-{j}" for j in range(5)])
+            sink.flush()
+        stats = sink.stats()
+        sink.close()
+
+        assert sorted(e["event"] for e in server.events) == sorted(
+            f"event {i}-{j}" for i in range(3) for j in range(5)
+        )
+        assert server.failed >= 1
+        assert stats["retries"] >= 1
+        assert stats["acked_events"] == 15
+        assert stats["pending_acks"] == 0
+
+
+def test_hec_sink_drops_rejected_batch():
+    with FakeHECServer() as server:
+        sink = HECSink(server.url, "bad-token", flush_interval=0.01, retries=0)
+        sink.write_events("event")
+        sink.close()
+        assert server.events == []
+        assert sink.stats()["failed_events"] == 1
+
+
+def test_hec_sink_flush_reports_unreachable_endpoint():
+    sink = HECSink("http://127.0.0.1:1", "token", flush_interval=0.01, retries=0)
+    assert sink.write_events("event")
+    assert not sink.flush()
+    assert sink.stats()["failed_events"] == 1
+    # Failures are reported once
+    assert sink.flush()
+    sink.close()
+
+
+def test_hec_sink_flush_reports_expired_acks():
+    with FakeHECServer(use_ack=True, ack_after=10**6) as server:
+        sink = _sink(
+            server,
+            use_ack=True,
+            retries=0,
+            ack_timeout=0.05,
+            ack_poll_interval=0.01,
+        )
+        assert sink.write_events([f"event {i}" for i in range(3)])
+        assert not sink.flush()
+        deadline = time.monotonic() + 5
+        while sink.stats()["failed_events"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sink.stats()["failed_events"] == 3
+        assert sink.stats()["pending_acks"] == 0
+        sink.close()
+
+
+def test_hec_sink_requires_url_and_token():
+    with pytest.raises(ConfigException):
+        HECSink("", "token")
+
+
+def test_pipe_manager_sink(monkeypatch):
+    monkeypatch.setattr(PipeManager, "_instance", None)
+    written = []
+
+    class Writer:
+        def write_events(self, events):
+            written.append(events)
+            return True
+
+    mgr = PipeManager(event_writer=Writer())
+    assert isinstance(mgr.sink, EventWriterSink)
+    ext.std_output(["e1"])
+    assert written == ["e1"]
+
+    with FakeHECServer() as server:
+        previous = mgr.set_sink(_sink(server))
+        assert isinstance(previous, EventWriterSink)
+        ext.std_output(["e2", "e3"])
+        mgr.close()
+        assert [e["event"] for e in server.events] == ["e2", "e3"]
+    assert written == ["e1"]
+
+
+class SlowSink(EventSink):
+    def __init__(self, result=True):
+        self.batches = []
+        self.result = result
+        self.release = threading.Event()
+
+    def write_events(self, events):
+        return self.write_batch([events])
+
+    def write_batch(self, events):
+        self.release.wait(5)
+        self.batches.append(list(events))
+        return self.result
+
+
+def test_async_sink_writes_in_batches():
+    inner = SlowSink()
+    sink = AsyncSink(inner, queue_size=100, batch_size=4)
+    for i in range(10):
+        assert sink.write_events(f"e{i}")
+    assert sink.stats()["written_events"] == 0
+    inner.release.set()
+    sink.close()
+
+    assert [e for batch in inner.batches for e in batch] == [f"e{i}" for i in range(10)]
+    assert max(len(batch) for batch in inner.batches) <= 4
+    stats = sink.stats()
+    assert stats["written_events"] == 10
+    assert stats["queue_depth"] == 0
+    assert stats["blocked_writes"] == 0
+    assert not sink.write_events("closed")
+
+
+def test_async_sink_blocks_when_full():
+    inner = SlowSink()
+    sink = AsyncSink(inner, queue_size=2, batch_size=1)
+    timer = threading.Timer(0.2, inner.release.set)
+    timer.start()
+    for i in range(5):
+        assert sink.write_events(i)
+    sink.close()
+    timer.join()
+    assert [b[0] for b in inner.batches] == list(range(5))
+    stats = sink.stats()
+    assert stats["blocked_writes"] >= 1
+    assert stats["blocked_seconds"] > 0
+
+
+def test_async_sink_spills_to_disk(tmp_path):
+    inner = SlowSink()
+    spill_dir = str(tmp_path / "spill")
+    sink = AsyncSink(inner, queue_size=3, batch_size=2, spill_dir=spill_dir)
+    events = [f"event {i}" for i in range(20)] + [{"k": 1}, "line\nbreak"]
+    for event in events:
+        assert sink.write_events(event)
+    stats = sink.stats()
+    assert stats["blocked_writes"] == 0
+    assert stats["spilled_events"] > 0
+    assert stats["spill_depth"] > 0
+
+    inner.release.set()
+    sink.close()
+    assert [e for batch in inner.batches for e in batch] == events
+    assert [f for f in os.listdir(spill_dir) if f.endswith(".journal")] == []
+
+
+class UnavailableSink(EventSink):
+    def __init__(self):
+        self.available = False
+        self.events = []
+
+    def write_events(self, events):
+        return self.write_batch([events])
+
+    def write_batch(self, events):
+        if not self.available:
+            return False
+        self.events.extend(events)
+        return True
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_async_sink_spills_rejected_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(defaults, "async_spill_retry_interval", 0.05)
+    inner = UnavailableSink()
+    sink = AsyncSink(inner, batch_size=2, spill_dir=str(tmp_path))
+    for i in range(5):
+        assert sink.write_events(f"e{i}")
+    # Rejected writes are on disk once flushed
+    assert sink.flush()
+    assert _wait_for(lambda: sink.stats()["spill_depth"] > 0)
+
+    inner.available = True
+    assert sink.write_events("e5")
+    assert _wait_for(lambda: sink.stats()["spill_depth"] == 0)
+    sink.close()
+    assert inner.events == [f"e{i}" for i in range(6)]
+    assert sink.stats()["dropped_events"] == 0
+
+
+def test_async_sink_replays_journal_after_restart(tmp_path):
+    inner = UnavailableSink()
+    sink = AsyncSink(inner, spill_dir=str(tmp_path))
+    for i in range(3):
+        assert sink.write_events(f"e{i}")
+    sink.close()
+    assert inner.events == []
+
+    inner.available = True
+    restarted = AsyncSink(inner, spill_dir=str(tmp_path))
+    assert restarted.write_events("e3")
+    restarted.close()
+    assert inner.events == [f"e{i}" for i in range(4)]
+
+
+def test_std_output_spills_when_writer_is_gone(tmp_path, monkeypatch):
+    monkeypatch.setattr(PipeManager, "_instance", None)
+
+    class ClosedWriter:
+        def write_events(self, events):
+            return False
+
+    sink = AsyncSink(EventWriterSink(ClosedWriter()), spill_dir=str(tmp_path))
+    PipeManager(sink=sink)
+    assert ext.std_output(["e1", "e2"])
+    assert PipeManager().flush()
+    assert _wait_for(lambda: sink.stats()["spilled_events"] == 2)
+    sink.close()
+
+
+def test_async_sink_rejects_writes_after_failure():
+    inner = SlowSink(result=False)
+    inner.release.set()
+    sink = AsyncSink(inner)
+    assert sink.write_events("e1")
+    assert not sink.flush()
+    assert not sink.write_events("e2")
+    sink.close()
+    assert sink.stats()["dropped_events"] == 1
+
+
+def test_checkpoint_waits_for_delivery(monkeypatch):
+    monkeypatch.setattr(PipeManager, "_instance", None)
+    inner = SlowSink()
+    sink = AsyncSink(inner)
+    PipeManager(sink=sink)
+    saved = []
+
+    class Checkpointer:
+        def save(self, context):
+            saved.append(len(inner.batches))
+
+    task = CCEHTTPRequestTask(
+        request={"url": "https://example.com/api", "method": "GET"}, name="test"
+    )
+    task._checkpointer = Checkpointer()
+    assert sink.write_events("e1")
+    threading.Timer(0.1, inner.release.set).start()
+    task._persist_checkpoint({})
+    # Checkpoint is saved only after the queued event is written
+    assert saved == [1]
+
+    inner.result = False
+    assert sink.write_events("e2")
+    task._persist_checkpoint({})
+    assert saved == [1]
+    sink.close()
+
+
+def test_event_writer_sink_batch(capsys):
+    sink = EventWriterSink()
+    assert sink.write_batch(["a", "b"])
+    assert capsys.readouterr().out == "a\nb\n"
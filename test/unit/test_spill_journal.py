@@ -0,0 +1,141 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+
+from cloudconnectlib.core.spill_journal import SpillJournal
+
+
+def _segments(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith(".journal"))
+
+
+def test_append_and_replay_in_order(tmp_path):
+    journal = SpillJournal(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        journal.append([f"<stream>{i}</stream>"])
+    assert len(journal) == 10
+    assert len(_segments(str(tmp_path))) > 1
+
+    written = []
+    assert journal.replay(lambda events: written.append(events) or True) == 10
+    assert written == [[f"<stream>{i}</stream>"] for i in range(10)]
+    assert len(journal) == 0
+    assert _segments(str(tmp_path)) == []
+
+    journal.append(["after"])
+    assert journal.replay(lambda events: written.append(events) or True) == 1
+    assert written[-1] == ["after"]
+
+
+def test_replay_stops_on_failure_and_resumes_after_restart(tmp_path):
+    journal = SpillJournal(str(tmp_path), segment_bytes=64)
+    for i in range(6):
+        journal.append([i])
+
+    written = []
+
+    def write_three(events):
+        if len(written) == 3:
+            return False
+        written.append(events[0])
+        return True
+
+    assert journal.replay(write_three) == 3
+    assert len(journal) == 3
+    journal.close()
+
+    # Replay continues from the cursor after restart
+    restarted = SpillJournal(str(tmp_path), segment_bytes=64)
+    assert len(restarted) == 3
+    restarted.append([6])
+    assert restarted.replay(lambda events: written.append(events[0]) or True) == 4
+    assert written == list(range(7))
+
+
+def test_replay_at_most_max_records(tmp_path):
+    journal = SpillJournal(str(tmp_path), segment_bytes=64, fsync=False)
+    for i in range(5):
+        journal.append([i])
+
+    written = []
+    assert journal.replay(lambda events: written.append(events[0]) or True, 2) == 2
+    # Records appended during replay are kept after the replayed ones
+    journal.append([5])
+    journal.sync()
+    assert journal.replay(lambda events: written.append(events[0]) or True) == 4
+    assert written == list(range(6))
+    assert len(journal) == 0
+    assert _segments(str(tmp_path)) == []
+
+
+def test_torn_record_is_ignored(tmp_path):
+    journal = SpillJournal(str(tmp_path))
+    journal.append(["complete"])
+    journal.append(["torn"])
+    journal.close()
+    path = os.path.join(str(tmp_path), _segments(str(tmp_path))[0])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    restarted = SpillJournal(str(tmp_path))
+    assert len(restarted) == 1
+    written = []
+    assert restarted.replay(lambda events: written.append(events) or True) == 1
+    assert written == [["complete"]]
+
+
+def test_cursor_saved_during_replay(tmp_path):
+    journal = SpillJournal(str(tmp_path), segment_bytes=64, cursor_interval=2)
+    for i in range(7):
+        journal.append([i])
+
+    written = []
+
+    def crash_after_five(events):
+        if len(written) == 5:
+            raise RuntimeError("crash")
+        written.append(events[0])
+        return True
+
+    try:
+        journal.replay(crash_after_five)
+    except RuntimeError:
+        pass
+    journal.close()
+
+    # Only records replayed after the last saved cursor are replayed again
+    restarted = SpillJournal(str(tmp_path), segment_bytes=64)
+    assert len(restarted) == 3
+    assert restarted.replay(lambda events: written.append(events[0]) or True) == 3
+    assert written == [0, 1, 2, 3, 4, 4, 5, 6]
+
+
+def test_oldest_segments_evicted_beyond_max_size(tmp_path, caplog):
+    journal = SpillJournal(str(tmp_path), segment_bytes=64, max_bytes=200)
+    for i in range(20):
+        journal.append([f"event {i}"])
+    assert journal.size <= 200 + 64
+    assert 0 < len(journal) < 20
+    assert any("oldest records" in r.getMessage() for r in caplog.records)
+
+    written = []
+    journal.replay(lambda events: written.append(events[0]) or True)
+    # The newest records are kept in order
+    assert written == [f"event {i}" for i in range(20 - len(written), 20)]
+    journal.close()
+
+    restarted = SpillJournal(str(tmp_path), segment_bytes=64, max_bytes=200)
+    assert len(restarted) == 0
@@ -0,0 +1,98 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import os.path as op
+import signal
+import threading
+import time
+
+from cloudconnectlib.core import defaults
+from cloudconnectlib.splunktacollectorlib.data_collection import ta_supervisor as sup
+
+
+def _shard_target(shard, shards, channel, directory):
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    assert channel.write_events([f"started shard={shard}"])
+    marker = op.join(directory, f"crashed_{shard}")
+    if not op.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    stopped.wait(30)
+    channel.write_events([f"stopped shard={shard}"])
+
+
+def test_shard_of():
+    stanzas = [f"input_{i}" for i in range(100)]
+    shards = [sup.shard_of(stanza, 4) for stanza in stanzas]
+    assert shards == [sup.shard_of(stanza, 4) for stanza in stanzas]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_channel_waits_for_supervisor():
+    supervisor_end, worker_end = sup.multiprocessing.Pipe()
+    channel = sup.ShardChannel(worker_end)
+
+    def reply(written):
+        assert supervisor_end.recv() == ("events", ["event"])
+        supervisor_end.send(written)
+
+    for written in (True, False):
+        thread = threading.Thread(target=reply, args=(written,))
+        thread.start()
+        assert channel.write_events(["event"]) is written
+        thread.join()
+
+    supervisor_end.close()
+    assert not channel.write_events(["event"])
+    assert not channel.isopen()
+
+
+def test_supervisor_restarts_crashed_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(defaults, "shard_restart_delay", 0.1)
+    stanzas = [f"input_{i}" for i in range(20)]
+    expected = {sup.shard_of(stanza, 3) for stanza in stanzas}
+    events = []
+
+    def write_events(written):
+        events.extend(written)
+        return True
+
+    supervisor = sup.ShardSupervisor(
+        _shard_target, 3, stanzas, write_events, (str(tmp_path),)
+    )
+    supervisor.start()
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            supervisor.check_workers()
+            stats = supervisor.stats()
+            # Restarted workers handle SIGTERM once they send events
+            started = [e for e in events if e.startswith("started")]
+            if len(started) == 2 * len(expected):
+                break
+            time.sleep(0.05)
+        assert set(stats) == expected
+        assert all(s["restarts"] == 1 for s in stats.values())
+    finally:
+        supervisor.stop()
+
+    # Workers are stopped with SIGTERM and their events are all received
+    assert sorted(e for e in events if e.startswith("stopped")) == sorted(
+        f"stopped shard={shard}" for shard in expected
+    )
+    assert len([e for e in events if e.startswith("started")]) == 2 * len(expected)
+    assert not any(s["alive"] for s in supervisor.stats().values())
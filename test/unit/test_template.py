@@ -14,7 +14,7 @@
 # limitations under the License.
 #
 import pytest
-from jinja2 import TemplateSyntaxError
+from jinja2 import TemplateSyntaxError, UndefinedError
 
 from cloudconnectlib.core.template import compile_template
 
@@ -56,3 +56,23 @@ def test_compile_template():
 
         ctx = {}
         assert func(ctx) == ""
+
+
+class _Response:
+    body = "body"
+    raw_bytes = b"raw"
+    status_code = 200
+
+
+def test_compile_template_attribute():
+    ctx = {"__response__": _Response(), "obj": {"key": "value", "num": 5}}
+    assert compile_template("{{ __response__.body }}")(ctx) == "body"
+    assert compile_template("{{__response__.raw_bytes}}")(ctx) == b"raw"
+    assert compile_template("{{ obj.key }}")(ctx) == "value"
+
+    # Values other than text are rendered as before
+    assert compile_template("{{ __response__.status_code }}")(ctx) == "200"
+    assert compile_template("{{ obj.num }}")(ctx) == "5"
+    assert compile_template("{{ obj.missing }}")(ctx) == ""
+    with pytest.raises(UndefinedError):
+        compile_template("{{ unknown.attr }}")(ctx)
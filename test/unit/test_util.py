@@ -13,7 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from cloudconnectlib.common.util import is_true, is_valid_bool, is_valid_port
+import pytest
+from solnlib.modular_input.event import XMLEvent
+
+from cloudconnectlib.common.util import (
+    format_events,
+    is_true,
+    is_valid_bool,
+    is_valid_port,
+)
 
 
 def test_is_true():
@@ -84,3 +92,39 @@ def test_is_valid_port():
     assert all(is_valid_port(p) for p in good_ports)
     bad_ports = [0, "0", -1, "-1", 65536, "65536", "1234567", "$%^&", "=="]
     assert all(not is_valid_port(p) for p in bad_ports)
+
+
+def _format_with_xml_event(raw_events, **kwargs):
+    return XMLEvent.format_events(XMLEvent(data, **kwargs) for data in raw_events)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"time": 1700000000.123456, "index": "main", "host": "h", "source": "s"},
+        {"sourcetype": "st", "stanza": 'in"put <&>\r\n\t', "unbroken": True},
+        {"time": 1, "stanza": "input", "unbroken": True, "done": True},
+    ],
+)
+def test_format_events_same_as_xml_event(kwargs):
+    raw_events = [
+        "plain",
+        "a < b && c > d ]]> \"quoted\" 'single'",
+        "line1\r\nline2\ttab",
+        "unicode \u4e2d\u6587 \U0001f600",
+        "lone surrogate \ud800",
+        "",
+        {"key": "value", "nested": [1, 2.5, None, True], "text": "<&>"},
+        ["list", {"k": "\u00e9"}],
+        123,
+        None,
+    ]
+    expected = _format_with_xml_event(raw_events, **kwargs)
+    assert format_events(raw_events, **kwargs) == expected
+    assert format_events(iter(raw_events), **kwargs) == expected
+
+
+def test_format_events_edge_cases():
+    assert format_events([]) == _format_with_xml_event([])
+    assert format_events([""], host="h") == _format_with_xml_event([""], host="h")